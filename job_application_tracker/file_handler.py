@@ -1,27 +1,89 @@
 # file_handler.py
 import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from fastapi import HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 DATA_FILE = Path('applications.json')
 
+logger = logging.getLogger(__name__)
+
+# Backup policy: a snapshot of the data file is taken once
+# APPLICATIONS_SNAPSHOT_EVERY changes or APPLICATIONS_SNAPSHOT_INTERVAL
+# seconds have been journaled since the last one, and the newest
+# APPLICATIONS_SNAPSHOTS_KEPT snapshots are kept with their journals.
+SNAPSHOT_EVERY = int(os.environ.get("APPLICATIONS_SNAPSHOT_EVERY", "100"))
+SNAPSHOT_INTERVAL = float(os.environ.get("APPLICATIONS_SNAPSHOT_INTERVAL", "3600"))
+SNAPSHOTS_KEPT = int(os.environ.get("APPLICATIONS_SNAPSHOTS_KEPT", "5"))
+
+# Parsed contents of the data file, kept between requests: (path, file
+# signature, applications). The signature (modification time, size and
+# inode) changes whenever the file is rewritten, by this app or another.
+_cache: Optional[Tuple[Path, Tuple[int, int, int], Dict[str, Any]]] = None
+cache_stats = {"hits": 0, "misses": 0}
+
+def _file_signature() -> Optional[Tuple[int, int, int]]:
+    """
+    Get the signature of the data file, or None if it does not exist.
+    """
+    try:
+        stat = DATA_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get the read cache counters.
+    
+    Returns:
+        Dictionary with the hits and misses since startup, the hit rate and
+        the number of cached applications
+    """
+    reads = cache_stats["hits"] + cache_stats["misses"]
+    return {
+        **cache_stats,
+        "hit_rate": round(cache_stats["hits"] / reads, 4) if reads else None,
+        "cached_applications": len(_cache[2]) if _cache is not None else 0
+    }
+
 def read_applications() -> Dict[str, Any]:
     """
     Read job applications from JSON file.
     
+    The file is parsed only when it changed since the last read or write;
+    otherwise the cached applications are returned. The dictionary returned
+    is the caller's to modify, but the application entries in it are shared
+    with the cache and must not be modified in place.
+    
     Returns:
         Dict containing all job applications
         
     Raises:
         HTTPException: If file is corrupted or cannot be read
     """
+    global _cache
     try:
-        if DATA_FILE.exists():
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data if isinstance(data, dict) else {}
-        return {}
+        # Signature taken before reading: a write in between makes the next
+        # read parse the file again rather than keep stale data
+        signature = _file_signature()
+        if _cache is not None and _cache[0] == DATA_FILE and _cache[1] == signature:
+            cache_stats["hits"] += 1
+            return dict(_cache[2])
+        cache_stats["misses"] += 1
+        _cache = None
+        if signature is None:
+            return {}
+        with open(DATA_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data = data if isinstance(data, dict) else {}
+        _cache = (DATA_FILE, signature, data)
+        return dict(data)
     except json.JSONDecodeError as e:
         raise HTTPException(
             status_code=500, 
@@ -42,18 +104,39 @@ def write_applications(applications: Dict[str, Any]) -> None:
     """
     Write job applications to JSON file.
     
+    The dictionary is kept as the cached contents of the file, so its
+    values must be plain JSON types (as json.load would return them).
+    
     Args:
         applications: Dictionary of job applications to save
         
     Raises:
         HTTPException: If file cannot be written
     """
+    global _cache
+    # Whatever happens, the cached contents are no longer those of the file
+    _cache = None
     try:
         # Ensure the directory exists
         DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
+        # Written to a new file that replaces the old one, so a failed
+        # write leaves the old file intact
+        temp_file = DATA_FILE.with_name(DATA_FILE.name + '.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(applications, f, indent=2, ensure_ascii=False)
+            f.flush()
+            # Signature of the file written, which the rename keeps
+            stat = os.fstat(f.fileno())
+        os.replace(temp_file, DATA_FILE)
+        # The next read returns what was just written without parsing it,
+        # unless another process replaced the file since the rename
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        try:
+            if _file_signature() == signature:
+                _cache = (DATA_FILE, signature, dict(applications))
+        except OSError:
+            pass
     except PermissionError:
         raise HTTPException(
             status_code=500, 
@@ -65,21 +148,268 @@ def write_applications(applications: Dict[str, Any]) -> None:
             detail=f"Failed to write applications data: {str(e)}"
         )
 
-def backup_applications() -> None:
+# Journal state: backup directory, snapshot sequence numbers (oldest first),
+# last journaled sequence number and time of the first change journaled
+# since the last snapshot. Loaded from the backup directory on first use.
+_journal: Optional[Dict[str, Any]] = None
+
+def backup_dir() -> Path:
     """
-    Create a backup of the current applications file.
-    
+    Get the directory holding the snapshots and journals of the data file.
+    """
+    return DATA_FILE.with_name(f"{DATA_FILE.stem}.backups")
+
+def _snapshot_path(seq: int) -> Path:
+    return backup_dir() / f"snapshot-{seq:010d}.json"
+
+def _journal_path(seq: int) -> Path:
+    # Changes after snapshot seq
+    return backup_dir() / f"journal-{seq:010d}.jsonl"
+
+def _read_journal(seq: int) -> List[Dict[str, Any]]:
+    """
+    Read the changes journaled after a snapshot, skipping a last line left
+    incomplete by a crash.
+    """
+    path = _journal_path(seq)
+    if not path.exists():
+        return []
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return entries
+
+def _journal_state() -> Dict[str, Any]:
+    """
+    Get the journal state, loading it from the backup directory if needed.
+    """
+    global _journal
+    directory = backup_dir()
+    if _journal is None or _journal["dir"] != directory:
+        snapshots = sorted(
+            int(path.stem.split("-")[1]) for path in directory.glob("snapshot-*.json")
+        ) if directory.exists() else []
+        entries = _read_journal(snapshots[-1]) if snapshots else []
+        _journal = {
+            "dir": directory,
+            "snapshots": snapshots,
+            "seq": entries[-1]["seq"] if entries else (snapshots[-1] if snapshots else 0),
+            "started": entries[0]["time"] if entries else None
+        }
+    return _journal
+
+def _take_snapshot(state: Dict[str, Any]) -> None:
+    """
+    Snapshot the data file at the last journaled change, start its journal
+    and drop the snapshots beyond SNAPSHOTS_KEPT.
+
+    The snapshot is a copy, not a hard link: applications.json may be
+    edited in place outside the app, which would change every snapshot
+    linked to it. The copy is written under a temporary name and renamed,
+    so a crash never leaves a partial snapshot.
+    """
+    seq = state["seq"]
+    if state["snapshots"] and state["snapshots"][-1] == seq:
+        return
+    path = _snapshot_path(seq)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + '.tmp')
+    if not DATA_FILE.exists():
+        temp_path.write_text("{}", encoding='utf-8')
+    else:
+        shutil.copyfile(DATA_FILE, temp_path)
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    state["snapshots"].append(seq)
+    state["started"] = None
+    while len(state["snapshots"]) > max(SNAPSHOTS_KEPT, 1):
+        oldest = state["snapshots"].pop(0)
+        _snapshot_path(oldest).unlink(missing_ok=True)
+        _journal_path(oldest).unlink(missing_ok=True)
+
+def _append_journal(state: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    """
+    Append an entry to the journal of the latest snapshot and fsync it.
+    """
+    with open(_journal_path(state["snapshots"][-1]), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def record_change(op: str, app_id: Optional[str], data: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Journal a change before it is written to the data file, taking a
+    snapshot of the file first when one is due.
+
+    Each change is one appended line, so its cost does not depend on the
+    number of applications; a snapshot (a copy of the file) is only taken
+    every SNAPSHOT_EVERY changes. Use save_change to journal and write a
+    change together.
+
+    Args:
+        op: "put" (application created or replaced) or "restore"
+        app_id: Application ID (None for a restore)
+        data: Application data for a put, {"target": seq, "applications":
+            restored applications} for a restore
+
+    Returns:
+        Sequence number of the change
+
     Raises:
-        HTTPException: If backup cannot be created
+        HTTPException: If the change cannot be journaled
     """
     try:
-        if DATA_FILE.exists():
-            backup_file = DATA_FILE.with_suffix('.backup.json')
-            with open(DATA_FILE, 'r', encoding='utf-8') as src:
-                with open(backup_file, 'w', encoding='utf-8') as dst:
-                    dst.write(src.read())
+        state = _journal_state()
+        now = time.time()
+        if (not state["snapshots"]
+                or state["seq"] - state["snapshots"][-1] >= SNAPSHOT_EVERY
+                or (state["started"] is not None and now - state["started"] >= SNAPSHOT_INTERVAL)):
+            _take_snapshot(state)
+        entry = {"seq": state["seq"] + 1, "time": now, "op": op, "id": app_id, "data": data}
+        _append_journal(state, entry)
+        state["seq"] = entry["seq"]
+        if state["started"] is None:
+            state["started"] = now
+        return entry["seq"]
     except Exception as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Failed to create backup: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Failed to journal change: {str(e)}"
+        )
+
+def abort_change(seq: int) -> None:
+    """
+    Mark a journaled change as not made, after writing it to the data file
+    failed, so it is skipped when rebuilding the applications.
+
+    The abort entry keeps the change's sequence number, so the numbering
+    (and the label of the next snapshot, which no longer contains the
+    change) stays consistent. If it cannot be journaled either, the error
+    is logged and the change stays in the journal.
+    """
+    try:
+        state = _journal_state()
+        _append_journal(state, {"seq": seq, "time": time.time(), "op": "abort", "id": None, "data": None})
+    except Exception as e:
+        logger.error(f"Failed to journal the abort of change {seq}: {str(e)}")
+
+def save_change(applications: Dict[str, Any], op: str, app_id: Optional[str],
+                data: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Journal a change, then write the applications that include it.
+
+    If the write fails, the change is marked aborted in the journal, so a
+    restore never brings back a change the client was told had failed.
+
+    Args:
+        applications: Applications with the change made
+        op, app_id, data: The change, as for record_change
+
+    Returns:
+        Sequence number of the change
+
+    Raises:
+        HTTPException: If the change cannot be journaled or written
+    """
+    seq = record_change(op, app_id, data)
+    try:
+        write_applications(applications)
+    except HTTPException:
+        abort_change(seq)
+        raise
+    return seq
+
+def rebuild_applications(seq: int) -> Dict[str, Any]:
+    """
+    Rebuild the applications as they were after a journaled change, from
+    the latest snapshot before it and the journal that follows.
+
+    Args:
+        seq: Sequence number of the change
+
+    Returns:
+        Dict containing the job applications at that point
+
+    Raises:
+        HTTPException: If that point is not covered by the kept backups
+    """
+    state = _journal_state()
+    bases = [snapshot for snapshot in state["snapshots"] if snapshot <= seq]
+    if not bases or seq > state["seq"]:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Change {seq} cannot be restored (backups cover changes "
+                   f"{state['snapshots'][0] if state['snapshots'] else state['seq']} to {state['seq']})"
+        )
+    try:
+        with open(_snapshot_path(bases[-1]), 'r', encoding='utf-8') as f:
+            applications = json.load(f)
+        entries = _read_journal(bases[-1])
+        aborted = {entry["seq"] for entry in entries if entry["op"] == "abort"}
+        for entry in entries:
+            if entry["seq"] > seq:
+                break
+            if entry["seq"] in aborted:
+                continue
+            if entry["op"] == "put":
+                applications[entry["id"]] = entry["data"]
+            elif entry["op"] == "restore":
+                applications = entry["data"]["applications"]
+        return applications
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to rebuild applications at change {seq}: {str(e)}"
+        )
+
+def restore_applications(seq: int) -> Dict[str, Any]:
+    """
+    Restore the data file to its state after a journaled change.
+
+    The restore is itself journaled, with the restored applications (a
+    restore is rare, and this keeps it replayable once the snapshot it was
+    rebuilt from is rotated out), so the changes it undid stay restorable.
+
+    Args:
+        seq: Sequence number of the change to go back to
+
+    Returns:
+        Dict containing the restored job applications
+
+    Raises:
+        HTTPException: If that point is not covered by the kept backups or
+            the restore fails
+    """
+    applications = rebuild_applications(seq)
+    save_change(applications, "restore", None, {"target": seq, "applications": applications})
+    return applications
+
+def get_backup_status() -> Dict[str, Any]:
+    """
+    Describe the kept snapshots and the journal.
+
+    Returns:
+        Dictionary with the snapshots (sequence number and time), the last
+        journaled change and the first change that can be restored
+    """
+    state = _journal_state()
+    snapshots = []
+    for seq in state["snapshots"]:
+        path = _snapshot_path(seq)
+        modified = path.stat().st_mtime if path.exists() else None
+        snapshots.append({
+            "seq": seq,
+            "time": datetime.fromtimestamp(modified, timezone.utc).isoformat() if modified is not None else None
+        })
+    return {
+        "snapshots": snapshots,
+        "last_change": state["seq"],
+        "restorable_from": state["snapshots"][0] if state["snapshots"] else None
+    }
@@ -1,7 +1,10 @@
 from typing import Optional, List
 from fastapi import FastAPI, HTTPException, Query
 from models import JobApplication, JobApplicationCreate, Status
-from file_handler import read_applications, write_applications, backup_applications
+from file_handler import (
+    read_applications, get_cache_stats,
+    save_change, restore_applications, get_backup_status
+)
 import logging
 
 # Configure logging
@@ -58,15 +61,12 @@ async def create_application(application: JobApplicationCreate):
                 detail=f"Application already exists for {application.name} at {application.company} for {application.position}"
             )
 
-        # Create backup before making changes
-        backup_applications()
-        
         # Create new application
         app_data = JobApplication(**application.model_dump(), id=app_id)
-        applications[app_id] = app_data.model_dump()
+        applications[app_id] = app_data.model_dump(mode="json")
         
-        # Save to file
-        write_applications(applications)
+        # Journal the change and save to file (snapshots are taken as due)
+        save_change(applications, "put", app_id, applications[app_id])
         
         logger.info(f"Created application: {app_id}")
         return app_data
@@ -181,4 +181,58 @@ async def get_application_stats():
         
     except Exception as e:
         logger.error(f"Error generating stats: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate statistics: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate statistics: {str(e)}")
+
+@app.get("/applications/cache")
+async def get_cache_statistics():
+    """
+    Get the counters of the applications.json read cache.
+    
+    Returns:
+        Dictionary with cache hits, misses, hit rate and cached applications
+    """
+    return get_cache_stats()
+
+@app.get("/applications/backups")
+async def get_backups():
+    """
+    Get the kept snapshots and the range of changes that can be restored.
+    
+    Returns:
+        Dictionary with the snapshots, the last journaled change and the
+        first restorable change
+        
+    Raises:
+        HTTPException: If the backups cannot be listed
+    """
+    try:
+        return get_backup_status()
+    except Exception as e:
+        logger.error(f"Error listing backups: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to list backups: {str(e)}")
+
+@app.post("/applications/restore")
+async def restore_backup(seq: int = Query(..., ge=0, description="Change to restore the applications to")):
+    """
+    Restore the applications to their state after a journaled change.
+    
+    Args:
+        seq: Sequence number of the change (see GET /applications/backups)
+        
+    Returns:
+        Dictionary with the restored change and the number of applications
+        
+    Raises:
+        HTTPException: If the change is not covered by the backups or the
+            restore fails
+    """
+    try:
+        applications = restore_applications(seq)
+        logger.info(f"Restored {len(applications)} applications to change {seq}")
+        return {"restored_seq": seq, "total": len(applications)}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error restoring applications: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to restore applications: {str(e)}")
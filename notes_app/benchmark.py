@@ -0,0 +1,175 @@
+# benchmark.py
+"""
+Concurrency benchmark for the Notes API.
+
+Drives the app in-process through httpx's ASGI transport with a mixed
+read/write workload and reports throughput and latency percentiles (in ms)
+for each I/O pool size and durability mode. Point --dir at the storage you
+deploy on: the pool pays off when individual disk operations are slow enough
+to stall the event loop, and fsync cost depends entirely on the device.
+
+Usage:
+    python benchmark.py --clients 32 --requests 50 --write-ratio 0.2
+    python benchmark.py --durability off on --window-ms 0 2 --write-size 4096
+    python benchmark.py --small-notes 20000 --backends files packed
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import httpx
+
+def percentile(samples, pct):
+    """
+    Get the pct-th percentile of a list of samples.
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def client_loop(client, client_id, requests, write_ratio, payload, latencies):
+    """
+    Issue a fixed number of mixed requests and record their latencies.
+    """
+    for i in range(requests):
+        start = time.perf_counter()
+        if (i * 7919 + client_id) % 100 < write_ratio * 100:
+            kind = "write"
+            response = await client.post(f"/notes/big-{client_id % 4}", json={"content": payload})
+        elif i % 2:
+            kind = "read"
+            response = await client.get(f"/notes/small-{i % 16}")
+        else:
+            kind = "read"
+            response = await client.get("/notes/")
+        response.raise_for_status()
+        latencies[kind].append((time.perf_counter() - start) * 1000)
+
+async def run_scenario(app, args):
+    """
+    Seed the notes directory and run the workload against the app.
+    """
+    payload = "x" * args.write_size
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(16):
+            await client.post("/notes/", json={"title": f"small-{i}", "content": "small note"})
+        for i in range(4):
+            await client.post("/notes/", json={"title": f"big-{i}", "content": payload})
+
+        latencies = {"read": [], "write": []}
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            client_loop(client, c, args.requests, args.write_ratio, payload, latencies)
+            for c in range(args.clients)
+        ])
+        elapsed = time.perf_counter() - start
+
+    total = len(latencies["read"]) + len(latencies["write"])
+    return {
+        "requests": total,
+        "throughput": total / elapsed,
+        "read_p50": statistics.median(latencies["read"]),
+        "read_p99": percentile(latencies["read"], 99),
+        "write_p99": percentile(latencies["write"], 99) if latencies["write"] else 0.0
+    }
+
+def run_small_notes(file_handler, count, size):
+    """
+    Create, then read back, many small notes directly through file_handler
+    (no HTTP) and return (creates/s, reads/s).
+    """
+    body = "n" * size
+    start = time.perf_counter()
+    for i in range(count):
+        file_handler.save_note(f"note-{i}", body)
+    created = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(count):
+        file_handler.read_note(f"note-{i}")
+    read = time.perf_counter() - start
+    return count / created, count / read
+
+def small_notes_main(args, file_handler):
+    """
+    Compare small-note create/read throughput across storage backends.
+    """
+    print(f"{'backend':>8} {'notes':>7} {'creates/s':>10} {'reads/s':>10}")
+    for backend in args.backends:
+        work_dir = tempfile.mkdtemp(prefix="notes-bench-", dir=args.dir)
+        cwd = os.getcwd()
+        try:
+            os.chdir(work_dir)
+            file_handler.configure_backend(backend)
+            creates, reads = run_small_notes(file_handler, args.small_notes, args.small_size)
+            file_handler.configure_backend("files")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"{backend:>8} {args.small_notes:>7} {creates:>10.0f} {reads:>10.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Notes API mixed read/write latency benchmark")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of requests that write")
+    parser.add_argument("--write-size", type=int, default=2 * 1024 * 1024, help="Bytes per written note")
+    parser.add_argument("--dir", default=None,
+                        help="Parent directory for the scratch notes directory (e.g. a network mount)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 8],
+                        help="I/O pool sizes to compare (0 = inline on the event loop)")
+    parser.add_argument("--durability", choices=["off", "on"], nargs="+", default=["off", "on"],
+                        help="Write modes to compare (on = fsync with group commit)")
+    parser.add_argument("--window-ms", type=float, nargs="+", default=[0.0],
+                        help="Group commit windows to compare in durable mode")
+    parser.add_argument("--backends", choices=["files", "packed"], nargs="+", default=["files"],
+                        help="Storage backends to compare")
+    parser.add_argument("--small-notes", type=int, default=0,
+                        help="Instead of the HTTP workload, time creating and reading this many small notes")
+    parser.add_argument("--small-size", type=int, default=200, help="Bytes per small note")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    import file_handler
+    from main import app
+
+    if args.small_notes:
+        small_notes_main(args, file_handler)
+        return
+
+    modes = [("off", 0.0)] if "off" in args.durability else []
+    if "on" in args.durability:
+        modes += [("on", window) for window in args.window_ms]
+
+    print(f"{'backend':>8} {'io workers':>10} {'durable':>7} {'window':>6} {'requests':>9} {'req/s':>9} "
+          f"{'read p50':>9} {'read p99':>9} {'write p99':>9} {'writes/group':>12} {'fsyncs/write':>12}")
+    for backend, workers, (durability, window) in itertools.product(args.backends, args.workers, modes):
+        work_dir = tempfile.mkdtemp(prefix="notes-bench-", dir=args.dir)
+        cwd = os.getcwd()
+        try:
+            os.chdir(work_dir)
+            file_handler.configure_backend(backend)
+            file_handler.configure_io_pool(workers)
+            file_handler.configure_durability(durability == "on", window)
+            result = asyncio.run(run_scenario(app, args))
+            committer = file_handler._group_commit
+            file_handler.configure_backend("files")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        batching = f"{committer.writes / committer.groups:.1f}" if committer and committer.groups else "-"
+        fsyncs = f"{committer.fsyncs / committer.writes:.2f}" if committer and committer.writes else "-"
+        print(f"{backend:>8} {workers:>10} {durability:>7} {window:>6g} {result['requests']:>9} "
+              f"{result['throughput']:>9.1f} {result['read_p50']:>9.2f} "
+              f"{result['read_p99']:>9.2f} {result['write_p99']:>9.2f} {batching:>12} {fsyncs:>12}")
+
+if __name__ == "__main__":
+    main()
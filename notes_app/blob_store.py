@@ -0,0 +1,184 @@
+# blob_store.py
+import contextlib
+import fcntl
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, BinaryIO, Callable, Iterator, Optional
+
+class BlobStore:
+    """
+    Content-addressed store for note bodies.
+
+    Each distinct body is stored once under its SHA-256 digest, so notes with
+    identical content share a single blob. Bodies of at least
+    compress_threshold bytes are stored gzip-compressed. When commit is set
+    (durable writes), new blobs are fsynced and renamed into place through
+    it instead of a plain rename.
+
+    The number of notes referencing each blob is kept on disk next to it
+    ({blob}.refs) and only changed under an exclusive file lock on that
+    file, so every process sharing the directory sees the same count and a
+    blob is deleted only when no note anywhere uses it. A blob stored before
+    counts were kept gets its count from count_refs (a scan of the note
+    references) the first time it is counted.
+    """
+
+    def __init__(self, root: Path, compress_threshold: int,
+                 commit: Optional[Callable[..., None]] = None,
+                 count_refs: Optional[Callable[[str], int]] = None):
+        self.root = root
+        self.compress_threshold = compress_threshold
+        self.commit = commit
+        self.count_refs = count_refs
+
+    @staticmethod
+    def blob_key(ref: Dict[str, Any]) -> str:
+        """
+        Get the blob file name a note reference points to.
+
+        Args:
+            ref: Note reference with sha256 and compressed fields
+
+        Returns:
+            Blob file name
+        """
+        return ref["sha256"] + (".gz" if ref["compressed"] else "")
+
+    def blob_path(self, ref: Dict[str, Any]) -> Path:
+        """
+        Get the path of the blob a note reference points to.
+
+        Args:
+            ref: Note reference
+
+        Returns:
+            Path of the blob file
+        """
+        return self.root / ref["sha256"][:2] / self.blob_key(ref)
+
+    def refs_path(self, ref: Dict[str, Any]) -> Path:
+        """
+        Get the path of the reference count file of a blob.
+        """
+        return self.root / ref["sha256"][:2] / f"{self.blob_key(ref)}.refs"
+
+    @contextlib.contextmanager
+    def _count(self, ref: Dict[str, Any]) -> Iterator[list]:
+        """
+        Lock a blob's reference count file and yield [count] (None if the
+        blob has never been counted); the count left in it is written back.
+        """
+        path = self.refs_path(ref)
+        os.makedirs(path.parent, exist_ok=True)
+        with open(path, 'a+', encoding='ascii') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            f.seek(0)
+            text = f.read().strip()
+            holder = [int(text) if text else None]
+            yield holder
+            f.seek(0)
+            f.truncate()
+            f.write(str(holder[0]))
+            f.flush()
+
+    def _recount(self, ref: Dict[str, Any]) -> int:
+        return self.count_refs(self.blob_key(ref)) if self.count_refs is not None else 0
+
+    def put(self, data: bytes) -> Dict[str, Any]:
+        """
+        Store a note body, reusing an existing blob with the same content,
+        and count one more reference to it.
+
+        Call before writing the note reference; if that write fails the
+        blob is kept (never wrongly deleted).
+
+        Args:
+            data: UTF-8 encoded note body
+
+        Returns:
+            Note reference (sha256, logical size, compressed flag)
+        """
+        ref = {
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "size": len(data),
+            "compressed": len(data) >= self.compress_threshold
+        }
+        with self._count(ref) as count:
+            if count[0] is None:
+                count[0] = self._recount(ref)
+            self._write_blob(ref, data)
+            count[0] += 1
+        return ref
+
+    def _write_blob(self, ref: Dict[str, Any], data: bytes) -> None:
+        path = self.blob_path(ref)
+        if path.exists():
+            return
+
+        os.makedirs(path.parent, exist_ok=True)
+        payload = gzip.compress(data) if ref["compressed"] else data
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+            if self.commit is not None:
+                f.flush()
+                self.commit(f.fileno(), temp_path, path)
+        if self.commit is None:
+            os.replace(temp_path, path)
+
+    def read(self, ref: Dict[str, Any]) -> bytes:
+        """
+        Read a full note body.
+
+        Args:
+            ref: Note reference
+
+        Returns:
+            Decompressed note body
+        """
+        with self.open(ref) as f:
+            return f.read()
+
+    def open(self, ref: Dict[str, Any]) -> BinaryIO:
+        """
+        Open a note body for streaming reads.
+
+        Compressed blobs are decompressed on the fly; seeking forward skips
+        decompressed data without buffering it.
+
+        Args:
+            ref: Note reference
+
+        Returns:
+            Binary file object positioned at the start of the body
+        """
+        path = self.blob_path(ref)
+        if ref["compressed"]:
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+    def release(self, ref: Dict[str, Any]) -> None:
+        """
+        Count one reference to a blob less, deleting the blob when no note
+        uses it any more.
+
+        Call after the note reference was removed or replaced. The count
+        file stays (at 0), since another process may be waiting on its lock.
+
+        Args:
+            ref: Note reference
+        """
+        with self._count(ref) as count:
+            if count[0] is None:
+                # Never counted: the references left on disk are the count
+                count[0] = self._recount(ref)
+            else:
+                count[0] = max(count[0] - 1, 0)
+            if count[0] == 0:
+                try:
+                    os.remove(self.blob_path(ref))
+                except FileNotFoundError:
+                    pass
@@ -1,185 +1,1605 @@
 # file_handler.py
 import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from fastapi import HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Callable, BinaryIO, Iterator, List, Tuple
 import datetime
+import threading
+import base64
+import bisect
+import json
+import io
+import hashlib
+import tarfile
+import tempfile
+import contextlib
+from email.utils import formatdate, parsedate_to_datetime
+from search_index import SearchIndex
+from blob_store import BlobStore
+from group_commit import GroupCommit
+from pack_store import PackStore
+from revision_store import RevisionStore
 
 NOTES_DIR = Path('notes')
 
+# Storage mode: "plain" writes each note body to {title}.txt; "compact"
+# writes a small {title}.ref pointer to a content-addressed blob that is
+# shared by notes with identical bodies and gzip-compressed above a threshold
+NOTES_STORAGE_MODE = os.environ.get("NOTES_STORAGE_MODE", "plain")
+NOTES_COMPRESS_THRESHOLD = int(os.environ.get("NOTES_COMPRESS_THRESHOLD", "4096"))
+BLOBS_DIR = NOTES_DIR / '.blobs'
+
+# Directory layout: "flat" keeps every note directly in NOTES_DIR;
+# "sharded" nests notes under 256 hash-prefix subdirectories (notes/3f/...);
+# "migrating" writes the sharded layout but also reads flat notes, for use
+# while an existing directory is converted with migrate_layout.py
+NOTES_LAYOUT = os.environ.get("NOTES_LAYOUT", "flat")
+
+# Storage backend: "files" stores each note as its own file (in the storage
+# mode and layout above); "packed" appends every note to a single data file
+# with an offset index, which avoids per-note inode and directory overhead
+# for small notes. The packed backend expects a single writing process.
+NOTES_BACKEND = os.environ.get("NOTES_BACKEND", "files")
+PACK_FILE = NOTES_DIR / 'notes.pack'
+
+# Revision history: every change to a note is kept in NOTES_DIR/.history as
+# a delta against the previous version, with periodic full snapshots so any
+# revision can be rebuilt cheaply. History starts at a note's first change,
+# so creating notes costs nothing extra. NOTES_HISTORY=0 turns recording off.
+NOTES_HISTORY = os.environ.get("NOTES_HISTORY", "1") == "1"
+NOTES_HISTORY_SNAPSHOT_EVERY = int(os.environ.get("NOTES_HISTORY_SNAPSHOT_EVERY", "50"))
+HISTORY_DIR = NOTES_DIR / '.history'
+
+# Durable writes: off, notes are written in place and a crash can leave a
+# half-written note; on, every write goes to a temp file that is fsynced and
+# renamed into place. Concurrent durable writes share one fsync pass (group
+# commit), optionally waiting NOTES_GROUP_COMMIT_WINDOW_MS for more writers.
+NOTES_DURABLE = os.environ.get("NOTES_DURABLE", "0") == "1"
+NOTES_GROUP_COMMIT_WINDOW_MS = float(os.environ.get("NOTES_GROUP_COMMIT_WINDOW_MS", "0"))
+
+# Persisted full-text index, stored next to the notes directory, with its
+# change journal ({file}.log) appended to on every index change
+SEARCH_INDEX_FILE = NOTES_DIR.with_name(f"{NOTES_DIR.name}_search_index.json")
+
+# Size of the thread pool running blocking note I/O off the event loop.
+# 0 runs file operations inline on the event loop.
+NOTES_IO_WORKERS = int(os.environ.get("NOTES_IO_WORKERS", "8"))
+
+# In-process metadata index: title -> listing entry (title, size, timestamps).
+# Kept up to date by save/update/delete and rebuilt when the directory's
+# mtime shows that another process added or removed note files.
+_metadata_index: Dict[str, Dict[str, Any]] = {}
+_index_dir_mtime: Optional[int] = None
+_index_lock = threading.RLock()
+_index_generation = 0
+
+# Sorted (value, title) keys per sort field, kept in step with the metadata
+# index so a page of listing results costs O(log n + page size)
+SORT_FIELDS = {"title": "title", "modified_at": "modified_at", "size": "file_size"}
+_sorted_keys: Dict[str, list] = {sort: [] for sort in SORT_FIELDS}
+
+# Compact storage: blob store, which keeps the number of notes referencing
+# each blob on disk (counted from the .ref files for blobs it has not
+# counted yet)
+_blob_store = BlobStore(BLOBS_DIR, NOTES_COMPRESS_THRESHOLD)
+
+# Revision history of every note
+_history = RevisionStore(HISTORY_DIR, NOTES_HISTORY_SNAPSHOT_EVERY)
+
+# Full-text search index, loaded on first search
+_search_index = SearchIndex()
+_search_generation = -1
+_search_lock = threading.RLock()
+_search_stale: set = set()
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+
+_group_commit: Optional[GroupCommit] = None
+
+# Per-note locks (striped by title hash, so their number stays fixed).
+# Every write to a note holds its lock, so a create's existence check or an
+# If-Match check and the write it guards cannot interleave with another
+# write to the same note
+_note_locks = [threading.RLock() for _ in range(256)]
+
+def _note_lock(title: str) -> threading.RLock:
+    """
+    Get the lock serializing changes to a note within this process.
+    """
+    return _note_locks[hash(title) % len(_note_locks)]
+
+def configure_io_pool(workers: int) -> None:
+    """
+    (Re)create the bounded thread pool used for note I/O.
+    
+    Args:
+        workers: Maximum number of worker threads; 0 disables the pool
+    """
+    global _io_executor, NOTES_IO_WORKERS
+    
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=True)
+    NOTES_IO_WORKERS = workers
+    _io_executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="notes-io"
+    ) if workers > 0 else None
+
+async def run_io(func: Callable, *args, **kwargs):
+    """
+    Run a blocking file operation on the note I/O thread pool.
+    
+    Args:
+        func: File handler function to call
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+        
+    Returns:
+        Result of func
+    """
+    if _io_executor is None:
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(func, *args, **kwargs))
+
+configure_io_pool(NOTES_IO_WORKERS)
+
+def configure_durability(durable: bool, window_ms: float = 0.0) -> None:
+    """
+    Switch durable (fsynced, atomically renamed) note writes on or off.
+    
+    Args:
+        durable: Whether writes must reach the disk before they return
+        window_ms: Extra time a group commit waits for concurrent writers
+    """
+    global _group_commit, NOTES_DURABLE, NOTES_GROUP_COMMIT_WINDOW_MS
+    
+    NOTES_DURABLE = durable
+    NOTES_GROUP_COMMIT_WINDOW_MS = window_ms
+    _group_commit = GroupCommit(window_ms / 1000) if durable else None
+    _blob_store.commit = _group_commit.commit if durable else None
+
+configure_durability(NOTES_DURABLE, NOTES_GROUP_COMMIT_WINDOW_MS)
+
 def ensure_notes_dir():
     """
-    Ensure the notes directory exists.
+    Ensure the notes directory exists.
+    
+    Raises:
+        HTTPException: If directory cannot be created
+    """
+    try:
+        os.makedirs(NOTES_DIR, exist_ok=True)
+    except OSError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to create notes directory: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Unexpected error creating notes directory: {str(e)}"
+        )
+
+def shard_name(title: str) -> str:
+    """
+    Get the hash-prefix subdirectory a note belongs to in the sharded layout.
+    
+    Args:
+        title: Note title
+        
+    Returns:
+        Two hex characters of the MD5 digest of the title
+    """
+    return hashlib.md5(title.encode('utf-8')).hexdigest()[:2]
+
+def get_note_dir(title: str, layout: Optional[str] = None) -> Path:
+    """
+    Get the directory a note is written to.
+    
+    Args:
+        title: Note title
+        layout: Directory layout, defaults to NOTES_LAYOUT
+        
+    Returns:
+        NOTES_DIR for the flat layout, or the note's shard subdirectory
+    """
+    layout = layout or NOTES_LAYOUT
+    if layout == "flat":
+        return NOTES_DIR
+    return NOTES_DIR / shard_name(title)
+
+def get_file_path(title: str, layout: Optional[str] = None) -> Path:
+    """
+    Get the file path for a note title.
+    
+    Args:
+        title: Note title
+        layout: Directory layout, defaults to NOTES_LAYOUT
+        
+    Returns:
+        Path object for the note file
+    """
+    return get_note_dir(title, layout) / f"{title}.txt"
+
+def get_ref_path(title: str, layout: Optional[str] = None) -> Path:
+    """
+    Get the path of the blob reference for a note in compact storage.
+    
+    Args:
+        title: Note title
+        layout: Directory layout, defaults to NOTES_LAYOUT
+        
+    Returns:
+        Path object for the note's .ref file
+    """
+    return get_note_dir(title, layout) / f"{title}.ref"
+
+def _read_layouts() -> tuple:
+    """
+    Get the directory layouts notes are read from, in order of precedence.
+    """
+    if NOTES_LAYOUT == "migrating":
+        return ("sharded", "flat")
+    return (NOTES_LAYOUT,)
+
+def _touch_notes_dir() -> None:
+    """
+    Bump the notes directory mtime after a change inside a shard.
+    
+    Creating or removing files in a shard only changes that shard's mtime,
+    so writers also touch NOTES_DIR to keep change detection a single stat.
+    """
+    if NOTES_LAYOUT != "flat":
+        os.utime(NOTES_DIR)
+
+def _is_ref(path: Path) -> bool:
+    """
+    Check whether a note path is a compact-storage blob reference.
+    """
+    return path.suffix == '.ref'
+
+def _locate_note(title: str) -> Optional[Path]:
+    """
+    Find the file holding a note in either storage mode.
+    
+    A blob reference takes precedence over a plain .txt file, so notes
+    stay readable while a directory is switched between modes. In the
+    migrating layout, sharded files take precedence over flat ones.
+    
+    Args:
+        title: Note title
+        
+    Returns:
+        Path of the .ref or .txt file, or None if the note doesn't exist
+    """
+    for layout in _read_layouts():
+        ref_path = get_ref_path(title, layout)
+        if os.path.exists(ref_path):
+            return ref_path
+        file_path = get_file_path(title, layout)
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+def _load_ref(ref_path: Path) -> Dict[str, Any]:
+    """
+    Load a blob reference (sha256, logical size, compressed flag).
+    """
+    with open(ref_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_ref(ref_path: Path, ref: Dict[str, Any]) -> None:
+    """
+    Atomically write a blob reference file.
+    """
+    if NOTES_DURABLE:
+        _write_durable(ref_path, json.dumps(ref))
+        return
+    temp_path = ref_path.with_name(f"{ref_path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(ref, f)
+    os.replace(temp_path, ref_path)
+
+def _write_durable(path: Path, text: str) -> None:
+    """
+    Write a file through a fsynced temp file renamed into place, so a crash
+    leaves either the old or the new version. The fsync and rename are
+    batched with concurrent writers (only the directory fsync is shared).
+    """
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            _group_commit.commit(f.fileno(), Path(temp_name), path)
+    except BaseException:
+        try:
+            os.remove(temp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+def _advance_mtime(f, before: os.stat_result) -> None:
+    """
+    Make sure an in-place write (append or patch) moves the note's mtime
+    forward, so its ETag changes.
+    
+    The kernel stamps writes with a coarse clock, so a same-size patch
+    within one tick would leave inode, size and mtime unchanged. Bumping
+    the mtime 1 ns past its previous value makes mtime_ns count every write.
+    
+    Args:
+        f: Note file the write went to
+        before: Result of os.fstat on the file before the write
+    """
+    f.flush()
+    after = os.fstat(f.fileno())
+    if after.st_mtime_ns <= before.st_mtime_ns:
+        os.utime(f.fileno(), ns=(after.st_atime_ns, before.st_mtime_ns + 1))
+
+def _sync_in_place(f) -> None:
+    """
+    Flush an in-place write (append or patch) to disk in durable mode.
+    """
+    if NOTES_DURABLE:
+        f.flush()
+        _group_commit.commit(f.fileno())
+
+def _count_blob_refs(key: str) -> int:
+    """
+    Count the note references (in every layout) pointing at a blob, for a
+    blob stored before reference counts were kept on disk.
+    """
+    count = 0
+    for pattern in ('*.ref', '??/*.ref'):
+        for ref_path in NOTES_DIR.glob(pattern):
+            try:
+                if BlobStore.blob_key(_load_ref(ref_path)) == key:
+                    count += 1
+            except (OSError, ValueError, KeyError):
+                continue
+    return count
+
+_blob_store.count_refs = _count_blob_refs
+
+def _blob_ref_release(ref: Dict[str, Any]) -> None:
+    """
+    Drop one note's reference to a blob, deleting the blob when unused.
+    """
+    _blob_store.release(ref)
+
+def _note_size(path: Path, stat: os.stat_result) -> int:
+    """
+    Get the logical (uncompressed) size of a note body in bytes.
+    """
+    if _is_ref(path):
+        return _load_ref(path)["size"]
+    return stat.st_size
+
+def _read_content(path: Path) -> str:
+    """
+    Read a note body from a .txt file or through its blob reference.
+    """
+    if _is_ref(path):
+        return _blob_store.read(_load_ref(path)).decode('utf-8')
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _open_content(path: Path) -> BinaryIO:
+    """
+    Open a note body as a binary stream in either storage mode.
+    """
+    if _is_ref(path):
+        return _blob_store.open(_load_ref(path))
+    return open(path, 'rb')
+
+def _write_content(title: str, content: str, previous: Optional[Path]) -> tuple:
+    """
+    Write a note body in the configured storage mode and layout.
+    
+    Any previous version is replaced: an older blob reference is released
+    and a file left over from the other storage mode or layout is removed.
+    
+    Args:
+        title: Note title
+        content: New note body
+        previous: Current file of the note, if it exists
+        
+    Returns:
+        Tuple of the written .txt or .ref path and whether directory
+        entries were created, replaced or removed
+    """
+    previous_ref = _load_ref(previous) if previous is not None and _is_ref(previous) else None
+    os.makedirs(get_note_dir(title), exist_ok=True)
+    
+    if NOTES_STORAGE_MODE == "compact":
+        ref = _blob_store.put(content.encode('utf-8'))
+        path = get_ref_path(title)
+        _write_ref(path, ref)
+    else:
+        path = get_file_path(title)
+        if NOTES_DURABLE:
+            _write_durable(path, content)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+    
+    if previous is not None and previous != path:
+        os.remove(previous)
+    if previous_ref is not None:
+        _blob_ref_release(previous_ref)
+    
+    dir_changed = _is_ref(path) or previous != path
+    if dir_changed:
+        _touch_notes_dir()
+    return path, dir_changed
+
+def _durable_sync() -> Optional[Callable[[int], None]]:
+    """
+    Get the fsync hook for packed writes in durable mode.
+    """
+    return _group_commit.commit if NOTES_DURABLE else None
+
+class FileStorage:
+    """
+    Default storage backend: one .txt file (or .ref pointer in compact
+    storage) per note under NOTES_DIR, in the configured directory layout.
+    
+    A backend locates notes by title and returns an opaque location that
+    the other methods accept. The note functions below only talk to the
+    backend through these methods, so the packed backend can replace it.
+    """
+    
+    def locate(self, title: str) -> Optional[Path]:
+        """Find a note, or None if it doesn't exist."""
+        return _locate_note(title)
+    
+    def stat(self, location: Path) -> os.stat_result:
+        """Get the stat data a note's metadata and ETag are built from."""
+        return os.stat(location)
+    
+    def size(self, location: Path, stat: os.stat_result) -> int:
+        """Get the logical size of a note body in bytes."""
+        return _note_size(location, stat)
+    
+    def read(self, location: Path) -> str:
+        """Read a whole note body."""
+        return _read_content(location)
+    
+    def open(self, location: Path) -> BinaryIO:
+        """Open a note body as a binary stream."""
+        return _open_content(location)
+    
+    def is_plain_file(self, location: Path) -> bool:
+        """Check whether a note can be sent as a file and edited in place."""
+        return not _is_ref(location)
+    
+    def write(self, title: str, content: str, previous: Optional[Path]) -> tuple:
+        """Write a note body; returns its location and whether the set of notes changed."""
+        return _write_content(title, content, previous)
+    
+    def remove(self, location: Path) -> None:
+        """Delete a note."""
+        ref = _load_ref(location) if _is_ref(location) else None
+        os.remove(location)
+        _touch_notes_dir()
+        if ref is not None:
+            _blob_ref_release(ref)
+    
+    def scan(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Build metadata index entries for every note by scanning the notes
+        directory.
+        """
+        entries = {}
+        
+        # Scan lowest-precedence layout first so later entries win, matching
+        # _locate_note
+        for layout in reversed(_read_layouts()):
+            prefix = '' if layout == "flat" else '??/'
+            for file_path in NOTES_DIR.glob(f'{prefix}*.txt'):
+                try:
+                    entries[file_path.stem] = _index_entry(file_path.stem, os.stat(file_path))
+                except OSError:
+                    # Skip files that can't be accessed
+                    continue
+            
+            # Blob references take precedence over plain files
+            for ref_path in NOTES_DIR.glob(f'{prefix}*.ref'):
+                try:
+                    ref = _load_ref(ref_path)
+                    entries[ref_path.stem] = _index_entry(ref_path.stem, os.stat(ref_path), ref["size"])
+                except (OSError, ValueError, KeyError):
+                    continue
+        return entries
+    
+    def change_token(self) -> int:
+        """
+        Get a value that changes when notes are created or removed by
+        another process: the notes directory mtime.
+        """
+        return os.stat(NOTES_DIR).st_mtime_ns
+    
+    def flush(self) -> None:
+        """Persist buffered backend state (nothing to do for files)."""
+    
+    def close(self) -> None:
+        """Release backend resources (nothing to do for files)."""
+
+class PackedNote:
+    """
+    Location of a note in the packed backend.
+    """
+    
+    __slots__ = ("pack_path", "title")
+    
+    def __init__(self, pack_path: Path, title: str):
+        self.pack_path = pack_path
+        self.title = title
+    
+    def __str__(self) -> str:
+        return f"{self.pack_path}#{self.title}"
+
+class PackedStorage:
+    """
+    Packed storage backend: every note is a record in one append-only data
+    file with an in-memory offset index (pack_store.py). Creates and
+    updates are a single append, reads slice a memory map, and deleted or
+    overwritten records are reclaimed by background compaction.
+    
+    Implements the same methods as FileStorage. Notes are never plain
+    files, so appends and patches rewrite the note and raw reads stream it
+    from memory.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._store: Optional[PackStore] = None
+        self._open_lock = threading.Lock()
+    
+    @property
+    def store(self) -> PackStore:
+        """The pack store, opened (and replayed) on first use."""
+        if self._store is None:
+            with self._open_lock:
+                if self._store is None:
+                    self._store = PackStore(self.path)
+        return self._store
+    
+    def _body(self, location: PackedNote) -> bytes:
+        body = self.store.read(location.title)
+        if body is None:
+            raise FileNotFoundError(f"Note '{location.title}' no longer exists")
+        return body
+    
+    def locate(self, title: str) -> Optional[PackedNote]:
+        """Find a note, or None if it doesn't exist."""
+        return PackedNote(self.path, title) if self.store.get(title) is not None else None
+    
+    def stat(self, location: PackedNote):
+        """Get the stat-like view (sequence number, size, times) of a note."""
+        record = self.store.get(location.title)
+        if record is None:
+            raise FileNotFoundError(f"Note '{location.title}' no longer exists")
+        return self.store.stat(record)
+    
+    def size(self, location: PackedNote, stat) -> int:
+        """Get the size of a note body in bytes."""
+        return stat.st_size
+    
+    def read(self, location: PackedNote) -> str:
+        """Read a whole note body."""
+        return self._body(location).decode('utf-8')
+    
+    def open(self, location: PackedNote) -> BinaryIO:
+        """Open a note body as a binary stream."""
+        return io.BytesIO(self._body(location))
+    
+    def is_plain_file(self, location: PackedNote) -> bool:
+        """Packed notes are never standalone files."""
+        return False
+    
+    def write(self, title: str, content: str, previous: Optional[PackedNote]) -> tuple:
+        """Append a new version of a note; returns its location and whether it was created."""
+        self.store.put(title, content.encode('utf-8'), _durable_sync())
+        return PackedNote(self.path, title), previous is None
+    
+    def remove(self, location: PackedNote) -> None:
+        """Delete a note by appending a tombstone."""
+        self.store.delete(location.title, _durable_sync())
+    
+    def scan(self) -> Dict[str, Dict[str, Any]]:
+        """Build metadata index entries from the offset index."""
+        store = self.store
+        return {title: _index_entry(title, store.stat(record)) for title, record in store.items()}
+    
+    def change_token(self) -> int:
+        """The packed backend has a single writer, so nothing changes behind our back."""
+        return 0
+    
+    def flush(self) -> None:
+        """Persist the offset index."""
+        if self._store is not None:
+            self._store.save_index()
+    
+    def close(self) -> None:
+        """Wait for compaction, persist the offset index and close the data file."""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+_storage = None
+
+def configure_backend(backend: str) -> None:
+    """
+    Select the storage backend, closing the previous one.
+    
+    The metadata index is rebuilt from the new backend on next use.
+    
+    Args:
+        backend: "files" or "packed"
+    """
+    global _storage, NOTES_BACKEND, _index_dir_mtime
+    
+    if backend not in ("files", "packed"):
+        raise ValueError(f"Unknown storage backend '{backend}'")
+    with _index_lock:
+        if _storage is not None:
+            _storage.close()
+        NOTES_BACKEND = backend
+        _storage = PackedStorage(PACK_FILE) if backend == "packed" else FileStorage()
+        _index_dir_mtime = None
+
+configure_backend(NOTES_BACKEND)
+
+def flush_storage() -> None:
+    """
+    Persist buffered storage backend state, e.g. on shutdown.
+    """
+    try:
+        _storage.flush()
+    except OSError:
+        # The packed backend replays its data file if the index is stale
+        pass
+
+def _history_lock(title: str):
+    """
+    Serialize a note write with its revision record, so revisions are
+    recorded in the order the writes happened.
+    """
+    return _history.lock_for(title) if NOTES_HISTORY else contextlib.nullcontext()
+
+def _seed_history(title: str, location) -> None:
+    """
+    Record the current version of a note without history as its first
+    revision, before the note is changed. Call with the history lock held.
+    """
+    if NOTES_HISTORY and location is not None and not _history.has_history(title):
+        stat = _storage.stat(location)
+        _history.record(
+            title, _storage.read(location), _durable_sync(),
+            created_at=datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
+        )
+
+def _record_revision(title: str, content: str) -> None:
+    """
+    Record the new content of a note that already has history. Call with
+    the history lock held.
+    """
+    if NOTES_HISTORY and _history.has_history(title):
+        _history.record(title, content, _durable_sync())
+
+def _record_edit(title: str, location, previous_size: int, edit: list, size: int) -> None:
+    """
+    Record an in-place change (append or patch) of a note that already has
+    history from the bytes it changed, so the note is not read and diffed.
+    Call with the history lock held.
+    
+    Args:
+        title: Note title
+        location: Location of the note, read only if a snapshot is due
+        previous_size: Note size in bytes before the change
+        edit: Byte ranges of the previous version and inserted text making
+            up the new one, as in revision_store.apply_edit
+        size: Note size in bytes after the change
+    """
+    if NOTES_HISTORY and _history.has_history(title):
+        _history.record_edit(
+            title, previous_size, [op for op in edit if op and not (isinstance(op, list) and op[0] == op[1])], size,
+            lambda: _storage.read(location), _durable_sync()
+        )
+
+def _write_note(title: str, content: str, previous) -> tuple:
+    """
+    Write a note through the storage backend and record the revision.
+    
+    Returns:
+        Tuple of the note's location and whether the set of notes changed
+    """
+    with _history_lock(title):
+        _seed_history(title, previous)
+        result = _storage.write(title, content, previous)
+        _record_revision(title, content)
+        return result
+
+def build_file_info(file_path: Path, stat: os.stat_result, size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the file information dictionary for a note from its stat data.
+    
+    Args:
+        file_path: Path of the note file
+        stat: Result of os.stat on the note file
+        size: Logical note size, if it differs from the file size
+        
+    Returns:
+        Dictionary with file path, size and timestamps
+    """
+    return {
+        "file_path": str(file_path),
+        "file_size": stat.st_size if size is None else size,
+        "created_at": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        "modified_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        **build_validators(stat)
+    }
+
+def build_validators(stat: os.stat_result) -> Dict[str, str]:
+    """
+    Build HTTP cache validators for a note from its stat data.
+    
+    The ETag changes whenever the note file is rewritten, resized or
+    replaced (in-place writes always advance the mtime), so it can be
+    checked with a stat and no read.
+    
+    Args:
+        stat: Result of os.stat on the note (or .ref) file
+        
+    Returns:
+        Dictionary with etag and last_modified header values
+    """
+    return {
+        "etag": f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+        "last_modified": formatdate(stat.st_mtime, usegmt=True)
+    }
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """
+    Check an If-Match / If-None-Match header against an ETag.
+    
+    If-Match uses strong comparison, so a weak tag (W/"...") never matches;
+    If-None-Match uses weak comparison, which ignores the W/ prefix.
+    
+    Args:
+        header: Comma-separated list of entity tags or "*"
+        etag: Current (strong) ETag of the note
+        weak: Use weak comparison (for If-None-Match)
+        
+    Returns:
+        True if the header lists the ETag or is "*"
+    """
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    if weak:
+        tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+    return "*" in tags or etag in tags
+
+def not_modified_since(header: Optional[str], stat: os.stat_result) -> bool:
+    """
+    Check whether a note is unchanged since an If-Modified-Since date.
+    
+    Args:
+        header: If-Modified-Since header value
+        stat: Result of os.stat on the note file
+        
+    Returns:
+        True if the note was not modified after the given date
+    """
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat.st_mtime) <= since
+
+def check_not_modified(title: str, if_none_match: Optional[str] = None,
+                       if_modified_since: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    Evaluate conditional GET headers for a note without opening it.
+    
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    
+    Args:
+        title: Note title
+        if_none_match: If-None-Match header value
+        if_modified_since: If-Modified-Since header value
+        
+    Returns:
+        The note's validators if the client copy is current (answer 304),
+        None if the note must be sent
+        
+    Raises:
+        HTTPException: If note doesn't exist or cannot be accessed
+    """
+    if not if_none_match and not if_modified_since:
+        return None
+    
+    try:
+        file_path = _storage.locate(title)
+        
+        # Check if file exists
+        if file_path is None:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Note '{title}' not found"
+            )
+        
+        stat = _storage.stat(file_path)
+        validators = build_validators(stat)
+        if if_none_match:
+            current = etag_matches(if_none_match, validators["etag"], weak=True)
+        else:
+            current = not_modified_since(if_modified_since, stat)
+        return validators if current else None
+        
+    except HTTPException:
+        raise
+    except OSError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to access note '{title}': {str(e)}"
+        )
+
+def _check_if_match(title: str, if_match: str) -> None:
+    """
+    Enforce an If-Match precondition before modifying a note.
+    
+    Callers hold the note's lock across the check and the write.
+    
+    Raises:
+        HTTPException: 404 if the note doesn't exist, 412 if it changed
+            since the client read it
+    """
+    file_path = _storage.locate(title)
+    if file_path is None:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Note '{title}' not found"
+        )
+    if not etag_matches(if_match, build_validators(_storage.stat(file_path))["etag"]):
+        raise HTTPException(
+            status_code=412, 
+            detail=f"Note '{title}' was modified since it was read (ETag mismatch)"
+        )
+
+def _index_entry(title: str, stat: os.stat_result, size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build a metadata index entry as returned by list_notes.
+    """
+    return {
+        "title": title,
+        "file_size": stat.st_size if size is None else size,
+        "created_at": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        "modified_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
+    }
+
+def _dir_mtime() -> int:
+    """
+    Get the storage backend's change token (the notes directory
+    modification time in nanoseconds for the file backend).
+    """
+    return _storage.change_token()
+
+def _rebuild_metadata_index() -> None:
+    """
+    Rebuild the metadata index by scanning the storage backend.
+    
+    Must be called with the index lock held.
+    """
+    global _index_dir_mtime, _index_generation
+    
+    dir_mtime = _dir_mtime()
+    entries = _storage.scan()
+    
+    _metadata_index.clear()
+    _metadata_index.update(entries)
+    for sort, field in SORT_FIELDS.items():
+        _sorted_keys[sort] = sorted((entry[field], title) for title, entry in entries.items())
+    _index_dir_mtime = dir_mtime
+    _index_generation += 1
+
+def refresh_metadata_index() -> None:
+    """
+    Rebuild the metadata index if the notes directory changed on disk.
+    
+    Costs a single stat of the notes directory when nothing changed.
+    Note files created or removed by other processes bump the directory
+    mtime (writers touch it for sharded layouts) and trigger a full rescan; in-place content edits made outside
+    this process are picked up the next time the note is read.
+    """
+    with _index_lock:
+        if _index_dir_mtime is None or _dir_mtime() != _index_dir_mtime:
+            _rebuild_metadata_index()
+
+def _sorted_remove(entry: Dict[str, Any]) -> None:
+    """
+    Remove an index entry from the sorted key lists.
+    """
+    for sort, field in SORT_FIELDS.items():
+        keys = _sorted_keys[sort]
+        key = (entry[field], entry["title"])
+        position = bisect.bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+
+def _sorted_insert(entry: Dict[str, Any]) -> None:
+    """
+    Insert an index entry into the sorted key lists.
+    """
+    for sort, field in SORT_FIELDS.items():
+        bisect.insort(_sorted_keys[sort], (entry[field], entry["title"]))
+
+def _index_put(title: str, stat: os.stat_result, created: bool = False,
+               size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Insert or refresh a single entry in the metadata index.
+    
+    An entry that did not change (same size and timestamps) is left as it
+    is, without taking the index lock.
+    
+    Args:
+        title: Note title
+        stat: Fresh stat data of the note file
+        created: True if this process just created or replaced the file, in
+            which case the cached directory mtime is advanced past our own change
+        size: Logical note size, if it differs from the file size
+            
+    Returns:
+        The new index entry
+    """
+    global _index_dir_mtime
+    
+    entry = _index_entry(title, stat, size)
+    if not created:
+        # Reads refresh the entry of the note they read; when it is
+        # unchanged (the common case) skip the lock and the sorted lists
+        previous = _metadata_index.get(title)
+        if previous == entry:
+            return previous
+    
+    with _index_lock:
+        previous = _metadata_index.get(title)
+        if previous == entry and not created:
+            return previous
+        if previous is not None:
+            _sorted_remove(previous)
+        _metadata_index[title] = entry
+        _sorted_insert(entry)
+        if created and _index_dir_mtime is not None:
+            _index_dir_mtime = _dir_mtime()
+        return entry
+
+def _index_remove(title: str) -> None:
+    """
+    Remove a single entry from the metadata index after a delete.
+    """
+    global _index_dir_mtime
+    
+    with _index_lock:
+        previous = _metadata_index.pop(title, None)
+        if previous is not None:
+            _sorted_remove(previous)
+        if _index_dir_mtime is not None:
+            _index_dir_mtime = _dir_mtime()
+
+def _entry_signature(entry: Dict[str, Any]) -> tuple:
+    """
+    Get the (file_size, modified_at) signature of a metadata index entry.
+    """
+    return (entry["file_size"], entry["modified_at"])
+
+def _search_changed() -> None:
+    """
+    Fold the search index journal into a new snapshot once the journal
+    outgrows it, so the full rewrite is amortized over at least as many
+    bytes of journaled changes.
+    """
+    if _search_index.needs_compaction():
+        flush_search_index()
+
+def _search_put(title: str, content: str, entry: Dict[str, Any]) -> None:
+    """
+    Update the search index after a note was written.
+    
+    Changes made before the index is loaded are picked up by
+    reconciliation when it is loaded.
+    """
+    if _search_index.loaded:
+        _search_index.add(title, content, _entry_signature(entry))
+        _search_changed()
+
+def _search_remove(title: str) -> None:
+    """
+    Remove a deleted note from the search index.
+    """
+    if _search_index.loaded:
+        _search_index.remove(title)
+        _search_changed()
+
+def flush_search_index() -> None:
+    """
+    Persist the search index next to the notes directory if it changed.
+    """
+    with _search_lock:
+        try:
+            if _search_index.loaded:
+                _search_index.save(SEARCH_INDEX_FILE)
+        except OSError:
+            # Index is rebuilt by reconciliation if it cannot be persisted
+            pass
+
+def _search_mark_stale(title: str) -> None:
+    """
+    Mark a note for re-indexing on the next search, for writes that only
+    touch part of the file (append and patch).
+    """
+    if _search_index.loaded:
+        with _search_lock:
+            _search_stale.add(title)
+
+def _reconcile_search_index() -> None:
+    """
+    Load the search index on first use and re-index notes whose size or
+    modification time no longer match the indexed version.
+    
+    All notes are checked only when the metadata index was rebuilt since
+    the last reconciliation; otherwise only notes marked stale by partial
+    writes are re-read, so steady-state queries do no file I/O.
+    """
+    global _search_generation
+    
+    with _search_lock:
+        if not _search_index.loaded:
+            _search_index.load(SEARCH_INDEX_FILE)
+        
+        refresh_metadata_index()
+        with _index_lock:
+            full_check = _search_generation != _index_generation
+            generation = _index_generation
+            titles = _metadata_index.keys() if full_check else _search_stale
+            entries = {
+                title: dict(_metadata_index[title])
+                for title in titles if title in _metadata_index
+            }
+            _search_stale.clear()
+        
+        if full_check:
+            for title in list(_search_index.documents):
+                if title not in entries:
+                    _search_index.remove(title)
+        
+        for title, entry in entries.items():
+            if _search_index.signature(title) == _entry_signature(entry):
+                continue
+            try:
+                path = _storage.locate(title)
+                if path is not None:
+                    _search_index.add(title, _storage.read(path), _entry_signature(entry))
+            except (OSError, ValueError, KeyError):
+                # Skip files that can't be read
+                continue
+        
+        _search_generation = generation
+        _search_changed()
+
+def save_note(title: str, content: str) -> Dict[str, Any]:
+    """
+    Save a note to a text file.
+    
+    Args:
+        title: Note title (used as filename)
+        content: Note content
+        
+    Returns:
+        Dictionary with file information
+        
+    Raises:
+        HTTPException: If note cannot be saved
+    """
+    with _note_lock(title):
+        return _save_note(title, content)
+
+def _save_note(title: str, content: str) -> Dict[str, Any]:
+    """
+    Save a note. Call with the note's lock held.
+    """
+    try:
+        ensure_notes_dir()
+        
+        # Bring the index up to date first so our own directory change
+        # does not hide changes made by other processes
+        refresh_metadata_index()
+        
+        # Write content in the configured storage mode
+        file_path, _ = _write_note(title, content, _storage.locate(title))
+        
+        # Get file stats
+        stat = _storage.stat(file_path)
+        size = None if _storage.is_plain_file(file_path) else len(content.encode('utf-8'))
+        entry = _index_put(title, stat, created=True, size=size)
+        _search_put(title, content, entry)
+        
+        return build_file_info(file_path, stat, size)
+        
+    except PermissionError:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"Permission denied: Cannot write note '{title}'"
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to save note '{title}': {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Unexpected error saving note '{title}': {str(e)}"
+        )
+
+def save_new_note(title: str, content: str) -> Dict[str, Any]:
+    """
+    Save a note that must not exist yet, atomically with the check.
+    
+    Args:
+        title: Note title (used as filename)
+        content: Note content
+        
+    Returns:
+        Dictionary with file information
+        
+    Raises:
+        HTTPException: 409 if the note already exists, or if it cannot be saved
+    """
+    with _note_lock(title):
+        if _storage.locate(title) is not None:
+            raise HTTPException(
+                status_code=409, 
+                detail=f"Note '{title}' already exists. Use PUT to update."
+            )
+        return save_note(title, content)
+
+def read_note(title: str) -> Dict[str, Any]:
+    """
+    Read a note from a text file.
+    
+    Args:
+        title: Note title
+        
+    Returns:
+        Dictionary with note content and file information
+        
+    Raises:
+        HTTPException: If note cannot be read or doesn't exist
+    """
+    try:
+        file_path = _storage.locate(title)
+        
+        # Check if file exists
+        if file_path is None:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Note '{title}' not found"
+            )
+        
+        # Stat before reading, under the note's lock: the validators never
+        # describe a newer version than the content returned (a write from
+        # another process in between gives newer content with the older
+        # ETag, which only makes the client fetch it again)
+        with _note_lock(title):
+            stat = _storage.stat(file_path)
+            content = _storage.read(file_path)
+        size = _storage.size(file_path, stat)
+        entry = _index_put(title, stat, size=size)
+        
+        # Re-index notes edited in place by another process
+        if _search_index.loaded and _search_index.signature(title) != _entry_signature(entry):
+            _search_put(title, content, entry)
+        
+        return {
+            "content": content,
+            **build_file_info(file_path, stat, size)
+        }
+        
+    except HTTPException:
+        raise
+    except PermissionError:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"Permission denied: Cannot read note '{title}'"
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to read note '{title}': {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Unexpected error reading note '{title}': {str(e)}"
+        )
+
+def get_note_file(title: str) -> Dict[str, Any]:
+    """
+    Locate a note file for streaming without reading its content.
     
+    Args:
+        title: Note title
+        
+    Returns:
+        Dictionary with the file path, its stat data, the logical size and,
+        for notes in compact storage, an opener for the decompressed body
+        (None for plain .txt notes, which can be sent as files)
+        
     Raises:
-        HTTPException: If directory cannot be created
+        HTTPException: If note doesn't exist or cannot be accessed
     """
     try:
-        os.makedirs(NOTES_DIR, exist_ok=True)
+        file_path = _storage.locate(title)
+        
+        # Check if file exists
+        if file_path is None:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Note '{title}' not found"
+            )
+        
+        # Stat under the note's lock, before the body is streamed: as in
+        # read_note, the validators are never newer than the content sent
+        with _note_lock(title):
+            stat = _storage.stat(file_path)
+        size = _storage.size(file_path, stat)
+        _index_put(title, stat, size=size)
+        
+        return {
+            "file_path": file_path,
+            "stat": stat,
+            "size": size,
+            "open": None if _storage.is_plain_file(file_path) else functools.partial(_storage.open, file_path)
+        }
+        
+    except HTTPException:
+        raise
+    except PermissionError:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"Permission denied: Cannot read note '{title}'"
+        )
     except OSError as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Failed to create notes directory: {str(e)}"
+            detail=f"Failed to access note '{title}': {str(e)}"
         )
     except Exception as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Unexpected error creating notes directory: {str(e)}"
+            detail=f"Unexpected error accessing note '{title}': {str(e)}"
         )
 
-def get_file_path(title: str) -> Path:
+def update_note(title: str, content: str, if_match: Optional[str] = None) -> Dict[str, Any]:
     """
-    Get the file path for a note title.
+    Update an existing note.
     
     Args:
         title: Note title
+        content: New content
+        if_match: Optional If-Match header; the update only happens if the
+            note's current ETag matches
         
     Returns:
-        Path object for the note file
+        Dictionary with updated file information
+        
+    Raises:
+        HTTPException: If note doesn't exist, the precondition fails or the
+            note cannot be updated
     """
-    return NOTES_DIR / f"{title}.txt"
+    with _note_lock(title):
+        if if_match is not None:
+            _check_if_match(title, if_match)
+        return _update_note(title, content)
 
-def save_note(title: str, content: str) -> Dict[str, Any]:
+def _update_note(title: str, content: str) -> Dict[str, Any]:
     """
-    Save a note to a text file.
-    
-    Args:
-        title: Note title (used as filename)
-        content: Note content
-        
-    Returns:
-        Dictionary with file information
-        
-    Raises:
-        HTTPException: If note cannot be saved
+    Update an existing note. Call with the note's lock held.
     """
     try:
-        ensure_notes_dir()
-        file_path = get_file_path(title)
+        previous = _storage.locate(title)
         
-        # Write content to file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Check if file exists
+        if previous is None:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Note '{title}' not found"
+            )
         
-        # Get file stats
-        stat = os.stat(file_path)
+        # Update content (refreshing the index first, as in save_note,
+        # since compact storage replaces the .ref file)
+        refresh_metadata_index()
+        file_path, dir_changed = _write_note(title, content, previous)
         
-        return {
-            "file_path": str(file_path),
-            "file_size": stat.st_size,
-            "created_at": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "modified_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
-        }
+        # Get updated file stats
+        stat = _storage.stat(file_path)
+        size = None if _storage.is_plain_file(file_path) else len(content.encode('utf-8'))
+        entry = _index_put(title, stat, created=dir_changed, size=size)
+        _search_put(title, content, entry)
+        
+        return build_file_info(file_path, stat, size)
         
+    except HTTPException:
+        raise
     except PermissionError:
         raise HTTPException(
             status_code=403, 
-            detail=f"Permission denied: Cannot write note '{title}'"
+            detail=f"Permission denied: Cannot update note '{title}'"
         )
     except OSError as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Failed to save note '{title}': {str(e)}"
+            detail=f"Failed to update note '{title}': {str(e)}"
         )
     except Exception as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Unexpected error saving note '{title}': {str(e)}"
+            detail=f"Unexpected error updating note '{title}': {str(e)}"
         )
 
-def read_note(title: str) -> Dict[str, Any]:
+def append_note(title: str, content: str, if_match: Optional[str] = None) -> Dict[str, Any]:
     """
-    Read a note from a text file.
+    Append content to the end of an existing note.
+    
+    Only the appended bytes are written; the existing content is untouched.
+    Notes in compact storage are rewritten as a new blob instead.
     
     Args:
         title: Note title
+        content: Content to append
+        if_match: Optional If-Match header, as in update_note
         
     Returns:
-        Dictionary with note content and file information
+        Dictionary with updated file information
         
     Raises:
-        HTTPException: If note cannot be read or doesn't exist
+        HTTPException: If note doesn't exist, the precondition fails or the
+            note cannot be updated
+    """
+    with _note_lock(title):
+        if if_match is not None:
+            _check_if_match(title, if_match)
+        return _append_note(title, content)
+
+def _append_note(title: str, content: str) -> Dict[str, Any]:
+    """
+    Append content to an existing note. Call with the note's lock held.
     """
     try:
-        file_path = get_file_path(title)
+        file_path = _storage.locate(title)
         
         # Check if file exists
-        if not os.path.exists(file_path):
+        if file_path is None:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Note '{title}' not found"
             )
         
-        # Read content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        if not _storage.is_plain_file(file_path):
+            # Shared blobs and packed records are immutable: write the
+            # combined body as a new version
+            return update_note(title, _storage.read(file_path) + content)
         
-        # Get file stats
-        stat = os.stat(file_path)
+        # Append content
+        with _history_lock(title):
+            _seed_history(title, file_path)
+            with open(file_path, 'a', encoding='utf-8') as f:
+                before = os.fstat(f.fileno())
+                f.write(content)
+                _advance_mtime(f, before)
+                _sync_in_place(f)
+            _record_edit(title, file_path, before.st_size, [[0, before.st_size], content],
+                         before.st_size + len(content.encode('utf-8')))
         
-        return {
-            "content": content,
-            "file_path": str(file_path),
-            "file_size": stat.st_size,
-            "created_at": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "modified_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
-        }
+        # Get updated file stats
+        stat = _storage.stat(file_path)
+        _index_put(title, stat)
+        _search_mark_stale(title)
+        
+        return build_file_info(file_path, stat)
         
     except HTTPException:
         raise
     except PermissionError:
         raise HTTPException(
             status_code=403, 
-            detail=f"Permission denied: Cannot read note '{title}'"
+            detail=f"Permission denied: Cannot update note '{title}'"
         )
     except OSError as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Failed to read note '{title}': {str(e)}"
+            detail=f"Failed to append to note '{title}': {str(e)}"
         )
     except Exception as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Unexpected error reading note '{title}': {str(e)}"
+            detail=f"Unexpected error appending to note '{title}': {str(e)}"
         )
 
-def update_note(title: str, content: str) -> Dict[str, Any]:
+def _line_offset(f, line: int) -> int:
     """
-    Update an existing note.
+    Find the byte offset where a 1-based line starts.
+    
+    Args:
+        f: Note file opened in binary mode
+        line: 1-based line number
+        
+    Returns:
+        Byte offset of the start of the line
+        
+    Raises:
+        ValueError: If the note has fewer lines
+    """
+    if line == 1:
+        return 0
+    
+    newlines = 0
+    position = 0
+    f.seek(0)
+    while True:
+        chunk = f.read(65536)
+        if not chunk:
+            raise ValueError(f"Note has fewer than {line} lines")
+        start = 0
+        while True:
+            index = chunk.find(b'\n', start)
+            if index == -1:
+                break
+            newlines += 1
+            if newlines == line - 1:
+                return position + index + 1
+            start = index + 1
+        position += len(chunk)
+
+def _is_char_boundary(f, offset: int, size: int) -> bool:
+    """
+    Check that a byte offset does not split a UTF-8 encoded character.
+    """
+    if offset <= 0 or offset >= size:
+        return True
+    f.seek(offset)
+    return (f.read(1)[0] & 0xC0) != 0x80
+
+def _apply_patch(f, data: bytes, size: int, offset: Optional[int],
+                 line: Optional[int], truncate: bool) -> int:
+    """
+    Write patch bytes into a seekable binary file object.
+    
+    Args:
+        f: Note body opened for binary reading and writing
+        data: Encoded replacement content
+        size: Current size of the body in bytes
+        offset: Byte offset to start writing at
+        line: 1-based line number to start writing at (instead of offset)
+        truncate: Drop any content after the patched region
+        
+    Returns:
+        Byte offset the patch was written at
+        
+    Raises:
+        HTTPException: If the position is invalid
+    """
+    # Resolve the start position
+    if line is not None:
+        try:
+            offset = _line_offset(f, line)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if offset > size:
+        raise HTTPException(
+            status_code=422, 
+            detail=f"Offset {offset} is past the end of the note ({size} bytes)"
+        )
+    
+    # Refuse patches that would split a multi-byte character
+    end = offset + len(data)
+    if not _is_char_boundary(f, offset, size) or (
+        not truncate and not _is_char_boundary(f, end, size)
+    ):
+        raise HTTPException(
+            status_code=422, 
+            detail="Patch boundaries must not split a UTF-8 character"
+        )
+    
+    # Write only the changed bytes
+    f.seek(offset)
+    f.write(data)
+    if truncate:
+        f.truncate(end)
+    return offset
+
+def patch_note(title: str, content: str, offset: Optional[int] = None,
+               line: Optional[int] = None, truncate: bool = False,
+               if_match: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Overwrite part of a note in place, starting at a byte offset or line.
+    
+    Only the patched bytes are written. The content replaces the same
+    number of bytes at the target position and extends the file if it runs
+    past the end; with truncate, everything after the patch is dropped.
+    Notes in compact storage are patched in memory and stored as a new blob.
     
     Args:
         title: Note title
-        content: New content
+        content: Replacement content
+        offset: Byte offset to start writing at
+        line: 1-based line number to start writing at (instead of offset)
+        truncate: Drop any content after the patched region
+        if_match: Optional If-Match header, as in update_note
         
     Returns:
         Dictionary with updated file information
         
     Raises:
-        HTTPException: If note doesn't exist or cannot be updated
+        HTTPException: If note doesn't exist, the position is invalid, the
+            precondition fails or the note cannot be updated
+    """
+    with _note_lock(title):
+        if if_match is not None:
+            _check_if_match(title, if_match)
+        return _patch_note(title, content, offset, line, truncate)
+
+def _patch_note(title: str, content: str, offset: Optional[int],
+                line: Optional[int], truncate: bool) -> Dict[str, Any]:
+    """
+    Patch an existing note in place. Call with the note's lock held.
     """
     try:
-        file_path = get_file_path(title)
+        file_path = _storage.locate(title)
         
         # Check if file exists
-        if not os.path.exists(file_path):
+        if file_path is None:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Note '{title}' not found"
             )
         
-        # Update content
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        data = content.encode('utf-8')
+        if not _storage.is_plain_file(file_path):
+            # Shared blobs and packed records are immutable: patch a copy
+            # and store it as a new version
+            with _storage.open(file_path) as f:
+                body = io.BytesIO(f.read())
+            _apply_patch(body, data, len(body.getvalue()), offset, line, truncate)
+            return update_note(title, body.getvalue().decode('utf-8'))
+        
+        with _history_lock(title):
+            _seed_history(title, file_path)
+            with open(file_path, 'r+b') as f:
+                before = os.fstat(f.fileno())
+                start = _apply_patch(f, data, before.st_size, offset, line, truncate)
+                _advance_mtime(f, before)
+                _sync_in_place(f)
+            end = start + len(data)
+            tail = [] if truncate or end >= before.st_size else [[end, before.st_size]]
+            _record_edit(title, file_path, before.st_size, [[0, start], content] + tail,
+                         end if truncate else max(end, before.st_size))
         
         # Get updated file stats
-        stat = os.stat(file_path)
+        stat = _storage.stat(file_path)
+        _index_put(title, stat)
+        _search_mark_stale(title)
         
-        return {
-            "file_path": str(file_path),
-            "file_size": stat.st_size,
-            "created_at": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "modified_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
-        }
+        return build_file_info(file_path, stat)
         
     except HTTPException:
         raise
@@ -191,39 +1611,57 @@ def update_note(title: str, content: str) -> Dict[str, Any]:
     except OSError as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Failed to update note '{title}': {str(e)}"
+            detail=f"Failed to patch note '{title}': {str(e)}"
         )
     except Exception as e:
         raise HTTPException(
             status_code=500, 
-            detail=f"Unexpected error updating note '{title}': {str(e)}"
+            detail=f"Unexpected error patching note '{title}': {str(e)}"
         )
 
-def delete_note(title: str) -> Dict[str, str]:
+def delete_note(title: str, if_match: Optional[str] = None) -> Dict[str, str]:
     """
     Delete a note file.
     
     Args:
         title: Note title
+        if_match: Optional If-Match header, as in update_note
         
     Returns:
         Dictionary with deletion confirmation
         
     Raises:
-        HTTPException: If note doesn't exist or cannot be deleted
+        HTTPException: If note doesn't exist, the precondition fails or the
+            note cannot be deleted
+    """
+    with _note_lock(title):
+        if if_match is not None:
+            _check_if_match(title, if_match)
+        return _delete_note(title)
+
+def _delete_note(title: str) -> Dict[str, str]:
+    """
+    Delete a note. Call with the note's lock held.
     """
     try:
-        file_path = get_file_path(title)
+        file_path = _storage.locate(title)
         
         # Check if file exists
-        if not os.path.exists(file_path):
+        if file_path is None:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Note '{title}' not found"
             )
         
-        # Delete file
-        os.remove(file_path)
+        # Delete file (refreshing the index first, as in save_note)
+        refresh_metadata_index()
+        with _history_lock(title):
+            _seed_history(title, file_path)
+            _storage.remove(file_path)
+            if NOTES_HISTORY:
+                _history.record_delete(title, _durable_sync())
+        _index_remove(title)
+        _search_remove(title)
         
         return {
             "message": f"Note '{title}' deleted successfully",
@@ -248,39 +1686,120 @@ def delete_note(title: str) -> Dict[str, str]:
             detail=f"Unexpected error deleting note '{title}': {str(e)}"
         )
 
-def list_notes() -> Dict[str, Any]:
+def encode_cursor(sort: str, key: tuple) -> str:
+    """
+    Encode the sort key of the last listed note as an opaque cursor.
+    
+    Args:
+        sort: Sort field the cursor belongs to
+        key: (value, title) sort key of the last note on the page
+        
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps([sort, key[0], key[1]], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Args:
+        cursor: Cursor string from a previous page
+        sort: Sort field of the current request
+        
+    Returns:
+        (value, title) sort key to continue after
+        
+    Raises:
+        HTTPException: If the cursor is malformed or belongs to another sort
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, title = json.loads(raw.decode('utf-8'))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    expected_type = int if sort == "size" else str
+    if not isinstance(value, expected_type) or not isinstance(title, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Cursor was issued for sort '{cursor_sort}', not '{sort}'"
+        )
+    return (value, title)
+
+def list_notes(limit: Optional[int] = None, cursor: Optional[str] = None,
+               sort: Optional[str] = None, order: str = "asc") -> Dict[str, Any]:
     """
-    List all available notes.
+    List available notes, optionally sorted and paginated.
+    
+    Without limit, cursor or sort every note is returned, as before. When
+    paginating, the cursor encodes the sort key of the last returned note,
+    so pages stay stable while notes are added or removed.
     
+    Args:
+        limit: Maximum number of notes to return
+        cursor: next_cursor from the previous page
+        sort: Sort field (modified_at, title or size)
+        order: Sort order (asc or desc)
+        
     Returns:
         Dictionary with list of notes and metadata
         
     Raises:
-        HTTPException: If notes cannot be listed
+        HTTPException: If notes cannot be listed or the parameters are invalid
     """
     try:
         ensure_notes_dir()
+        refresh_metadata_index()
         
-        notes = []
-        for file_path in NOTES_DIR.glob('*.txt'):
-            try:
-                stat = os.stat(file_path)
-                notes.append({
-                    "title": file_path.stem,
-                    "file_size": stat.st_size,
-                    "created_at": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    "modified_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
-            except OSError:
-                # Skip files that can't be accessed
-                continue
+        if limit is None and cursor is None and sort is None:
+            # Serve listing from the in-process metadata index
+            with _index_lock:
+                notes = [dict(entry) for entry in _metadata_index.values()]
+            
+            return {
+                "notes": notes,
+                "total_count": len(notes),
+                "notes_directory": str(NOTES_DIR)
+            }
+        
+        sort = sort or "title"
+        if sort not in SORT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Invalid sort field '{sort}'")
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail=f"Invalid sort order '{order}'")
+        after = decode_cursor(cursor, sort) if cursor else None
+        
+        with _index_lock:
+            keys = _sorted_keys[sort]
+            total = len(keys)
+            if order == "asc":
+                start = bisect.bisect_right(keys, after) if after else 0
+                page_keys = keys[start:start + limit] if limit else keys[start:]
+                has_more = limit is not None and start + limit < total
+            else:
+                end = bisect.bisect_left(keys, after) if after else total
+                start = max(0, end - limit) if limit else 0
+                page_keys = keys[start:end][::-1]
+                has_more = start > 0
+            notes = [dict(_metadata_index[title]) for _, title in page_keys]
+        
+        next_cursor = encode_cursor(sort, page_keys[-1]) if has_more and page_keys else None
         
         return {
             "notes": notes,
-            "total_count": len(notes),
+            "total_count": total,
+            "next_cursor": next_cursor,
+            "sort": sort,
+            "order": order,
             "notes_directory": str(NOTES_DIR)
         }
         
+    except HTTPException:
+        raise
     except OSError as e:
         raise HTTPException(
             status_code=500, 
@@ -292,6 +1811,270 @@ def list_notes() -> Dict[str, Any]:
             detail=f"Unexpected error listing notes: {str(e)}"
         )
 
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _export_snapshot() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Get a sorted snapshot of (title, index entry) pairs to export.
+    """
+    ensure_notes_dir()
+    refresh_metadata_index()
+    with _index_lock:
+        return sorted((title, dict(entry)) for title, entry in _metadata_index.items())
+
+def iter_export_ndjson() -> Iterator[bytes]:
+    """
+    Stream every note as newline-delimited JSON.
+    
+    Notes are read one at a time, so memory use is bounded by the largest
+    note rather than the whole collection.
+    
+    Yields:
+        One encoded JSON line per note with title, content and modified_at
+    """
+    for title, entry in _export_snapshot():
+        path = _storage.locate(title)
+        if path is None:
+            # Deleted since the snapshot was taken
+            continue
+        record = {
+            "title": title,
+            "content": _storage.read(path),
+            "modified_at": entry["modified_at"]
+        }
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+def iter_export_tar() -> Iterator[bytes]:
+    """
+    Stream every note as an uncompressed tar archive of {title}.txt files.
+    
+    Headers are generated per note and bodies are copied in fixed-size
+    chunks, so even large notes are never held in memory.
+    
+    Yields:
+        Chunks of the tar archive
+    """
+    for title, entry in _export_snapshot():
+        path = _storage.locate(title)
+        if path is None:
+            continue
+        stat = _storage.stat(path)
+        
+        info = tarfile.TarInfo(name=f"{title}.txt")
+        info.size = _storage.size(path, stat)
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        
+        written = 0
+        with _storage.open(path) as f:
+            while written < info.size:
+                chunk = f.read(min(EXPORT_CHUNK_SIZE, info.size - written))
+                if not chunk:
+                    break
+                written += len(chunk)
+                yield chunk
+        if written < info.size:
+            # Truncated while streaming: pad to the size announced in the header
+            yield b"\0" * (info.size - written)
+        
+        padding = -info.size % tarfile.BLOCKSIZE
+        if padding:
+            yield b"\0" * padding
+    
+    # End-of-archive marker
+    yield b"\0" * (tarfile.BLOCKSIZE * 2)
+
+def save_notes_batch(notes: List[Tuple[str, str]], overwrite: bool = False) -> Dict[str, Any]:
+    """
+    Write a batch of already validated notes.
+    
+    The metadata index is refreshed once per batch instead of once per note.
+    
+    Args:
+        notes: List of (title, content) pairs
+        overwrite: Replace notes that already exist instead of skipping them
+        
+    Returns:
+        Dictionary with created, updated and skipped counts and the titles
+        that failed with their errors
+        
+    Raises:
+        HTTPException: If the notes directory cannot be used
+    """
+    ensure_notes_dir()
+    refresh_metadata_index()
+    
+    result = {"created": 0, "updated": 0, "skipped": 0, "errors": []}
+    for title, content in notes:
+        try:
+            with _note_lock(title):
+                previous = _storage.locate(title)
+                if previous is not None and not overwrite:
+                    result["skipped"] += 1
+                    continue
+                
+                file_path, dir_changed = _write_note(title, content, previous)
+                stat = _storage.stat(file_path)
+            size = None if _storage.is_plain_file(file_path) else len(content.encode('utf-8'))
+            entry = _index_put(title, stat, created=dir_changed, size=size)
+            _search_put(title, content, entry)
+            result["updated" if previous is not None else "created"] += 1
+        except OSError as e:
+            result["errors"].append({"title": title, "error": str(e)})
+    
+    return result
+
+def list_revisions(title: str) -> Dict[str, Any]:
+    """
+    List the recorded revisions of a note, oldest first.
+    
+    History starts at a note's first change; a note that was never changed
+    lists its current version as revision 1. Deleted notes keep their
+    history, so revisions can be listed after a delete.
+    
+    Args:
+        title: Note title
+        
+    Returns:
+        Dictionary with revision metadata (revision, created_at, size, kind)
+        
+    Raises:
+        HTTPException: If the note has neither a history nor a current
+            version, or the history cannot be read
+    """
+    try:
+        revisions = _history.list(title)
+        if not revisions:
+            location = _storage.locate(title)
+            if location is None:
+                raise HTTPException(
+                    status_code=404, 
+                    detail=f"Note '{title}' not found"
+                )
+            stat = _storage.stat(location)
+            revisions = [{
+                "revision": 1,
+                "created_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "size": _storage.size(location, stat),
+                "kind": "snapshot"
+            }]
+        
+        return {
+            "title": title,
+            "revisions": revisions,
+            "total_count": len(revisions)
+        }
+        
+    except HTTPException:
+        raise
+    except (OSError, ValueError) as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to read history of note '{title}': {str(e)}"
+        )
+
+def read_revision(title: str, revision: int) -> Dict[str, Any]:
+    """
+    Rebuild one revision of a note from its history.
+    
+    Args:
+        title: Note title
+        revision: Revision number, as listed by list_revisions
+        
+    Returns:
+        Dictionary with the revision's content and metadata
+        
+    Raises:
+        HTTPException: If the revision doesn't exist or records a deletion,
+            or the history cannot be read
+    """
+    try:
+        result = _history.get(title, revision)
+        if result is None and revision == 1 and not _history.has_history(title):
+            # Never changed: the current version is the first revision
+            location = _storage.locate(title)
+            if location is not None:
+                stat = _storage.stat(location)
+                result = {
+                    "content": _storage.read(location),
+                    "size": _storage.size(location, stat),
+                    "created_at": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                    "deleted": False
+                }
+        if result is None or result["deleted"]:
+            detail = f"Revision {revision} of note '{title}' not found"
+            if result is not None:
+                detail = f"Revision {revision} of note '{title}' records its deletion"
+            raise HTTPException(status_code=404, detail=detail)
+        
+        return {
+            "title": title,
+            "revision": revision,
+            "content": result["content"],
+            "size": result["size"],
+            "created_at": result["created_at"]
+        }
+        
+    except HTTPException:
+        raise
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to read revision {revision} of note '{title}': {str(e)}"
+        )
+
+def search_notes(query: str, limit: int = 20) -> Dict[str, Any]:
+    """
+    Full-text search over note titles and contents.
+    
+    Args:
+        query: Free-text query
+        limit: Maximum number of results
+        
+    Returns:
+        Dictionary with ranked results and metadata
+        
+    Raises:
+        HTTPException: If the search index cannot be loaded or queried
+    """
+    try:
+        ensure_notes_dir()
+        _reconcile_search_index()
+        
+        ranked = _search_index.search(query, limit)
+        with _index_lock:
+            entries = {title: _metadata_index.get(title, {}) for title, _ in ranked}
+        
+        results = []
+        for title, score in ranked:
+            entry = entries[title]
+            results.append({
+                "title": title,
+                "score": round(score, 4),
+                "file_size": entry.get("file_size"),
+                "modified_at": entry.get("modified_at")
+            })
+        
+        return {
+            "query": query,
+            "results": results,
+            "total_count": len(results)
+        }
+        
+    except HTTPException:
+        raise
+    except OSError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to search notes: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Unexpected error searching notes: {str(e)}"
+        )
+
 def note_exists(title: str) -> bool:
     """
     Check if a note exists.
@@ -303,7 +2086,6 @@ def note_exists(title: str) -> bool:
         True if note exists, False otherwise
     """
     try:
-        file_path = get_file_path(title)
-        return os.path.exists(file_path)
+        return _storage.locate(title) is not None
     except Exception:
         return False
\ No newline at end of file
@@ -0,0 +1,19 @@
+# fs_utils.py
+import os
+from pathlib import Path
+
+def fsync_directory(directory: Path) -> None:
+    """
+    Persist the directory entries created by renames, where supported.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on Windows; renames are durable there
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,113 @@
+# group_commit.py
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from fs_utils import fsync_directory
+
+class _PendingWrite:
+    """
+    A written file waiting for the fsync (and rename) of its group.
+    """
+
+    __slots__ = ("fd", "temp_path", "final_path", "done", "error")
+
+    def __init__(self, fd: int, temp_path: Optional[Path], final_path: Optional[Path]):
+        self.fd = fd
+        self.temp_path = temp_path
+        self.final_path = final_path
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+class GroupCommit:
+    """
+    Batches the fsyncs of concurrent durable writes.
+
+    Writers hand over an open file descriptor and block until it is on disk.
+    The first writer of a group becomes its leader: it waits for the previous
+    group to finish (plus an optional window), takes every write queued in
+    the meantime, fsyncs each distinct file once, renames temporary files
+    into place in submission order and fsyncs each affected directory once.
+    Writers that arrive while a group is being flushed form the next group.
+
+    Writes to one shared file (the packed backend's data file, a note's
+    history log) are made durable by a single fsync per group, however many
+    of them queued. Writes to different files (one file per note) still
+    need one fsync each; only the directory fsyncs are shared.
+    """
+
+    def __init__(self, window: float = 0.0):
+        self.window = window
+        self.groups = 0
+        self.writes = 0
+        self.fsyncs = 0
+        self._queue: List[_PendingWrite] = []
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._leader_waiting = False
+
+    def commit(self, fd: int, temp_path: Optional[Path] = None,
+               final_path: Optional[Path] = None) -> None:
+        """
+        Make a written file durable, optionally renaming it into place.
+
+        Args:
+            fd: Open descriptor of the written file; the caller closes it
+            temp_path: Temporary file to rename once its data is on disk
+            final_path: Destination of the rename
+
+        Raises:
+            OSError: If the fsync or rename of this write failed
+        """
+        pending = _PendingWrite(fd, temp_path, final_path)
+        with self._queue_lock:
+            self._queue.append(pending)
+            leader = not self._leader_waiting
+            if leader:
+                self._leader_waiting = True
+
+        if leader:
+            with self._flush_lock:
+                if self.window > 0:
+                    time.sleep(self.window)
+                with self._queue_lock:
+                    group, self._queue = self._queue, []
+                    self._leader_waiting = False
+                self._flush(group)
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _flush(self, group: List[_PendingWrite]) -> None:
+        """
+        Fsync, rename and sync the directories of one group of writes.
+        """
+        directories = {}
+        synced = set()
+        try:
+            for pending in group:
+                try:
+                    # Descriptors of one file (duplicated by each writer)
+                    # share its fsync
+                    stat = os.fstat(pending.fd)
+                    if (stat.st_dev, stat.st_ino) not in synced:
+                        os.fsync(pending.fd)
+                        synced.add((stat.st_dev, stat.st_ino))
+                    if pending.temp_path is not None:
+                        os.replace(pending.temp_path, pending.final_path)
+                        directories[pending.final_path.parent] = None
+                except OSError as e:
+                    pending.error = e
+
+            for directory in directories:
+                fsync_directory(directory)
+
+            self.groups += 1
+            self.writes += len(group)
+            self.fsyncs += len(synced) + len(directories)
+        finally:
+            for pending in group:
+                pending.done.set()
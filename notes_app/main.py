@@ -1,11 +1,21 @@
 # main.py
-from fastapi import FastAPI, HTTPException
-from models import NoteCreate, Note, NoteUpdate
+from fastapi import FastAPI, HTTPException, Query, Header, Response, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from models import NoteCreate, Note, NoteUpdate, NoteInfo, NoteAppend, NotePatch, NoteRevision
 from file_handler import (
-    save_note, read_note, update_note, delete_note, 
-    list_notes, note_exists
+    save_new_note, read_note, update_note, delete_note, 
+    list_notes, search_notes, flush_search_index,
+    get_note_file, run_io, append_note, patch_note,
+    check_not_modified, build_validators,
+    iter_export_ndjson, iter_export_tar, save_notes_batch, flush_storage,
+    list_revisions, read_revision
 )
+from pydantic import ValidationError
+from typing import Optional, Tuple, Callable, List, Dict, Any
 import os
+import json
+import tarfile
+import tempfile
 import logging
 
 # Configure logging
@@ -19,7 +29,7 @@ app = FastAPI(
 )
 
 @app.post("/notes/", status_code=201, response_model=Note)
-async def create_note(note: NoteCreate):
+async def create_note(note: NoteCreate, response: Response):
     """
     Create a new note and save it as a .txt file.
     
@@ -33,15 +43,8 @@ async def create_note(note: NoteCreate):
         HTTPException: If note creation fails or note already exists
     """
     try:
-        # Check if note already exists
-        if note_exists(note.title):
-            raise HTTPException(
-                status_code=409, 
-                detail=f"Note '{note.title}' already exists. Use PUT to update."
-            )
-        
-        # Save note and get file info
-        file_info = save_note(note.title, note.content)
+        # Save note (409 if it already exists) and get file info
+        file_info = await run_io(save_new_note, note.title, note.content)
         
         # Create response
         response_note = Note(
@@ -49,6 +52,7 @@ async def create_note(note: NoteCreate):
             content=note.content,
             **file_info
         )
+        set_validator_headers(response, file_info)
         
         logger.info(f"Created note: {note.title}")
         return response_note
@@ -62,23 +66,365 @@ async def create_note(note: NoteCreate):
             detail=f"Failed to create note: {str(e)}"
         )
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_MAX_LINE_BYTES = 16 * 1024 * 1024
+
+def set_validator_headers(response: Response, file_info: dict) -> None:
+    """
+    Add ETag and Last-Modified headers for a note to a response.
+    
+    Args:
+        response: Response to add the headers to
+        file_info: File information including etag and last_modified
+    """
+    response.headers["ETag"] = file_info["etag"]
+    response.headers["Last-Modified"] = file_info["last_modified"]
+
+def not_modified(validators: dict) -> Response:
+    """
+    Build a 304 Not Modified response carrying the note's validators.
+    
+    Args:
+        validators: Dictionary with etag and last_modified
+        
+    Returns:
+        Empty 304 response
+    """
+    response = Response(status_code=304)
+    set_validator_headers(response, validators)
+    return response
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP Range header.
+    
+    Args:
+        range_header: Value of the Range header, if any
+        size: Total content size in bytes
+        
+    Returns:
+        Inclusive (start, end) byte positions, or None to send the full
+        content (no header, or a form that is ignored such as multiple ranges)
+        
+    Raises:
+        HTTPException: If the range cannot be satisfied
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    
+    start_text, _, end_text = range_header[6:].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end_text))
+            end = size - 1
+    except ValueError:
+        return None
+    
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416, 
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+def iter_content(opener: Callable, start: int, length: int):
+    """
+    Yield a byte range of a note body in fixed-size chunks.
+    
+    Args:
+        opener: Callable returning a binary file object for the body
+        start: First byte to send
+        length: Number of bytes to send
+    """
+    with opener() as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Persist the search index and storage backend state when the server stops.
+    """
+    await run_io(flush_search_index)
+    await run_io(flush_storage)
+
+@app.get("/notes/search")
+async def search_all_notes(
+    q: str = Query(..., min_length=1, description="Search query"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results")
+):
+    """
+    Full-text search over note titles and contents.
+    
+    Args:
+        q: Search query (query parameter)
+        limit: Maximum number of results
+        
+    Returns:
+        Dictionary with notes ranked by BM25 relevance
+        
+    Raises:
+        HTTPException: If the search fails
+    """
+    try:
+        result = await run_io(search_notes, q, limit)
+        logger.info(f"Search '{q}' matched {result['total_count']} notes")
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching notes for '{q}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to search notes: {str(e)}"
+        )
+
+@app.get("/notes/export")
+async def export_notes(format: str = Query("ndjson", pattern="^(ndjson|tar)$", description="Archive format")):
+    """
+    Stream every note as an NDJSON or tar archive.
+    
+    Args:
+        format: "ndjson" (one JSON object per line) or "tar" ({title}.txt files)
+        
+    Returns:
+        Streaming archive response
+    """
+    logger.info(f"Exporting notes as {format}")
+    if format == "tar":
+        return StreamingResponse(
+            iter_export_tar(),
+            media_type="application/x-tar",
+            headers={"Content-Disposition": 'attachment; filename="notes.tar"'}
+        )
+    return StreamingResponse(
+        iter_export_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'}
+    )
+
+def validate_import_row(title: Any, content: Any) -> Tuple[str, str]:
+    """
+    Validate an imported note with the NoteCreate rules (title sanitization).
+    
+    Args:
+        title: Raw title from the archive
+        content: Raw content from the archive
+        
+    Returns:
+        Sanitized (title, content) pair
+        
+    Raises:
+        ValueError: If the row is not a valid note
+    """
+    try:
+        note = NoteCreate(title=title, content=content)
+    except ValidationError as e:
+        raise ValueError("; ".join(error["msg"] for error in e.errors()))
+    return note.title, note.content
+
+def merge_import_result(summary: Dict[str, Any], result: Dict[str, Any]) -> None:
+    """
+    Add the counts and errors of one written batch to the import summary.
+    """
+    for key in ("created", "updated", "skipped"):
+        summary[key] += result[key]
+    for error in result["errors"]:
+        add_import_error(summary, error)
+
+def add_import_error(summary: Dict[str, Any], error: Dict[str, Any]) -> None:
+    """
+    Record a failed row without letting the error list grow unbounded.
+    """
+    summary["failed"] += 1
+    if len(summary["errors"]) < IMPORT_MAX_REPORTED_ERRORS:
+        summary["errors"].append(error)
+
+def import_tar_archive(archive, overwrite: bool) -> Dict[str, Any]:
+    """
+    Import notes from a tar archive of {title}.txt files in batches.
+    
+    Args:
+        archive: Seekable file object holding the archive
+        overwrite: Replace existing notes instead of skipping them
+        
+    Returns:
+        Import summary
+    """
+    summary = {"created": 0, "updated": 0, "skipped": 0, "failed": 0, "errors": []}
+    batch: List[Tuple[str, str]] = []
+    
+    with tarfile.open(fileobj=archive, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            name = os.path.basename(member.name)
+            title = name[:-4] if name.endswith('.txt') else name
+            try:
+                content = tar.extractfile(member).read().decode('utf-8')
+                batch.append(validate_import_row(title, content))
+            except (ValueError, UnicodeDecodeError) as e:
+                add_import_error(summary, {"member": member.name, "error": str(e)})
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                merge_import_result(summary, save_notes_batch(batch, overwrite))
+                batch = []
+    
+    if batch:
+        merge_import_result(summary, save_notes_batch(batch, overwrite))
+    return summary
+
+@app.post("/notes/import")
+async def import_notes(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|tar)$", description="Archive format"),
+    overwrite: bool = Query(False, description="Replace notes that already exist")
+):
+    """
+    Import notes from a streamed NDJSON or tar archive.
+    
+    NDJSON lines are parsed as the body arrives and written in batches; tar
+    archives are spooled to a temporary file first. Every row is validated
+    with the NoteCreate rules, and invalid rows are reported without
+    aborting the import.
+    
+    Args:
+        request: Incoming request whose body is the archive
+        format: "ndjson" ({"title": ..., "content": ...} per line) or "tar"
+        overwrite: Replace existing notes instead of skipping them
+        
+    Returns:
+        Summary with created, updated, skipped and failed counts and the
+        first errors
+        
+    Raises:
+        HTTPException: If the archive cannot be read or an NDJSON line is
+            longer than IMPORT_MAX_LINE_BYTES (413)
+    """
+    try:
+        if format == "tar":
+            with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as archive:
+                async for chunk in request.stream():
+                    archive.write(chunk)
+                archive.seek(0)
+                summary = await run_io(import_tar_archive, archive, overwrite)
+        else:
+            summary = {"created": 0, "updated": 0, "skipped": 0, "failed": 0, "errors": []}
+            batch: List[Tuple[str, str]] = []
+            tail: List[bytes] = []
+            tail_size = 0
+            line_number = 0
+            
+            async def handle_line(raw: bytes):
+                nonlocal batch
+                if not raw.strip():
+                    return
+                try:
+                    record = json.loads(raw)
+                    if not isinstance(record, dict):
+                        raise ValueError("Each line must be a JSON object")
+                    batch.append(validate_import_row(record.get("title"), record.get("content")))
+                except ValueError as e:
+                    add_import_error(summary, {"line": line_number, "error": str(e)})
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    merge_import_result(summary, await run_io(save_notes_batch, batch, overwrite))
+                    batch = []
+            
+            def check_line_size(size: int, number: int):
+                if size > IMPORT_MAX_LINE_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Line {number} is longer than {IMPORT_MAX_LINE_BYTES} bytes"
+                    )
+            
+            # Split only the new chunk; the unfinished line is kept as pieces
+            async for chunk in request.stream():
+                lines = chunk.split(b"\n")
+                tail.append(lines[0])
+                tail_size += len(lines[0])
+                check_line_size(tail_size, line_number + 1)
+                if len(lines) == 1:
+                    continue
+                lines[0] = b"".join(tail)
+                tail = [lines.pop()]
+                tail_size = len(tail[0])
+                for raw in lines:
+                    line_number += 1
+                    check_line_size(len(raw), line_number)
+                    await handle_line(raw)
+                check_line_size(tail_size, line_number + 1)
+            line_number += 1
+            await handle_line(b"".join(tail))
+            if batch:
+                merge_import_result(summary, await run_io(save_notes_batch, batch, overwrite))
+        
+        logger.info(
+            f"Imported notes: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['skipped']} skipped, {summary['failed']} failed"
+        )
+        return summary
+        
+    except HTTPException:
+        raise
+    except tarfile.TarError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tar archive: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error importing notes: {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to import notes: {str(e)}"
+        )
+
 @app.get("/notes/{title}", response_model=Note)
-async def get_note(title: str):
+async def get_note(
+    title: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since")
+):
     """
     Get a note by title from its .txt file.
     
+    Responses carry ETag and Last-Modified headers. Conditional requests
+    whose validators still match are answered with 304 from a stat of the
+    file, without reading it.
+    
     Args:
         title: Note title
+        response: Response used to set cache validator headers
+        if_none_match: Optional If-None-Match header
+        if_modified_since: Optional If-Modified-Since header
         
     Returns:
-        Note with content and file information
+        Note with content and file information, or 304 Not Modified
         
     Raises:
         HTTPException: If note doesn't exist or cannot be read
     """
     try:
+        # Answer conditional requests without reading the note
+        validators = await run_io(check_not_modified, title, if_none_match, if_modified_since)
+        if validators is not None:
+            logger.info(f"Note not modified: {title}")
+            return not_modified(validators)
+        
         # Read note and get file info
-        note_data = read_note(title)
+        note_data = await run_io(read_note, title)
         
         # Create response
         response_note = Note(
@@ -89,6 +435,7 @@ async def get_note(title: str):
             created_at=note_data["created_at"],
             modified_at=note_data["modified_at"]
         )
+        set_validator_headers(response, note_data)
         
         logger.info(f"Retrieved note: {title}")
         return response_note
@@ -102,24 +449,160 @@ async def get_note(title: str):
             detail=f"Failed to retrieve note: {str(e)}"
         )
 
+@app.get("/notes/{title}/raw")
+async def get_note_raw(
+    title: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since")
+):
+    """
+    Stream the raw content of a note.
+    
+    The file is sent in chunks (or with zero-copy sendfile when the server
+    supports it) and honours HTTP Range requests, so memory use stays flat
+    regardless of note size. Notes in compact storage are decompressed on
+    the fly.
+    
+    Args:
+        title: Note title
+        range_header: Optional HTTP Range header
+        if_none_match: Optional If-None-Match header
+        if_modified_since: Optional If-Modified-Since header
+        
+    Returns:
+        Streaming plain-text response with the note content, or 304 Not Modified
+        
+    Raises:
+        HTTPException: If note doesn't exist or cannot be read
+    """
+    try:
+        validators = await run_io(check_not_modified, title, if_none_match, if_modified_since)
+        if validators is not None:
+            return not_modified(validators)
+        
+        note_file = await run_io(get_note_file, title)
+        validators = build_validators(note_file["stat"])
+        
+        logger.info(f"Streaming note: {title}")
+        if note_file["open"] is not None:
+            size = note_file["size"]
+            headers = {
+                "Accept-Ranges": "bytes",
+                "ETag": validators["etag"],
+                "Last-Modified": validators["last_modified"]
+            }
+            byte_range = parse_range(range_header, size)
+            start, end = byte_range if byte_range else (0, size - 1)
+            headers["Content-Length"] = str(max(0, end - start + 1))
+            if byte_range:
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return StreamingResponse(
+                iter_content(note_file["open"], start, end - start + 1),
+                status_code=206 if byte_range else 200,
+                media_type="text/plain; charset=utf-8",
+                headers=headers
+            )
+        
+        return FileResponse(
+            note_file["file_path"],
+            media_type="text/plain; charset=utf-8",
+            stat_result=note_file["stat"],
+            headers={"ETag": validators["etag"]}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming note '{title}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to stream note: {str(e)}"
+        )
+
+@app.get("/notes/{title}/revisions")
+async def list_note_revisions(title: str):
+    """
+    List the revisions recorded for a note.
+    
+    Args:
+        title: Note title (path parameter)
+        
+    Returns:
+        Dictionary with revision metadata, oldest first
+        
+    Raises:
+        HTTPException: If note doesn't exist or its history cannot be read
+    """
+    try:
+        result = await run_io(list_revisions, title)
+        logger.info(f"Listed {result['total_count']} revisions of note: {title}")
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing revisions of note '{title}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to list revisions: {str(e)}"
+        )
+
+@app.get("/notes/{title}/revisions/{revision}", response_model=NoteRevision)
+async def get_note_revision(title: str, revision: int):
+    """
+    Get the content of a note as of a specific revision.
+    
+    Args:
+        title: Note title (path parameter)
+        revision: Revision number (path parameter)
+        
+    Returns:
+        NoteRevision object with the rebuilt content
+        
+    Raises:
+        HTTPException: If the revision doesn't exist or cannot be rebuilt
+    """
+    try:
+        result = await run_io(read_revision, title, revision)
+        logger.info(f"Retrieved revision {revision} of note: {title}")
+        return NoteRevision(**result)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving revision {revision} of note '{title}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to retrieve revision: {str(e)}"
+        )
+
 @app.post("/notes/{title}", response_model=Note)
-async def update_note_post(title: str, note_update: NoteUpdate):
+async def update_note_post(
+    title: str,
+    note_update: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
     """
     Update an existing note using POST method.
     
     Args:
         title: Note title
         note_update: New content for the note
+        response: Response used to set cache validator headers
+        if_match: Optional If-Match header for optimistic concurrency
         
     Returns:
         Updated note with file information
         
     Raises:
-        HTTPException: If note doesn't exist or cannot be updated
+        HTTPException: If note doesn't exist, was modified since the client
+            read it (412) or cannot be updated
     """
     try:
         # Update note and get file info
-        file_info = update_note(title, note_update.content)
+        file_info = await run_io(update_note, title, note_update.content, if_match)
         
         # Create response
         response_note = Note(
@@ -127,6 +610,7 @@ async def update_note_post(title: str, note_update: NoteUpdate):
             content=note_update.content,
             **file_info
         )
+        set_validator_headers(response, file_info)
         
         logger.info(f"Updated note: {title}")
         return response_note
@@ -140,23 +624,110 @@ async def update_note_post(title: str, note_update: NoteUpdate):
             detail=f"Failed to update note: {str(e)}"
         )
 
+@app.post("/notes/{title}/append", response_model=NoteInfo)
+async def append_note_endpoint(
+    title: str,
+    note_append: NoteAppend,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
+    """
+    Append content to the end of an existing note.
+    
+    Args:
+        title: Note title
+        note_append: Content to append
+        response: Response used to set cache validator headers
+        if_match: Optional If-Match header for optimistic concurrency
+        
+    Returns:
+        Updated note metadata (without content)
+        
+    Raises:
+        HTTPException: If note doesn't exist, was modified since the client
+            read it (412) or cannot be updated
+    """
+    try:
+        file_info = await run_io(append_note, title, note_append.content, if_match)
+        set_validator_headers(response, file_info)
+        
+        logger.info(f"Appended {len(note_append.content)} characters to note: {title}")
+        return NoteInfo(title=title, **file_info)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error appending to note '{title}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to append to note: {str(e)}"
+        )
+
+@app.patch("/notes/{title}", response_model=NoteInfo)
+async def patch_note_endpoint(
+    title: str,
+    note_patch: NotePatch,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
+    """
+    Overwrite part of a note in place at a byte offset or line.
+    
+    Args:
+        title: Note title
+        note_patch: Replacement content and position
+        response: Response used to set cache validator headers
+        if_match: Optional If-Match header for optimistic concurrency
+        
+    Returns:
+        Updated note metadata (without content)
+        
+    Raises:
+        HTTPException: If note doesn't exist, the position is invalid, it was
+            modified since the client read it (412) or cannot be updated
+    """
+    try:
+        file_info = await run_io(
+            patch_note, title, note_patch.content,
+            offset=note_patch.offset, line=note_patch.line,
+            truncate=note_patch.truncate, if_match=if_match
+        )
+        set_validator_headers(response, file_info)
+        
+        logger.info(f"Patched note: {title}")
+        return NoteInfo(title=title, **file_info)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error patching note '{title}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to patch note: {str(e)}"
+        )
+
 @app.delete("/notes/{title}")
-async def delete_note_endpoint(title: str):
+async def delete_note_endpoint(
+    title: str,
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
     """
     Delete a note by removing its .txt file.
     
     Args:
         title: Note title
+        if_match: Optional If-Match header for optimistic concurrency
         
     Returns:
         Deletion confirmation message
         
     Raises:
-        HTTPException: If note doesn't exist or cannot be deleted
+        HTTPException: If note doesn't exist, was modified since the client
+            read it (412) or cannot be deleted
     """
     try:
         # Delete note
-        result = delete_note(title)
+        result = await run_io(delete_note, title, if_match)
         
         logger.info(f"Deleted note: {title}")
         return result
@@ -171,10 +742,21 @@ async def delete_note_endpoint(title: str):
         )
 
 @app.get("/notes/")
-async def list_all_notes():
+async def list_all_notes(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of notes per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    sort: Optional[str] = Query(None, pattern="^(modified_at|title|size)$", description="Sort field"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="Sort order")
+):
     """
-    List all available notes.
+    List available notes, optionally sorted and paginated with a cursor.
     
+    Args:
+        limit: Maximum number of notes to return (query parameter)
+        cursor: Cursor returned as next_cursor by the previous page
+        sort: Sort field (modified_at, title or size)
+        order: Sort order (asc or desc)
+        
     Returns:
         Dictionary with list of notes and metadata
         
@@ -182,8 +764,8 @@ async def list_all_notes():
         HTTPException: If notes cannot be listed
     """
     try:
-        result = list_notes()
-        logger.info(f"Listed {result['total_count']} notes")
+        result = await run_io(list_notes, limit, cursor, sort, order)
+        logger.info(f"Listed {len(result['notes'])} of {result['total_count']} notes")
         return result
         
     except HTTPException:
@@ -208,14 +790,27 @@ async def root():
         "endpoints": {
             "POST /notes/": "Create a new note",
             "GET /notes/{title}": "Get a note by title",
+            "GET /notes/{title}/raw": "Stream raw note content (supports Range)",
+            "GET /notes/{title}/revisions": "List a note's revisions",
+            "GET /notes/{title}/revisions/{revision}": "Get a note as of a revision",
             "POST /notes/{title}": "Update a note",
+            "POST /notes/{title}/append": "Append content to a note",
+            "PATCH /notes/{title}": "Overwrite part of a note at an offset or line",
             "DELETE /notes/{title}": "Delete a note",
-            "GET /notes/": "List all notes"
+            "GET /notes/": "List all notes",
+            "GET /notes/?sort=modified_at&order=desc&limit=50": "List notes sorted and paginated",
+            "GET /notes/search?q=": "Full-text search over notes",
+            "GET /notes/export?format=ndjson|tar": "Stream all notes as an archive",
+            "POST /notes/import?format=ndjson|tar": "Import notes from an archive"
         },
         "features": [
             "Save each note as a .txt file",
             "Use os module for file operations",
             "Comprehensive error handling",
-            "File metadata tracking"
+            "File metadata tracking",
+            "BM25-ranked full-text search",
+            "ETag / conditional GET and If-Match optimistic concurrency",
+            "Non-blocking file I/O on a bounded thread pool",
+            "Delta-compressed revision history"
         ]
     }
\ No newline at end of file
@@ -0,0 +1,105 @@
+# migrate_layout.py
+"""
+Offline migration of NOTES_DIR between the flat and sharded layouts.
+
+Stop the API (or run it with NOTES_LAYOUT=migrating, which reads both
+layouts) before converting, then start it with the target layout:
+
+    python migrate_layout.py --to sharded
+    NOTES_LAYOUT=sharded uvicorn main:app
+
+Use --to flat to roll back, and --dry-run to only report what would move.
+"""
+import argparse
+import os
+
+import file_handler
+
+NOTE_SUFFIXES = ('.txt', '.ref')
+
+def iter_notes(layout):
+    """
+    Yield (title, path) for every note file stored in the given layout.
+    """
+    pattern = '*' if layout == "flat" else '??/*'
+    for suffix in NOTE_SUFFIXES:
+        for path in file_handler.NOTES_DIR.glob(f'{pattern}{suffix}'):
+            yield path.stem, path
+
+def exists_in(title, layout):
+    """
+    Check whether a note has a file (in either storage mode) in a layout.
+    """
+    return any(file_handler.get_note_dir(title, layout).joinpath(f"{title}{suffix}").exists()
+               for suffix in NOTE_SUFFIXES)
+
+def remove_stale(path):
+    """
+    Remove a note file superseded by the copy in the target layout,
+    releasing its blob if it is a blob reference.
+    """
+    ref = file_handler._load_ref(path) if path.suffix == '.ref' else None
+    os.remove(path)
+    if ref is not None:
+        file_handler._blob_ref_release(ref)
+
+def migrate(target, dry_run=False):
+    """
+    Move every note file into the target layout.
+
+    A note that already exists in the target layout was written there after
+    its old copy, so the old copy is removed instead of moved; left in
+    place, it would reappear once the newer copy is deleted.
+
+    Args:
+        target: "sharded" or "flat"
+        dry_run: Only count the files that would be moved or removed
+
+    Returns:
+        Dictionary with moved and skipped counts (skipped notes were
+        already present in the target layout and had their old copy removed)
+    """
+    source = "flat" if target == "sharded" else "sharded"
+    moved = 0
+    skipped = 0
+
+    for title, path in list(iter_notes(source)):
+        directory = file_handler.get_note_dir(title, target)
+        destination = directory / path.name
+        if exists_in(title, target):
+            # A newer copy was already written in the target layout
+            if not dry_run:
+                remove_stale(path)
+            skipped += 1
+            continue
+        if not dry_run:
+            os.makedirs(directory, exist_ok=True)
+            os.replace(path, destination)
+        moved += 1
+
+    if not dry_run and target == "flat":
+        # Remove shard directories left empty by the move
+        for directory in file_handler.NOTES_DIR.glob('??'):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+
+    return {"moved": moved, "skipped": skipped}
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the notes directory layout")
+    parser.add_argument("--to", choices=["sharded", "flat"], required=True, help="Target layout")
+    parser.add_argument("--dry-run", action="store_true", help="Report without moving files")
+    args = parser.parse_args()
+
+    if not file_handler.NOTES_DIR.is_dir():
+        print(f"No notes directory at '{file_handler.NOTES_DIR}'")
+        return
+
+    result = migrate(args.to, args.dry_run)
+    action = "Would move" if args.dry_run else "Moved"
+    removed = "would be removed" if args.dry_run else "removed"
+    print(f"{action} {result['moved']} note files to the {args.to} layout "
+          f"({result['skipped']} already present there, old copies {removed})")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 # models.py
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, field_validator, model_validator
 from typing import Optional
 import re
 import os
 
+# Titles taken by the fixed /notes/... routes, which are matched before /notes/{title}
+RESERVED_TITLES = {"search", "export", "import"}
+
 class NoteCreate(BaseModel):
     title: str
     content: str
@@ -21,6 +24,8 @@ class NoteCreate(BaseModel):
         
         if not sanitized:
             raise ValueError("Title contains only invalid characters")
+        if sanitized in RESERVED_TITLES:
+            raise ValueError(f"Title '{sanitized}' is reserved")
         return sanitized
 
     @field_validator('content')
@@ -45,4 +50,54 @@ class NoteUpdate(BaseModel):
     def validate_content(cls, value):
         if value is None:
             raise ValueError("Content cannot be None")
-        return value
\ No newline at end of file
+        return value
+
+class NoteInfo(BaseModel):
+    title: str
+    file_path: Optional[str] = None
+    file_size: Optional[int] = None
+    created_at: Optional[str] = None
+    modified_at: Optional[str] = None
+
+class NoteRevision(BaseModel):
+    title: str
+    revision: int
+    content: str
+    size: Optional[int] = None
+    created_at: Optional[str] = None
+
+class NoteAppend(BaseModel):
+    content: str
+
+    @field_validator('content')
+    @classmethod
+    def validate_content(cls, value):
+        if not value:
+            raise ValueError("Content to append cannot be empty")
+        return value
+
+class NotePatch(BaseModel):
+    content: str
+    offset: Optional[int] = None  # Byte offset to start writing at
+    line: Optional[int] = None    # 1-based line number to start writing at
+    truncate: bool = False        # Drop content after the patched region
+
+    @field_validator('offset')
+    @classmethod
+    def validate_offset(cls, value):
+        if value is not None and value < 0:
+            raise ValueError("Offset cannot be negative")
+        return value
+
+    @field_validator('line')
+    @classmethod
+    def validate_line(cls, value):
+        if value is not None and value < 1:
+            raise ValueError("Line numbers start at 1")
+        return value
+
+    @model_validator(mode='after')
+    def validate_position(self):
+        if (self.offset is None) == (self.line is None):
+            raise ValueError("Provide exactly one of 'offset' or 'line'")
+        return self
\ No newline at end of file
@@ -0,0 +1,362 @@
+# pack_store.py
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, Optional, Tuple
+
+from fs_utils import fsync_directory
+
+# Record header: crc32 of everything after it, operation, title length,
+# body length, sequence number, created and modified times (ns)
+RECORD_HEADER = struct.Struct('<IBHIQqq')
+OP_PUT = 1
+OP_DELETE = 2
+
+# Compact once at least this many bytes, and at least this fraction of the
+# data file, belong to overwritten or deleted records
+COMPACT_MIN_GARBAGE = 1024 * 1024
+COMPACT_GARBAGE_RATIO = 0.5
+
+# Persist the offset index after at least this many writes, and at least as
+# many writes as there are notes, so saving stays amortized O(1) per write;
+# records written after the last save are replayed from the data file on open
+INDEX_SAVE_EVERY = 1000
+
+# Location of one live note in the data file
+PackRecord = namedtuple('PackRecord', 'offset length body_length seq created_ns modified_ns')
+
+# Stat-like view of a packed note, with the fields build_file_info and the
+# cache validators use. st_ino is the write sequence number, so it changes
+# on every write but survives compaction.
+PackStat = namedtuple('PackStat', 'st_ino st_size st_mtime st_mtime_ns st_ctime')
+
+class PackStore:
+    """
+    Append-only, single-file note store with an in-memory offset index.
+
+    Every write appends a record (header, title, body) to the data file and
+    points the index at it; deletes append a tombstone. Reads slice the
+    memory-mapped data file. The offset index is persisted next to the data
+    file together with the number of bytes it covers, so opening the store
+    only replays records written since the last save; a torn record at the
+    end of the file (crash mid-write) is truncated away.
+
+    Overwritten and deleted records are reclaimed by a background
+    compaction that copies the live records to a new data file and swaps it
+    in, carrying over any records appended while it ran.
+
+    The store assumes a single writing process.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.index_path = path.with_name(path.name + '.idx')
+        self.lock = threading.RLock()
+        self.entries: Dict[str, PackRecord] = {}
+        self.live_bytes = 0
+        self.seq = 0
+        self.compactions = 0
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._unsaved_writes = 0
+        self._compactor: Optional[threading.Thread] = None
+        self._open()
+
+    def _open(self) -> None:
+        """
+        Open the data file, load the persisted index and replay the tail.
+        """
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._file = open(self.path, 'a+b', buffering=0)
+        stat = os.fstat(self._file.fileno())
+
+        covered = 0
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved["inode"] == stat.st_ino and saved["covered"] <= stat.st_size:
+                self.entries = {title: PackRecord(*record) for title, record in saved["entries"].items()}
+                self.seq = saved["seq"]
+                covered = saved["covered"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+        self._remap()
+        end = self._replay(self.entries, covered, stat.st_size)
+        if end < stat.st_size:
+            # Drop a record torn by a crash so new writes start cleanly
+            self._file.truncate(end)
+            self._remap()
+        self.live_bytes = sum(record.length for record in self.entries.values())
+
+    def _remap(self) -> None:
+        """
+        Map the current data file; an empty file cannot be mapped.
+        """
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def _replay(self, entries: Dict[str, PackRecord], start: int, end: int) -> int:
+        """
+        Apply the records between start and end to an offset index.
+
+        Returns:
+            Offset just past the last complete, valid record
+        """
+        data = self._map
+        offset = start
+        while offset + RECORD_HEADER.size <= end:
+            crc, op, title_length, body_length, seq, created_ns, modified_ns = \
+                RECORD_HEADER.unpack_from(data, offset)
+            length = RECORD_HEADER.size + title_length + body_length
+            if offset + length > end or zlib.crc32(data[offset + 4:offset + length]) != crc:
+                break
+            start_title = offset + RECORD_HEADER.size
+            title = data[start_title:start_title + title_length].decode('utf-8')
+            if op == OP_PUT:
+                entries[title] = PackRecord(offset, length, body_length, seq, created_ns, modified_ns)
+            else:
+                entries.pop(title, None)
+            self.seq = max(self.seq, seq)
+            offset += length
+        return offset
+
+    def _append(self, op: int, title: str, body: bytes, created_ns: int) -> PackRecord:
+        """
+        Append one record and return its location. Called with the lock held.
+
+        If the write fails, the data file is cut back to its size before it
+        and the sequence number restored, so no torn record is left for
+        later records to follow (replay stops at the first bad record).
+
+        Raises:
+            OSError: If the record could not be written
+        """
+        encoded_title = title.encode('utf-8')
+        seq = self.seq + 1
+        modified_ns = time.time_ns()
+        header_tail = RECORD_HEADER.pack(
+            0, op, len(encoded_title), len(body), seq, created_ns, modified_ns
+        )[4:]
+        crc = zlib.crc32(body, zlib.crc32(encoded_title, zlib.crc32(header_tail)))
+        record = struct.pack('<I', crc) + header_tail + encoded_title + body
+
+        fd = self._file.fileno()
+        offset = os.fstat(fd).st_size
+        data = memoryview(record)
+        try:
+            while data:
+                data = data[self._file.write(data):]
+        except BaseException:
+            os.ftruncate(fd, offset)
+            raise
+        self.seq = seq
+        self._unsaved_writes += 1
+        return PackRecord(offset, len(record), len(body), seq, created_ns, modified_ns)
+
+    def get(self, title: str) -> Optional[PackRecord]:
+        """
+        Get the location of a live note, or None if it doesn't exist.
+        """
+        return self.entries.get(title)
+
+    def stat(self, record: PackRecord) -> PackStat:
+        """
+        Build the stat-like view of a stored note.
+        """
+        return PackStat(
+            st_ino=record.seq,
+            st_size=record.body_length,
+            st_mtime=record.modified_ns / 1e9,
+            st_mtime_ns=record.modified_ns,
+            st_ctime=record.created_ns / 1e9
+        )
+
+    def read(self, title: str) -> Optional[bytes]:
+        """
+        Read a note body from the mapped data file.
+
+        Args:
+            title: Note title
+
+        Returns:
+            Note body, or None if the note doesn't exist
+        """
+        with self.lock:
+            record = self.entries.get(title)
+            if record is None:
+                return None
+            end = record.offset + record.length
+            if self._map is None or end > len(self._map):
+                # Written since the file was last mapped
+                self._remap()
+            return self._map[end - record.body_length:end]
+
+    def put(self, title: str, body: bytes,
+            sync: Optional[Callable[[int], None]] = None) -> PackRecord:
+        """
+        Write a note, replacing any previous version.
+
+        Args:
+            title: Note title
+            body: Encoded note body
+            sync: Called with a data file descriptor to make the write
+                durable (for example a group commit)
+
+        Returns:
+            Location of the new record
+        """
+        with self.lock:
+            previous = self.entries.get(title)
+            created_ns = previous.created_ns if previous is not None else time.time_ns()
+            record = self._append(OP_PUT, title, body, created_ns)
+            self.entries[title] = record
+            self.live_bytes += record.length - (previous.length if previous is not None else 0)
+            self._after_write()
+            sync_fd = os.dup(self._file.fileno()) if sync is not None else None
+        self._sync(sync, sync_fd)
+        return record
+
+    def delete(self, title: str, sync: Optional[Callable[[int], None]] = None) -> bool:
+        """
+        Delete a note by appending a tombstone.
+
+        Returns:
+            True if the note existed
+        """
+        with self.lock:
+            previous = self.entries.get(title)
+            if previous is None:
+                return False
+            self._append(OP_DELETE, title, b"", 0)
+            del self.entries[title]
+            self.live_bytes -= previous.length
+            self._after_write()
+            sync_fd = os.dup(self._file.fileno()) if sync is not None else None
+        self._sync(sync, sync_fd)
+        return True
+
+    @staticmethod
+    def _sync(sync: Optional[Callable[[int], None]], fd: Optional[int]) -> None:
+        """
+        Make a write durable outside the lock, so concurrent writers can
+        share one fsync. The descriptor is a duplicate, which stays valid
+        if compaction swaps the data file meanwhile (compaction fsyncs the
+        records it copies).
+        """
+        if fd is None:
+            return
+        try:
+            sync(fd)
+        finally:
+            os.close(fd)
+
+    def items(self) -> Iterator[Tuple[str, PackRecord]]:
+        """
+        Iterate over a snapshot of (title, record) pairs of live notes.
+        """
+        with self.lock:
+            return iter(list(self.entries.items()))
+
+    def garbage_bytes(self) -> int:
+        """
+        Get the number of data file bytes held by dead records.
+        """
+        return os.fstat(self._file.fileno()).st_size - self.live_bytes
+
+    def _after_write(self) -> None:
+        """
+        Persist the index periodically and start compaction when worthwhile.
+        """
+        if self._unsaved_writes >= max(INDEX_SAVE_EVERY, len(self.entries)):
+            self.save_index()
+        garbage = self.garbage_bytes()
+        if (garbage >= COMPACT_MIN_GARBAGE
+                and garbage >= COMPACT_GARBAGE_RATIO * (garbage + self.live_bytes)
+                and (self._compactor is None or not self._compactor.is_alive())):
+            self._compactor = threading.Thread(target=self.compact, name="notes-pack-compact", daemon=True)
+            self._compactor.start()
+
+    def save_index(self) -> None:
+        """
+        Persist the offset index and the data file length it covers.
+        """
+        with self.lock:
+            stat = os.fstat(self._file.fileno())
+            data = {
+                "inode": stat.st_ino,
+                "covered": stat.st_size,
+                "seq": self.seq,
+                "entries": {title: list(record) for title, record in self.entries.items()}
+            }
+            temp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            os.replace(temp_path, self.index_path)
+            self._unsaved_writes = 0
+
+    def compact(self) -> None:
+        """
+        Rewrite the data file with only the live records.
+
+        Live records are copied without holding the lock; records appended
+        meanwhile are copied over and replayed while the new file is swapped
+        in, so writers are only blocked for that final step.
+        """
+        with self.lock:
+            if self._file is None or self._file.closed:
+                return
+            snapshot = sorted(self.entries.items(), key=lambda item: item[1].offset)
+            copied_until = os.fstat(self._file.fileno()).st_size
+            if self._map is None or len(self._map) < copied_until:
+                self._remap()
+            source = self._map
+        if source is None:
+            return
+
+        compact_path = self.path.with_name(self.path.name + '.compact')
+        entries: Dict[str, PackRecord] = {}
+        with open(compact_path, 'wb') as out:
+            offset = 0
+            for title, record in snapshot:
+                out.write(source[record.offset:record.offset + record.length])
+                entries[title] = record._replace(offset=offset)
+                offset += record.length
+
+            with self.lock:
+                end = os.fstat(self._file.fileno()).st_size
+                if end > copied_until:
+                    self._remap()
+                    out.write(self._map[copied_until:end])
+                out.flush()
+                os.fsync(out.fileno())
+                os.replace(compact_path, self.path)
+                fsync_directory(self.path.parent)
+
+                self._file.close()
+                self._file = open(self.path, 'a+b', buffering=0)
+                self._remap()
+                self._replay(entries, offset, os.fstat(self._file.fileno()).st_size)
+                self.entries = entries
+                self.live_bytes = sum(record.length for record in entries.values())
+                self.compactions += 1
+                self.save_index()
+
+    def close(self) -> None:
+        """
+        Wait for a running compaction, persist the index and close the file.
+        """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self.lock:
+            if self._file is not None and not self._file.closed:
+                self.save_index()
+                self._file.close()
+            self._map = None
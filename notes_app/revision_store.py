@@ -0,0 +1,515 @@
+# revision_store.py
+import datetime
+import difflib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Union
+
+# A delta is a list of operations that rebuild a version from the previous
+# one: [start, end] copies that character range of the previous version, a
+# string inserts new text. An edit ("edit" records) is the same with byte
+# ranges of the UTF-8 encoded previous version, so appends and patches can
+# be recorded from their offsets without reading the note.
+Delta = List[Union[List[int], str]]
+
+# Most recent version text kept in memory per note, so a new revision can be
+# diffed without rebuilding the previous one from the history file
+HEAD_CACHE_BYTES = 32 * 1024 * 1024
+
+# Notes whose history index (record offsets and metadata) is kept in memory
+INDEX_CACHE_NOTES = 1024
+
+def _common_length(a: str, b: str, from_end: bool = False) -> int:
+    """
+    Get the length of the common prefix (or suffix) of two strings, by a
+    binary search over slice comparisons so long strings are compared in C.
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if from_end:
+            same = a[len(a) - middle:] == b[len(b) - middle:]
+        else:
+            same = a[:middle] == b[:middle]
+        if same:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def _common_affixes(a: str, b: str) -> tuple:
+    """
+    Get the lengths of the common prefix and (non-overlapping) suffix of two strings.
+    """
+    prefix = _common_length(a, b)
+    suffix = _common_length(a[prefix:], b[prefix:], from_end=True)
+    return prefix, suffix
+
+def compute_delta(base: str, target: str) -> Delta:
+    """
+    Encode target as copies from base plus inserted text.
+
+    The common prefix and suffix of the two versions are copied directly;
+    lines in between are matched with difflib, and changed regions are
+    trimmed to their common prefix and suffix so edits inside long lines
+    stay small.
+
+    Args:
+        base: Previous version
+        target: New version
+
+    Returns:
+        Delta that rebuilds target from base
+    """
+    head, tail = _common_affixes(base, target)
+    base_end, target_end = len(base) - tail, len(target) - tail
+
+    base_lines = base[head:base_end].splitlines(keepends=True)
+    target_lines = target[head:target_end].splitlines(keepends=True)
+    base_starts = [head]
+    for line in base_lines:
+        base_starts.append(base_starts[-1] + len(line))
+    target_starts = [head]
+    for line in target_lines:
+        target_starts.append(target_starts[-1] + len(line))
+
+    delta: Delta = []
+
+    def copy(start: int, end: int) -> None:
+        if start == end:
+            return
+        if delta and isinstance(delta[-1], list) and delta[-1][1] == start:
+            delta[-1][1] = end
+        else:
+            delta.append([start, end])
+
+    def insert(text: str) -> None:
+        if not text:
+            return
+        if delta and isinstance(delta[-1], str):
+            delta[-1] += text
+        else:
+            delta.append(text)
+
+    copy(0, head)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        b1, b2 = base_starts[i1], base_starts[i2]
+        t1, t2 = target_starts[j1], target_starts[j2]
+        if tag == "equal":
+            copy(b1, b2)
+            continue
+        old, new = base[b1:b2], target[t1:t2]
+        prefix, suffix = _common_affixes(old, new)
+        copy(b1, b1 + prefix)
+        insert(new[prefix:len(new) - suffix])
+        copy(b2 - suffix, b2)
+    copy(base_end, len(base))
+    return delta
+
+def apply_delta(base: str, delta: Delta) -> str:
+    """
+    Rebuild a version from the previous one and its delta.
+    """
+    return "".join(base[op[0]:op[1]] if isinstance(op, list) else op for op in delta)
+
+def apply_edit(base: str, edit: Delta) -> str:
+    """
+    Rebuild a version from the previous one and its edit (byte ranges).
+    """
+    data = base.encode('utf-8')
+    return b"".join(
+        data[op[0]:op[1]] if isinstance(op, list) else op.encode('utf-8') for op in edit
+    ).decode('utf-8')
+
+def _delta_cost(delta: Delta) -> int:
+    """
+    Approximate the stored size of a delta: its inserted text plus a few
+    bytes per copy.
+    """
+    return sum(len(op) if isinstance(op, str) else 16 for op in delta)
+
+class _HistoryIndex:
+    """
+    Where each record of a note's history file starts, with its metadata,
+    so revisions can be listed without reading the file and rebuilt by
+    reading only the records back to the nearest snapshot.
+    """
+
+    __slots__ = ("entries", "end", "since_snapshot", "chain_cost")
+
+    def __init__(self):
+        # (offset, length, metadata) per record, in revision order
+        self.entries: List[tuple] = []
+        self.end = 0
+        self.since_snapshot = 0
+        self.chain_cost = 0
+
+    def add(self, offset: int, length: int, record: Dict[str, Any]) -> None:
+        """
+        Index one record stored at offset.
+        """
+        kind = ("deleted" if record.get("deleted") else "snapshot" if "snapshot" in record
+                else "edit" if "edit" in record else "delta")
+        meta = {
+            "revision": record["revision"],
+            "created_at": record["created_at"],
+            "size": record["size"],
+            "kind": kind
+        }
+        self.entries.append((offset, length, meta))
+        self.end = offset + length
+        if kind == "snapshot":
+            self.since_snapshot, self.chain_cost = 0, 0
+        else:
+            self.since_snapshot += 1
+            self.chain_cost += _delta_cost(record.get("delta") or record.get("edit") or [])
+
+    def head(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the latest record's metadata, or None if there is none.
+        """
+        return self.entries[-1][2] if self.entries else None
+
+    def position(self, revision: int) -> Optional[int]:
+        """
+        Get the entry position of a revision (revisions count up from 1).
+        """
+        index = revision - 1
+        if 0 <= index < len(self.entries) and self.entries[index][2]["revision"] == revision:
+            return index
+        return next((i for i, entry in enumerate(self.entries) if entry[2]["revision"] == revision), None)
+
+class RevisionStore:
+    """
+    Append-only revision history for notes.
+
+    Each note has a JSON-lines history file with one record per version:
+    a full snapshot, a delta against the previous version, an edit (a delta
+    in bytes, recorded by appends and patches) or a deletion marker. A
+    snapshot is stored for the first version, after a deletion, after
+    snapshot_every - 1 consecutive deltas, and once the deltas since the
+    last snapshot add up to more than the new version. Rebuilding any
+    revision therefore applies a bounded number of deltas whose total size
+    is at most one copy of the note, while a note edited in small steps
+    only stores a full copy per note-sized amount of edits.
+
+    The offsets and metadata of the records are indexed in memory for the
+    most recently used notes (INDEX_CACHE_NOTES), so listing revisions does
+    not read the history file and rebuilding one reads only the records
+    since the nearest snapshot.
+
+    Callers decide when history starts; a note that is never recorded has
+    no history file.
+    """
+
+    def __init__(self, root: Path, snapshot_every: int = 50):
+        self.root = root
+        self.snapshot_every = max(1, snapshot_every)
+        self._indexes: "OrderedDict[str, _HistoryIndex]" = OrderedDict()
+        self._indexes_lock = threading.Lock()
+        self._head_text: "OrderedDict[str, str]" = OrderedDict()
+        self._head_text_bytes = 0
+        self._locks = [threading.RLock() for _ in range(64)]
+        self._cache_lock = threading.Lock()
+
+    def lock_for(self, title: str) -> threading.RLock:
+        """
+        Get the lock serializing writes to a note's history. Holding it
+        across a note write and its record keeps revisions in write order.
+        """
+        return self._locks[hash(title) % len(self._locks)]
+
+    def history_path(self, title: str) -> Path:
+        """
+        Get the history file of a note, in a hash-prefix subdirectory.
+        """
+        shard = hashlib.md5(title.encode('utf-8')).hexdigest()[:2]
+        return self.root / shard / f"{title}.jsonl"
+
+    def _index(self, title: str) -> _HistoryIndex:
+        """
+        Get the history index of a note, building it from the history file
+        on first use (or after it was evicted). Call with the note's lock held.
+        """
+        with self._indexes_lock:
+            index = self._indexes.get(title)
+            if index is not None:
+                self._indexes.move_to_end(title)
+                return index
+
+        index = _HistoryIndex()
+        try:
+            with open(self.history_path(title), 'rb') as f:
+                offset = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn by a crash mid-append
+                        break
+                    try:
+                        index.add(offset, len(line), json.loads(line))
+                    except (ValueError, KeyError):
+                        pass
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+
+        with self._indexes_lock:
+            self._indexes[title] = index
+            while len(self._indexes) > INDEX_CACHE_NOTES:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _read_records(self, title: str, index: _HistoryIndex, first: int, last: int) -> List[Dict[str, Any]]:
+        """
+        Read the records at entry positions first to last (inclusive).
+
+        Only the indexed lines are parsed, so a torn line left between
+        records by a crash is skipped.
+        """
+        start = index.entries[first][0]
+        end = index.entries[last][0] + index.entries[last][1]
+        with open(self.history_path(title), 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return [
+            json.loads(data[offset - start:offset - start + length])
+            for offset, length, _ in index.entries[first:last + 1]
+        ]
+
+    def _head(self, title: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the latest record's metadata (without its payload).
+        """
+        return self._index(title).head()
+
+    def has_history(self, title: str) -> bool:
+        """
+        Check whether any revision of a note was recorded.
+        """
+        with self.lock_for(title):
+            return self._head(title) is not None
+
+    def _cache_head_text(self, title: str, text: Optional[str]) -> None:
+        """
+        Remember (or forget, with None) the latest version text of a note.
+        """
+        with self._cache_lock:
+            previous = self._head_text.pop(title, None)
+            if previous is not None:
+                self._head_text_bytes -= len(previous)
+            if text is None or len(text) > HEAD_CACHE_BYTES:
+                return
+            self._head_text[title] = text
+            self._head_text_bytes += len(text)
+            while self._head_text_bytes > HEAD_CACHE_BYTES:
+                _, evicted = self._head_text.popitem(last=False)
+                self._head_text_bytes -= len(evicted)
+
+    def _append(self, title: str, record: Dict[str, Any],
+                sync: Optional[Callable[[int], None]]) -> None:
+        """
+        Append one record to a note's history file and index it.
+        """
+        index = self._index(title)
+        path = self.history_path(title)
+        os.makedirs(path.parent, exist_ok=True)
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(path, 'a+b') as f:
+            offset = f.seek(0, os.SEEK_END)
+            stale = offset != index.end
+            if offset > 0 and stale:
+                # Written elsewhere or torn by a crash: end any partial line
+                # and index the file again on next use
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            if sync is not None:
+                f.flush()
+                sync(f.fileno())
+        if stale:
+            with self._indexes_lock:
+                self._indexes.pop(title, None)
+        else:
+            index.add(offset, len(line), record)
+
+    def _due_snapshot(self, index: _HistoryIndex, cost: int, size: int) -> bool:
+        """
+        Check whether the next version must be a snapshot instead of a delta
+        of the given cost.
+        """
+        return (index.since_snapshot + 1 >= self.snapshot_every
+                or index.chain_cost + cost > size)
+
+    def record(self, title: str, content: str,
+               sync: Optional[Callable[[int], None]] = None,
+               created_at: Optional[str] = None) -> int:
+        """
+        Record a new version of a note.
+
+        Args:
+            title: Note title
+            content: Full new content
+            sync: Called with the history file descriptor to make the
+                record durable
+            created_at: When the version was written, if not now (ISO format)
+
+        Returns:
+            The new revision number
+        """
+        with self.lock_for(title):
+            index = self._index(title)
+            head = index.head()
+            base = None
+            if head is not None and head["kind"] != "deleted":
+                with self._cache_lock:
+                    base = self._head_text.get(title)
+                if base is None:
+                    base = self._rebuild(title, index, len(index.entries) - 1)
+
+            revision = head["revision"] + 1 if head is not None else 1
+            record = {
+                "revision": revision,
+                "created_at": created_at or datetime.datetime.now().isoformat(),
+                "size": len(content.encode('utf-8'))
+            }
+            delta = None
+            if base is not None and index.since_snapshot + 1 < self.snapshot_every:
+                delta = compute_delta(base, content)
+                if self._due_snapshot(index, _delta_cost(delta), len(content)):
+                    delta = None
+            if delta is None:
+                record["snapshot"] = content
+            else:
+                record["delta"] = delta
+
+            self._append(title, record, sync)
+            self._cache_head_text(title, content)
+            return revision
+
+    def record_edit(self, title: str, previous_size: int, edit: Delta, size: int,
+                    read: Callable[[], str],
+                    sync: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Record a new version of a note from the bytes an append or patch
+        changed, without reading or diffing the note.
+
+        Falls back to record(read(), ...) when a snapshot is due or the
+        history does not end at a version of previous_size bytes (the note
+        was changed by someone else).
+
+        Args:
+            title: Note title
+            previous_size: Size in bytes of the note before the change
+            edit: Byte ranges of the previous version and inserted text
+                that make up the new one
+            size: Size in bytes of the new version
+            read: Returns the full new content, if it is needed
+            sync: Called with the history file descriptor to make the
+                record durable
+
+        Returns:
+            The new revision number
+        """
+        with self.lock_for(title):
+            index = self._index(title)
+            head = index.head()
+            if (head is None or head["kind"] == "deleted" or head["size"] != previous_size
+                    or self._due_snapshot(index, _delta_cost(edit), size)):
+                return self.record(title, read(), sync)
+
+            record = {
+                "revision": head["revision"] + 1,
+                "created_at": datetime.datetime.now().isoformat(),
+                "size": size,
+                "edit": edit
+            }
+            self._append(title, record, sync)
+            # Rebuilt from the history file when next needed
+            self._cache_head_text(title, None)
+            return record["revision"]
+
+    def record_delete(self, title: str, sync: Optional[Callable[[int], None]] = None) -> Optional[int]:
+        """
+        Record that a note was deleted. Earlier revisions stay readable.
+
+        Returns:
+            The deletion's revision number, or None if the note has no history
+        """
+        with self.lock_for(title):
+            head = self._head(title)
+            if head is None or head["kind"] == "deleted":
+                return None
+            record = {
+                "revision": head["revision"] + 1,
+                "created_at": datetime.datetime.now().isoformat(),
+                "size": 0,
+                "deleted": True
+            }
+            self._append(title, record, sync)
+            self._cache_head_text(title, None)
+            return record["revision"]
+
+    def list(self, title: str) -> List[Dict[str, Any]]:
+        """
+        List the revisions of a note, oldest first, without their content.
+
+        Returns:
+            Revision metadata: revision, created_at, size and kind
+            ("snapshot", "delta", "edit" or "deleted")
+        """
+        with self.lock_for(title):
+            return [dict(meta) for _, _, meta in self._index(title).entries]
+
+    def get(self, title: str, revision: int) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild one revision of a note.
+
+        Returns:
+            Revision metadata with its content (None for a deletion), or
+            None if the revision doesn't exist
+        """
+        with self.lock_for(title):
+            index = self._index(title)
+            position = index.position(revision)
+            if position is None:
+                return None
+            meta = index.entries[position][2]
+            deleted = meta["kind"] == "deleted"
+            return {
+                "revision": revision,
+                "created_at": meta["created_at"],
+                "size": meta["size"],
+                "deleted": deleted,
+                "content": None if deleted else self._rebuild(title, index, position)
+            }
+
+    def _rebuild(self, title: str, index: _HistoryIndex, position: int) -> Optional[str]:
+        """
+        Rebuild the revision at an entry position by applying the deltas
+        after the nearest snapshot at or before it.
+        """
+        start = position
+        while index.entries[start][2]["kind"] != "snapshot":
+            if index.entries[start][2]["kind"] == "deleted" or start == 0:
+                return None
+            start -= 1
+        records = self._read_records(title, index, start, position)
+        # Runs of edits are applied to the encoded text, converting between
+        # text and bytes only where edits and deltas alternate
+        content: Union[str, bytes] = records[0]["snapshot"]
+        for record in records[1:]:
+            if "edit" in record:
+                data = content.encode('utf-8') if isinstance(content, str) else content
+                content = b"".join(
+                    data[op[0]:op[1]] if isinstance(op, list) else op.encode('utf-8') for op in record["edit"]
+                )
+            else:
+                text = content.decode('utf-8') if isinstance(content, bytes) else content
+                content = apply_delta(text, record["delta"])
+        return content.decode('utf-8') if isinstance(content, bytes) else content
@@ -0,0 +1,258 @@
+# search_index.py
+import json
+import math
+import os
+import re
+import heapq
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# BM25 tuning parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# The change journal is folded into the snapshot once it grows past the
+# snapshot's size (and at least this many bytes)
+JOURNAL_COMPACT_MIN_BYTES = 1024 * 1024
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+class SearchIndex:
+    """
+    Incremental inverted index over note titles and contents, ranked with BM25.
+
+    Each document keeps its own term frequencies so it can be removed or
+    replaced without rebuilding the index. A signature (file size and
+    modification time) is stored per document so a loaded index can be
+    reconciled against the notes that changed while it was not running.
+
+    Once loaded, every change is appended to a journal next to the persisted
+    snapshot ({path}.log), so persisting a change costs the size of the
+    changed document, not of the index. save() folds the journal into a new
+    snapshot; load() replays it.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.total_length = 0
+        self.loaded = False
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.journal_path: Optional[Path] = None
+        self.journal_bytes = 0
+        self.snapshot_bytes = 0
+        self._journal = None
+
+    def add(self, title: str, content: str, signature: Tuple[int, str]) -> None:
+        """
+        Index (or re-index) a note.
+
+        Args:
+            title: Note title
+            content: Note content
+            signature: (file_size, modified_at) of the indexed version
+        """
+        tokens = tokenize(title) + tokenize(content)
+        terms: Dict[str, int] = {}
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+
+        document = {
+            "length": len(tokens),
+            "signature": list(signature),
+            "terms": terms
+        }
+        with self.lock:
+            self._put(title, document)
+            self._log({"op": "add", "title": title, "document": document})
+
+    def _put(self, title: str, document: Dict[str, Any]) -> None:
+        self._remove(title)
+        for term, frequency in document["terms"].items():
+            self.postings.setdefault(term, {})[title] = frequency
+        self.documents[title] = document
+        self.total_length += document["length"]
+        self.dirty = True
+
+    def remove(self, title: str) -> None:
+        """
+        Remove a note from the index if present.
+
+        Args:
+            title: Note title
+        """
+        with self.lock:
+            if self._remove(title):
+                self._log({"op": "remove", "title": title})
+
+    def _remove(self, title: str) -> bool:
+        document = self.documents.pop(title, None)
+        if document is None:
+            return False
+        for term in document["terms"]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(title, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= document["length"]
+        self.dirty = True
+        return True
+
+    def _log(self, record: Dict[str, Any]) -> None:
+        """
+        Append a change to the journal (not fsynced: the index can always be
+        rebuilt from the notes by reconciliation).
+        """
+        if self.journal_path is None:
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._journal.write(line)
+        self._journal.flush()
+        self.journal_bytes += len(line)
+
+    def needs_compaction(self) -> bool:
+        """
+        Check whether the journal has grown enough to fold it into the snapshot.
+        """
+        return self.journal_bytes > max(self.snapshot_bytes, JOURNAL_COMPACT_MIN_BYTES)
+
+    def signature(self, title: str) -> Optional[Tuple[int, str]]:
+        """
+        Get the signature of the indexed version of a note.
+
+        Args:
+            title: Note title
+
+        Returns:
+            (file_size, modified_at) tuple or None if the note is not indexed
+        """
+        document = self.documents.get(title)
+        if document is None:
+            return None
+        return tuple(document["signature"])
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        Rank notes against a query using BM25.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            List of (title, score) tuples, best match first
+        """
+        with self.lock:
+            document_count = len(self.documents)
+            if document_count == 0:
+                return []
+            average_length = self.total_length / document_count or 1.0
+
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (document_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for title, frequency in posting.items():
+                    length = self.documents[title]["length"]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    scores[title] = scores.get(title, 0.0) + score
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def load(self, path: Path) -> None:
+        """
+        Load a persisted index from disk and replay its journal. A missing
+        or unreadable file leaves the index empty, to be filled by
+        reconciliation. Later changes are journaled next to path.
+
+        Args:
+            path: Path of the persisted index file
+        """
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.total_length = 0
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                documents = data.get("documents", {}) if isinstance(data, dict) else {}
+                self.snapshot_bytes = os.path.getsize(path)
+            except (OSError, ValueError):
+                documents = {}
+                self.snapshot_bytes = 0
+
+            for title, document in documents.items():
+                for term, frequency in document["terms"].items():
+                    self.postings.setdefault(term, {})[title] = frequency
+                self.documents[title] = document
+                self.total_length += document["length"]
+
+            self._close_journal()
+            self.journal_path = path.with_name(path.name + '.log')
+            self.journal_bytes = 0
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Torn last line from a crash
+                            break
+                        if record["op"] == "add":
+                            self._put(record["title"], record["document"])
+                        else:
+                            self._remove(record["title"])
+                        self.journal_bytes += len(line)
+            except OSError:
+                pass
+            self.loaded = True
+            self.dirty = self.journal_bytes > 0
+
+    def save(self, path: Path) -> None:
+        """
+        Persist the index to disk if it changed since the last save, and
+        empty the journal it replaces.
+
+        Args:
+            path: Path of the persisted index file
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            temp_path = path.with_name(path.name + '.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": 1, "documents": self.documents}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            self.snapshot_bytes = os.path.getsize(path)
+            self.dirty = False
+            # Replaying the old journal over the new snapshot would be
+            # harmless, so a crash before this point loses nothing
+            self._close_journal()
+            if self.journal_path is not None:
+                open(self.journal_path, 'w').close()
+            self.journal_bytes = 0
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,63 @@
+# test_group_commit.py
+import os
+import threading
+
+import pytest
+
+from group_commit import GroupCommit
+
+def test_commit_renames_into_place(tmp_path):
+    temp_path = tmp_path / "note.txt.tmp"
+    final_path = tmp_path / "note.txt"
+    final_path.write_text("old")
+    temp_path.write_text("new")
+    commit = GroupCommit()
+
+    with open(temp_path, 'rb') as f:
+        commit.commit(f.fileno(), temp_path, final_path)
+
+    assert final_path.read_text() == "new"
+    assert not temp_path.exists()
+    assert (commit.groups, commit.writes) == (1, 1)
+
+def test_concurrent_writes_to_one_file_share_an_fsync(tmp_path):
+    path = tmp_path / "notes.pack"
+    path.write_bytes(b"data")
+    commit = GroupCommit(window=0.2)
+    fd = os.open(path, os.O_RDONLY)
+    start = threading.Barrier(8)
+
+    def writer():
+        own = os.dup(fd)
+        try:
+            start.wait()
+            commit.commit(own)
+        finally:
+            os.close(own)
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    os.close(fd)
+
+    assert commit.writes == 8
+    assert commit.groups <= 2
+    assert commit.fsyncs == commit.groups
+
+def test_failed_rename_is_reported_to_its_writer(tmp_path):
+    good_temp = tmp_path / "good.tmp"
+    bad_temp = tmp_path / "bad.tmp"
+    good_temp.write_text("good")
+    bad_temp.write_text("bad")
+    commit = GroupCommit()
+
+    with open(bad_temp, 'rb') as f:
+        with pytest.raises(OSError):
+            commit.commit(f.fileno(), bad_temp, tmp_path / "missing" / "bad.txt")
+    with open(good_temp, 'rb') as f:
+        commit.commit(f.fileno(), good_temp, tmp_path / "good.txt")
+
+    assert bad_temp.exists()
+    assert (tmp_path / "good.txt").read_text() == "good"
@@ -0,0 +1,160 @@
+# test_pack_store.py
+import os
+import threading
+
+import pytest
+
+import pack_store
+from pack_store import PackStore
+
+def crash(store: PackStore) -> None:
+    """
+    Drop a store without saving its index, like a killed process.
+    """
+    store._map = None
+    store._file.close()
+
+def test_reopen_replays_records_after_saved_index(tmp_path):
+    path = tmp_path / "notes.pack"
+    store = PackStore(path)
+    store.put("a", b"first")
+    store.close()
+
+    store = PackStore(path)
+    store.put("b", b"second")
+    store.put("a", b"third")
+    store.delete("b")
+    crash(store)
+
+    store = PackStore(path)
+    assert store.read("a") == b"third"
+    assert store.read("b") is None
+    assert store.seq == 4
+    store.close()
+
+def test_reopen_after_truncated_record(tmp_path):
+    path = tmp_path / "notes.pack"
+    store = PackStore(path)
+    store.put("a", b"alpha")
+    store.put("b", b"beta")
+    intact = os.path.getsize(path)
+    store.put("c", b"gamma" * 10)
+    crash(store)
+    os.truncate(path, os.path.getsize(path) - 7)
+
+    store = PackStore(path)
+    assert store.read("a") == b"alpha"
+    assert store.read("b") == b"beta"
+    assert store.read("c") is None
+    assert os.path.getsize(path) == intact
+
+    # New writes start after the last intact record and survive a reopen
+    store.put("d", b"delta")
+    crash(store)
+    store = PackStore(path)
+    assert sorted(title for title, _ in store.items()) == ["a", "b", "d"]
+    assert store.read("d") == b"delta"
+    store.close()
+
+def test_truncated_record_with_stale_index(tmp_path):
+    path = tmp_path / "notes.pack"
+    store = PackStore(path)
+    store.put("a", b"alpha")
+    store.close()
+    os.truncate(path, os.path.getsize(path) - 1)
+
+    # The index covers more than the file holds, so it is ignored
+    store = PackStore(path)
+    assert store.read("a") is None
+    assert os.path.getsize(path) == 0
+    store.put("a", b"again")
+    assert store.read("a") == b"again"
+    store.close()
+
+class FailingFile:
+    """
+    Data file wrapper whose writes stop part way through.
+    """
+
+    def __init__(self, file, allowed: int):
+        self.file = file
+        self.allowed = allowed
+
+    def write(self, data) -> int:
+        if self.allowed <= 0:
+            raise OSError("disk full")
+        written = self.file.write(data[:self.allowed])
+        self.allowed -= written
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+def test_failed_append_is_rolled_back(tmp_path):
+    path = tmp_path / "notes.pack"
+    store = PackStore(path)
+    store.put("a", b"alpha")
+    store.put("b", b"beta")
+    size = os.path.getsize(path)
+
+    real_file = store._file
+    store._file = FailingFile(real_file, 10)
+    with pytest.raises(OSError):
+        store.put("a", b"replaced")
+    with pytest.raises(OSError):
+        store.delete("b")
+    store._file = real_file
+
+    assert os.path.getsize(path) == size
+    assert store.read("a") == b"alpha"
+    assert store.read("b") == b"beta"
+    assert store.seq == 2
+    store.close()
+
+def test_compaction_alongside_puts(tmp_path, monkeypatch):
+    # Keep compaction under the test's control
+    monkeypatch.setattr(pack_store, "COMPACT_MIN_GARBAGE", float("inf"))
+    path = tmp_path / "notes.pack"
+    store = PackStore(path)
+    for round_ in range(20):
+        for i in range(60):
+            store.put(f"note-{i}", f"{round_}:{i}".encode() * 20)
+
+    expected = {}
+    stop = threading.Event()
+
+    def writer():
+        round_ = 0
+        while not stop.is_set() or round_ < 5:
+            for i in range(0, 60, 3):
+                body = f"w{round_}:{i}".encode() * 20
+                store.put(f"note-{i}", body)
+                expected[f"note-{i}"] = body
+            store.delete("note-1")
+            round_ += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    for _ in range(3):
+        store.compact()
+    stop.set()
+    thread.join()
+
+    assert store.compactions == 3
+    for i in range(60):
+        title = f"note-{i}"
+        if title == "note-1":
+            assert store.read(title) is None
+        elif title in expected:
+            assert store.read(title) == expected[title]
+        else:
+            assert store.read(title) == f"19:{i}".encode() * 20
+    assert store.live_bytes == sum(record.length for _, record in store.items())
+    store.compact()
+    assert store.garbage_bytes() == 0
+
+    snapshot = {title: store.read(title) for title, _ in store.items()}
+    store.close()
+    store = PackStore(path)
+    assert {title: store.read(title) for title, _ in store.items()} == snapshot
+    store.close()
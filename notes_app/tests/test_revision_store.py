@@ -0,0 +1,92 @@
+# test_revision_store.py
+from revision_store import RevisionStore, apply_delta, compute_delta
+
+def size_of(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+def append_edit(store: RevisionStore, title: str, current: str, text: str) -> str:
+    """
+    Record an append the way the notes API does and return the new content.
+    """
+    new = current + text
+    store.record_edit(title, size_of(current), [[0, size_of(current)], text], size_of(new), lambda: new)
+    return new
+
+def patch_edit(store: RevisionStore, title: str, current: str, offset: int, text: str) -> str:
+    """
+    Record an in-place patch at a byte offset and return the new content.
+    """
+    data = current.encode('utf-8')
+    end = offset + size_of(text)
+    new = (data[:offset] + text.encode('utf-8') + data[end:]).decode('utf-8')
+    edit = [[0, offset], text] + ([[end, len(data)]] if end < len(data) else [])
+    store.record_edit(title, size_of(current), edit, size_of(new), lambda: new)
+    return new
+
+def test_delta_round_trip():
+    base = "line one\nline two\nline three\n" * 20
+    target = base.replace("two", "2") + "tail ✓\n"
+    assert apply_delta(base, compute_delta(base, target)) == target
+
+def test_rebuild_across_snapshots_deltas_and_edits(tmp_path):
+    store = RevisionStore(tmp_path, snapshot_every=4)
+    versions = []
+    content = "Grüße\n" + "shared body line\n" * 50
+    store.record("note", content)
+    versions.append(content)
+    for step in range(12):
+        if step % 3 == 0:
+            content = content.replace("shared", f"edited {step}", 1)
+            store.record("note", content)
+        elif step % 3 == 1:
+            content = append_edit(store, "note", content, f"appended ✓ {step}\n")
+        else:
+            content = patch_edit(store, "note", content, 0, "GRÜ")
+        versions.append(content)
+
+    kinds = {meta["kind"] for meta in store.list("note")}
+    assert {"snapshot", "delta", "edit"} <= kinds
+    assert [meta["revision"] for meta in store.list("note")] == list(range(1, len(versions) + 1))
+
+    # A fresh store has no cached head text or index and rebuilds from disk
+    for reader in (store, RevisionStore(tmp_path, snapshot_every=4)):
+        for revision, expected in enumerate(versions, 1):
+            result = reader.get("note", revision)
+            assert result["content"] == expected
+            assert result["size"] == size_of(expected)
+
+def test_edit_falls_back_to_full_record_when_history_is_behind(tmp_path):
+    store = RevisionStore(tmp_path)
+    store.record("note", "abc")
+    # The note changed without being recorded, so the edit base is unknown
+    store.record_edit("note", 10, [[0, 10], "!"], 11, lambda: "0123456789!")
+    assert store.list("note")[-1]["kind"] != "edit"
+    assert store.get("note", 2)["content"] == "0123456789!"
+
+def test_deletion_keeps_earlier_revisions(tmp_path):
+    store = RevisionStore(tmp_path)
+    store.record("note", "first")
+    store.record("note", "second")
+    assert store.record_delete("note") == 3
+    assert store.record_delete("note") is None
+    store.record("note", "reborn")
+
+    assert [meta["kind"] for meta in store.list("note")] == ["snapshot", "delta", "deleted", "snapshot"]
+    assert store.get("note", 2)["content"] == "second"
+    assert store.get("note", 3)["deleted"] is True
+    assert store.get("note", 4)["content"] == "reborn"
+    assert store.get("note", 5) is None
+
+def test_torn_record_is_ignored(tmp_path):
+    store = RevisionStore(tmp_path)
+    store.record("note", "first")
+    store.record("note", "second")
+    path = store.history_path("note")
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+
+    store = RevisionStore(tmp_path)
+    assert [meta["revision"] for meta in store.list("note")] == [1]
+    store.record("note", "third")
+    store = RevisionStore(tmp_path)
+    assert store.get("note", 2)["content"] == "third"
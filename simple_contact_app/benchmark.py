@@ -0,0 +1,472 @@
+# benchmark.py
+"""
+Benchmarks for the Contact Management System.
+
+Cold start: writes N contacts through the persistence layer and measures
+how long startup takes to bring them back (load + name index build) when
+they are all in the snapshot, all in the write-ahead log, or in a snapshot
+plus a log tail of one snapshot interval (the worst case in steady state).
+
+Workers: starts `uvicorn --workers N` on a shared SQLite store (CONTACTS_DB)
+for each N and drives it from separate client processes with a mixed
+read/write workload, reporting requests per second. After each run every
+worker must report the same number of contacts. Run it on a machine with
+at least as many cores as the largest N plus the client processes.
+
+Bulk import: streams N generated contacts to POST /contacts/bulk in-process
+(httpx ASGI transport, body generated up front) and reports rows per second.
+
+Memory: loads N contacts from a snapshot and reports the bytes allocated per
+contact (tracemalloc) for the store as it was (the snapshot's dictionaries)
+and as it is (ContactRecord objects), and for each index built over it.
+
+Validation: validates N generated contacts (a share of them invalid) with
+ContactCreate and ContactUpdate one at a time, as the single-contact
+endpoints do, and in batches with validate_contacts, as the bulk import
+does, and reports contacts per second.
+
+Fuzzy search: builds the fuzzy name index over N generated first + last
+names (a realistic vocabulary rather than numbered names) and reports the
+build time and search latency percentiles for queries with one typo per
+word.
+
+Usage:
+    python benchmark.py --contacts 1000000
+    python benchmark.py --contacts 100000 --dir /mnt/data
+    python benchmark.py --workers 1 2 4 8 --clients 8 --duration 10
+    python benchmark.py --bulk 1000000 --format csv ndjson
+    python benchmark.py --memory 200000
+    python benchmark.py --validation 200000 --invalid 0.1
+    python benchmark.py --search 1000000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+
+from field_index import FieldIndex
+from fuzzy_index import FuzzyIndex
+from models import ContactCreate, ContactRecord, ContactUpdate, validate_contacts
+from name_index import NameIndex
+from persistence import ContactPersistence
+
+def make_contact(i):
+    """
+    Build the i-th synthetic contact as (name, record).
+    """
+    name = f"Contact {i:07d}"
+    return name, ContactRecord(name, f"555-{i % 1000:03d}-{i % 10000:04d}", f"contact{i}@example.com")
+
+def write_contacts(directory, count, snapshot_at):
+    """
+    Log count contacts, taking a snapshot after the first snapshot_at of them.
+    """
+    persistence = ContactPersistence(directory, snapshot_every=count + 1, fsync=False)
+    persistence.load({})
+    for i in range(count):
+        if i == snapshot_at:
+            persistence.start_snapshot().join()
+        persistence.put(*make_contact(i))
+    if snapshot_at >= count:
+        persistence.start_snapshot().join()
+    # Leave the log tail in place, as after a crash
+    persistence._segment.close()
+
+def cold_start(directory):
+    """
+    Load the contacts and build the name index, as the startup hook does
+    (with the garbage collector paused).
+    """
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        contacts = {}
+        result = ContactPersistence(directory).load(contacts)
+        loaded = time.perf_counter()
+        NameIndex().build(contacts.keys())
+        indexed = time.perf_counter()
+    finally:
+        gc.enable()
+    return len(contacts), result["replayed_records"], loaded - start, indexed - loaded
+
+def cold_start_main(args):
+    print(f"Cold start with {args.contacts} contacts")
+    print(f"{'layout':<28} {'contacts':>9} {'replayed':>9} {'load s':>8} {'index s':>8} {'total s':>8}")
+    layouts = [
+        ("snapshot only", args.contacts),
+        (f"snapshot + {args.tail} log tail", max(0, args.contacts - args.tail)),
+        ("log only", 0)
+    ]
+    for label, snapshot_at in layouts:
+        directory = Path(tempfile.mkdtemp(prefix="contacts-bench-", dir=args.dir))
+        try:
+            write_contacts(directory, args.contacts, snapshot_at)
+            contacts, replayed, load_time, index_time = cold_start(directory)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{label:<28} {contacts:>9} {replayed:>9} {load_time:>8.2f} {index_time:>8.2f} "
+              f"{load_time + index_time:>8.2f}")
+
+def free_port():
+    """
+    Get a TCP port nobody listens on.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers, db_path, port):
+    """
+    Start uvicorn with the shared store and wait until it answers.
+    """
+    env = dict(os.environ, CONTACTS_DB=str(db_path), CONTACTS_FSYNC="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=Path(__file__).parent, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("uvicorn did not start")
+
+def client_worker(port, client_id, duration, write_ratio):
+    """
+    Issue requests for a fixed time and return how many completed.
+    """
+    done = 0
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+        end = time.time() + duration
+        while time.time() < end:
+            if (done * 7919 + client_id) % 100 < write_ratio * 100:
+                name = f"Client{client_id} Contact{done}"
+                response = client.post("/contacts/", json={"name": name, "phone": "555-123-4567",
+                                                           "email": "bench@example.com"})
+            elif done % 2:
+                response = client.get("/contacts/", params={"prefix": f"client{done % 8}"})
+            else:
+                response = client.get("/contacts/", params={"name": "contact1", "limit": 20})
+            response.raise_for_status()
+            done += 1
+    return done
+
+def current_contacts(port, attempts=32):
+    """
+    Ask the server repeatedly (new connections land on any worker) how many
+    contacts it has.
+    """
+    return {httpx.get(f"http://127.0.0.1:{port}/").json()["current_contacts"] for _ in range(attempts)}
+
+def workers_main(args):
+    print(f"Throughput with {args.clients} client processes, {args.write_ratio:.0%} writes, "
+          f"{args.duration}s per run ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>7} {'requests':>9} {'req/s':>9} {'consistent':>10}")
+    for workers in args.workers:
+        directory = Path(tempfile.mkdtemp(prefix="contacts-bench-", dir=args.dir))
+        port = free_port()
+        server = start_server(workers, directory / "contacts.db", port)
+        try:
+            start = time.perf_counter()
+            with multiprocessing.Pool(args.clients) as pool:
+                counts = pool.starmap(client_worker, [
+                    (port, c, args.duration, args.write_ratio) for c in range(args.clients)
+                ])
+            elapsed = time.perf_counter() - start
+            consistent = len(current_contacts(port)) == 1
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+        total = sum(counts)
+        print(f"{workers:>7} {total:>9} {total / elapsed:>9.0f} {'yes' if consistent else 'NO':>10}")
+
+def bulk_body(count, body_format, chunk_rows=2000):
+    """
+    Generate a bulk import body as a list of chunks.
+    """
+    chunks = [b"name,phone,email\n"] if body_format == "csv" else []
+    for start in range(0, count, chunk_rows):
+        rows = []
+        for i in range(start, min(count, start + chunk_rows)):
+            name, contact = make_contact(i)
+            if body_format == "csv":
+                rows.append(f"{name},{contact.phone},{contact.email}\n")
+            else:
+                rows.append(json.dumps(contact.to_dict()) + "\n")
+        chunks.append("".join(rows).encode('utf-8'))
+    return chunks
+
+async def run_bulk(app, chunks, content_type):
+    """
+    Stream one bulk import and return the response summary and elapsed time.
+    """
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/contacts/bulk", content=body(), headers={"content-type": content_type})
+        elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return response.json(), elapsed
+
+def bulk_main(args):
+    import logging
+    logging.disable(logging.INFO)
+    import main as contacts_main
+
+    print(f"Bulk import of {args.bulk} contacts (in-memory store)")
+    print(f"{'format':<7} {'created':>9} {'failed':>7} {'seconds':>8} {'rows/s':>9}")
+    for body_format in args.format:
+        chunks = bulk_body(args.bulk, body_format)
+        contacts_main.contacts_db.clear()
+        contacts_main.rebuild_indexes()
+        content_type = "text/csv" if body_format == "csv" else "application/x-ndjson"
+        result, elapsed = asyncio.run(run_bulk(contacts_main.app, chunks, content_type))
+        print(f"{body_format:<7} {result['created']:>9} {result['failed']:>7} {elapsed:>8.1f} "
+              f"{args.bulk / elapsed:>9.0f}")
+
+def allocated(build):
+    """
+    Call build and return (its result, bytes it left allocated).
+    """
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+
+def load_dicts(directory):
+    """
+    Load the contacts as dictionaries, the way the store used to hold them.
+    """
+    with open(directory / "contacts.snapshot", 'r', encoding='utf-8') as f:
+        return json.load(f)["contacts"]
+
+def load_records(directory):
+    """
+    Load the contacts as the store holds them.
+    """
+    contacts = {}
+    persistence = ContactPersistence(directory)
+    persistence.load(contacts)
+    persistence.close()
+    return contacts
+
+def build_field_indexes(contacts):
+    """
+    Build the email and phone indexes as main.rebuild_indexes() does.
+    """
+    from main import email_key
+    from models import phone_digits
+    email_index = FieldIndex()
+    phone_index = FieldIndex()
+    for name, contact in contacts.items():
+        email_index.add(email_key(contact.email), name)
+        phone_index.add(phone_digits(contact.phone), name)
+    return email_index, phone_index
+
+def memory_main(args):
+    import logging
+    logging.disable(logging.INFO)
+
+    directory = Path(tempfile.mkdtemp(prefix="contacts-bench-", dir=args.dir))
+    try:
+        write_contacts(directory, args.memory, args.memory)
+        dicts, dict_bytes = allocated(lambda: load_dicts(directory))
+        del dicts
+        contacts, record_bytes = allocated(lambda: load_records(directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def build_name_index():
+        index = NameIndex()
+        index.build(contacts)
+        index.sorted_keys
+        return index
+
+    def build_fuzzy_index():
+        index = FuzzyIndex()
+        index.build(contacts)
+        return index
+
+    rows = [("store: dict per contact (before)", dict_bytes), ("store: ContactRecord", record_bytes)]
+    for label, build in [("name index", build_name_index), ("fuzzy index", build_fuzzy_index),
+                         ("email + phone indexes", lambda: build_field_indexes(contacts))]:
+        index, size = allocated(build)
+        rows.append((label, size))
+        del index
+
+    print(f"Memory for {args.memory} contacts")
+    print(f"{'structure':<36} {'MB':>8} {'bytes/contact':>14}")
+    for label, size in rows:
+        print(f"{label:<36} {size / 1e6:>8.1f} {size / args.memory:>14.0f}")
+
+def validation_items(count, invalid):
+    """
+    Generate raw contact fields as a client sends them, with the given
+    share of them failing validation (bad phone or email).
+    """
+    rng = random.Random(7)
+    items = []
+    for i in range(count):
+        name, contact = make_contact(i)
+        item = {"name": f"  {name.lower()} ", "phone": contact.phone, "email": contact.email.upper()}
+        if rng.random() < invalid:
+            item[rng.choice(["phone", "email"])] = "n/a"
+        items.append(item)
+    return items
+
+def validate_each(model, items):
+    """
+    Validate items one at a time, as a request handler does.
+    """
+    for item in items:
+        try:
+            model.model_validate(item).model_dump()
+        except ValueError:
+            pass
+
+def validate_batches(items, batch_size=5000):
+    """
+    Validate items in batches, as the bulk import does.
+    """
+    for start in range(0, len(items), batch_size):
+        validate_contacts(items[start:start + batch_size])
+
+def validation_main(args):
+    items = validation_items(args.validation, args.invalid)
+    update_items = [{"phone": item["phone"], "email": item["email"]} for item in items]
+    print(f"Validation of {args.validation} contacts ({args.invalid:.0%} invalid)")
+    print(f"{'path':<36} {'seconds':>8} {'contacts/s':>11}")
+    runs = [
+        ("ContactCreate, one at a time", lambda: validate_each(ContactCreate, items)),
+        ("ContactUpdate, one at a time", lambda: validate_each(ContactUpdate, update_items)),
+        ("validate_contacts, batches of 5000", lambda: validate_batches(items))
+    ]
+    for label, run in runs:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<36} {elapsed:>8.2f} {args.validation / elapsed:>11.0f}")
+
+SYLLABLES = ["an", "bel", "car", "dan", "el", "fer", "gar", "hal", "is", "jo", "ken", "li", "mar",
+             "nor", "ol", "pet", "quin", "ros", "sam", "ter", "ul", "vin", "wil", "xan", "yor", "zel",
+             "son", "ton", "ley", "berg", "man", "ski", "ez", "ova", "ard", "ing"]
+
+def random_word(rng, syllables):
+    """
+    Build a capitalized made-up word.
+    """
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+def typo(rng, word):
+    """
+    Apply one random edit (swap, substitution, deletion or insertion) to a word.
+    """
+    i = rng.randrange(len(word) - 1)
+    edit = rng.randrange(4)
+    if edit == 0:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == 1:
+        return word[:i] + rng.choice("aeiourst") + word[i + 1:]
+    if edit == 2:
+        return word[:i] + word[i + 1:]
+    return word[:i] + rng.choice("aeiourst") + word[i:]
+
+def search_main(args):
+    rng = random.Random(42)
+    first_names = list({random_word(rng, rng.randint(1, 2)) for _ in range(5000)})
+    last_names = list({random_word(rng, rng.randint(2, 3)) for _ in range(150000)})
+    names = list({f"{rng.choice(first_names)} {rng.choice(last_names)}" for _ in range(args.search)})
+
+    index = FuzzyIndex()
+    start = time.perf_counter()
+    index.build(names)
+    build_time = time.perf_counter() - start
+    print(f"Fuzzy index over {len(names)} names ({len(index.word_names.entries)} distinct words): "
+          f"built in {build_time:.1f}s")
+
+    print(f"{'query':<22} {'max_distance':>12} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8} {'top 20':>6}")
+    queries = rng.sample(names, args.queries)
+    kinds = [
+        ("last name", lambda name: typo(rng, name.split()[1])),
+        ("first + last name", lambda name: " ".join(typo(rng, word) for word in name.split()))
+    ]
+    for label, make_query in kinds:
+        for max_distance in (1, 2):
+            times = []
+            found = 0
+            for name in queries:
+                query = make_query(name)
+                start = time.perf_counter()
+                results = index.search(query, max_distance, 20)
+                times.append(time.perf_counter() - start)
+                found += any(result == name for result, _ in results)
+            times.sort()
+            print(f"{label:<22} {max_distance:>12} {len(times):>8} {times[len(times) // 2] * 1000:>8.1f} "
+                  f"{times[len(times) * 95 // 100] * 1000:>8.1f} {found / len(times):>6.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the contacts API")
+    parser.add_argument("--contacts", type=int, default=1000000, help="Number of stored contacts")
+    parser.add_argument("--tail", type=int, default=100000,
+                        help="Log records after the snapshot (CONTACTS_SNAPSHOT_EVERY)")
+    parser.add_argument("--dir", default=None, help="Directory for the data files (default: system temp)")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Run the worker throughput benchmark with these uvicorn worker counts")
+    parser.add_argument("--clients", type=int, default=8, help="Client processes for --workers")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per --workers run")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="Fraction of requests that write")
+    parser.add_argument("--bulk", type=int, default=0,
+                        help="Run the bulk import benchmark with this many contacts")
+    parser.add_argument("--format", choices=["csv", "ndjson"], nargs="+", default=["csv", "ndjson"],
+                        help="Body formats for --bulk")
+    parser.add_argument("--memory", type=int, default=0,
+                        help="Run the memory benchmark with this many contacts")
+    parser.add_argument("--validation", type=int, default=0,
+                        help="Run the validation benchmark with this many contacts")
+    parser.add_argument("--invalid", type=float, default=0.1,
+                        help="Share of invalid contacts for --validation")
+    parser.add_argument("--search", type=int, default=0,
+                        help="Run the fuzzy search benchmark over this many names")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per --search run")
+    args = parser.parse_args()
+    if args.memory:
+        memory_main(args)
+    elif args.validation:
+        validation_main(args)
+    elif args.search:
+        search_main(args)
+    elif args.bulk:
+        bulk_main(args)
+    elif args.workers:
+        workers_main(args)
+    else:
+        cold_start_main(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# bulk_import.py
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from models import ContactRecord, validate_contacts
+
+# Rows validated and stored together
+BATCH_SIZE = 5000
+
+# Longest accepted line (one contact row)
+MAX_LINE_BYTES = 64 * 1024
+
+CSV_FIELDS = ("name", "phone", "email")
+
+# A parsed row: (row number, fields) or (row number, parse error message)
+ParsedRow = Tuple[int, Any]
+
+class LineTooLongError(ValueError):
+    """
+    Raised when a line of an import body exceeds MAX_LINE_BYTES.
+    """
+    def __init__(self, line: int):
+        super().__init__(f"Line {line} is longer than {MAX_LINE_BYTES} bytes")
+        self.line = line
+
+def row_error(row: int, message: str, field: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the report entry of a rejected row.
+    """
+    return {"row": row, "errors": [{"field": field, "message": message}]}
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """
+    Split a streamed body into numbered, non-blank lines.
+
+    Only the new chunk is searched for line endings; the unfinished last
+    line is kept as a list of pieces until its line ending arrives.
+
+    Args:
+        chunks: Request body chunks
+
+    Yields:
+        Lists of (line number starting at 1, line without its line ending),
+        one list per chunk that completes at least one line
+
+    Raises:
+        LineTooLongError: If a line is longer than MAX_LINE_BYTES
+    """
+    number = 0
+    tail: List[bytes] = []
+    tail_size = 0
+    async for chunk in chunks:
+        lines = chunk.split(b"\n")
+        tail.append(lines[0])
+        tail_size += len(lines[0])
+        if tail_size > MAX_LINE_BYTES:
+            raise LineTooLongError(number + 1)
+        if len(lines) == 1:
+            continue
+        lines[0] = b"".join(tail)
+        tail = [lines.pop()]
+        tail_size = len(tail[0])
+        numbered = []
+        for offset, line in enumerate(lines, 1):
+            if len(line) > MAX_LINE_BYTES:
+                raise LineTooLongError(number + offset)
+            if line.strip():
+                numbered.append((number + offset, line.rstrip(b"\r")))
+        number += len(lines)
+        if tail_size > MAX_LINE_BYTES:
+            raise LineTooLongError(number + 1)
+        if numbered:
+            yield numbered
+    last = b"".join(tail)
+    if last.strip():
+        yield [(number + 1, last.rstrip(b"\r"))]
+
+def parse_ndjson(lines: List[Tuple[int, bytes]]) -> List[ParsedRow]:
+    """
+    Parse NDJSON lines, one contact object per line.
+
+    Each line is parsed on its own, so a line is accepted only if it is
+    exactly one JSON value.
+    """
+    rows = []
+    for number, line in lines:
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            rows.append((number, f"Invalid JSON: {e}"))
+            continue
+        if not isinstance(fields, dict):
+            rows.append((number, "Row must be a JSON object"))
+            continue
+        rows.append((number, fields))
+    return rows
+
+def parse_csv_header(line: bytes) -> List[str]:
+    """
+    Parse the CSV header row.
+
+    Raises:
+        ValueError: If a contact field is missing
+    """
+    header = [column.strip().lower() for column in next(csv.reader([line.decode('utf-8-sig')]))]
+    missing = [field for field in CSV_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"CSV header must include the columns {', '.join(CSV_FIELDS)} (missing {', '.join(missing)})")
+    return header
+
+def parse_csv(lines: List[Tuple[int, bytes]], header: List[str]) -> List[ParsedRow]:
+    """
+    Parse CSV lines (one record per line) into contact fields by header.
+    """
+    rows = []
+    try:
+        records = list(csv.reader([line.decode('utf-8') for _, line in lines]))
+    except (UnicodeDecodeError, csv.Error):
+        # Fall back to line by line to find the offending rows
+        records = []
+        for _, line in lines:
+            try:
+                records.append(next(csv.reader([line.decode('utf-8')])))
+            except (UnicodeDecodeError, csv.Error) as e:
+                records.append(str(e))
+    for (number, _), record in zip(lines, records):
+        if isinstance(record, str):
+            rows.append((number, f"Invalid CSV: {record}"))
+        elif len(record) != len(header):
+            rows.append((number, f"Expected {len(header)} columns, got {len(record)}"))
+        else:
+            rows.append((number, dict(zip(header, record))))
+    return rows
+
+def validate_rows(rows: List[ParsedRow]) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Validate parsed rows with the ContactCreate rules.
+
+    Returns:
+        (valid rows as (row number, normalized name, contact record),
+         report entries of the rejected rows)
+    """
+    valid = []
+    errors = []
+    parsed = []
+    for number, fields in rows:
+        if isinstance(fields, str):
+            errors.append(row_error(number, fields))
+        else:
+            parsed.append((number, fields))
+
+    results = validate_contacts([fields for _, fields in parsed])
+    for (number, _), result in zip(parsed, results):
+        if isinstance(result, ValidationError):
+            errors.append({
+                "row": number,
+                "errors": [
+                    {"field": ".".join(str(part) for part in error["loc"]) or None, "message": error["msg"]}
+                    for error in result.errors()
+                ]
+            })
+        else:
+            valid.append((number, result["name"], ContactRecord(result["name"], result["phone"], result["email"])))
+    errors.sort(key=lambda error: error["row"])
+    return valid, errors
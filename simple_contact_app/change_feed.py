@@ -0,0 +1,110 @@
+# change_feed.py
+import asyncio
+import json
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from models import ContactRecord
+
+# Events kept for clients resuming from an earlier sequence number
+DEFAULT_FEED_SIZE = 10000
+
+# A published change: (sequence number, op, name, contact), with op
+# "create", "update" or "delete" and contact None for deletes
+ChangeEvent = Tuple[int, str, str, Optional[ContactRecord]]
+
+def event_data(event: ChangeEvent) -> Dict[str, Any]:
+    """
+    Get the JSON form of a change event.
+    """
+    seq, op, name, contact = event
+    return {"seq": seq, "op": op, "name": name, "contact": contact.to_dict() if contact is not None else None}
+
+def format_sse(event: ChangeEvent, event_id: str) -> str:
+    """
+    Format a change event as a server-sent event, named after its op.
+    """
+    return f"id: {event_id}\nevent: {event[1]}\ndata: {json.dumps(event_data(event))}\n\n"
+
+class ChangeFeed:
+    """
+    The latest contact changes, numbered by the contacts version, for
+    clients following the changes instead of re-reading every contact.
+
+    Events go into a ring buffer of a fixed size, so memory stays bounded
+    whatever the write rate; a client resuming from a sequence number that
+    has left the buffer must reload the contacts. Sequence numbers are
+    consecutive, so the events after a given one are found by position.
+    """
+
+    def __init__(self, size: int = DEFAULT_FEED_SIZE):
+        self.events: deque = deque(maxlen=size)
+        self.seq = 0
+        self._waiters: Set[asyncio.Event] = set()
+
+    def reset(self, seq: int) -> None:
+        """
+        Drop every buffered event and continue from a sequence number (after
+        contacts were loaded or reloaded without their changes).
+        """
+        self.events.clear()
+        self.seq = seq
+        self._wake()
+
+    def publish(self, events: List[ChangeEvent]) -> None:
+        """
+        Add events following the last published one and wake the waiting
+        clients.
+        """
+        if not events:
+            return
+        self.events.extend(events)
+        self.seq = events[-1][0]
+        self._wake()
+
+    def since(self, seq: int, limit: Optional[int] = None) -> Optional[List[ChangeEvent]]:
+        """
+        Get the events after a sequence number.
+
+        Args:
+            seq: Last sequence number the client has seen
+            limit: Maximum number of events (None for all)
+
+        Returns:
+            The events in order, or None if some of them are no longer
+            buffered (or seq is ahead of the feed, as after a restart)
+        """
+        if seq > self.seq:
+            return None
+        first = self.events[0][0] if self.events else self.seq + 1
+        if seq < first - 1:
+            return None
+        start = seq + 1 - first
+        end = None if limit is None else start + limit
+        return list(islice(self.events, start, end))
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """
+        Wait until there are events after a sequence number.
+
+        Returns:
+            False if the timeout expired first
+        """
+        if self.seq != seq:
+            return True
+        # One asyncio.Event per wait, created in the waiting loop
+        changed = asyncio.Event()
+        self._waiters.add(changed)
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(changed)
+
+    def _wake(self) -> None:
+        for changed in self._waiters:
+            changed.set()
+        self._waiters.clear()
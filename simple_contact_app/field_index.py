@@ -0,0 +1,68 @@
+# field_index.py
+from typing import Dict, List, Set, Union
+
+class FieldIndex:
+    """
+    Hash index from a normalized field value (such as an email address) to
+    the names of the contacts that have it, kept in sync by the mutation
+    handlers.
+
+    Most values belong to a single contact, so an entry holds the bare name
+    and only becomes a set once a second contact shares the value.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Union[str, Set[str]]] = {}
+
+    def add(self, key: str, name: str) -> None:
+        """
+        Record that a contact has a field value.
+
+        Args:
+            key: Normalized field value
+            name: Normalized contact name
+        """
+        names = self.entries.get(key)
+        if names is None:
+            self.entries[key] = name
+        elif isinstance(names, str):
+            if names != name:
+                self.entries[key] = {names, name}
+        else:
+            names.add(name)
+
+    def remove(self, key: str, name: str) -> None:
+        """
+        Forget that a contact has a field value, if recorded.
+
+        Args:
+            key: Normalized field value
+            name: Normalized contact name
+        """
+        names = self.entries.get(key)
+        if names is None:
+            return
+        if isinstance(names, str):
+            if names == name:
+                del self.entries[key]
+            return
+        names.discard(name)
+        if len(names) == 1:
+            self.entries[key] = next(iter(names))
+
+    def get(self, key: str) -> List[str]:
+        """
+        Get the contacts with a field value.
+
+        Args:
+            key: Normalized field value
+
+        Returns:
+            Contact names in alphabetical order (empty if none)
+        """
+        names = self.entries.get(key)
+        if names is None:
+            return []
+        if isinstance(names, str):
+            return [names]
+        return sorted(names)
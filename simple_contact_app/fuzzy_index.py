@@ -0,0 +1,244 @@
+# fuzzy_index.py
+import heapq
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from field_index import FieldIndex
+
+NGRAM_SIZE = 3
+PAD = "\0" * (NGRAM_SIZE - 1)
+WORD_PATTERN = re.compile(r'\w+')
+
+# Candidate names up to which the remaining query words are compared with
+# the candidates' words directly rather than searched in the index
+DIRECT_CHECK_LIMIT = 2000
+
+def name_words(text: str) -> List[str]:
+    """
+    Split a name or query into lowercased words.
+    """
+    return WORD_PATTERN.findall(text.lower())
+
+def padded_ngrams(word: str) -> Set[str]:
+    """
+    Get the distinct n-grams of a word padded at both ends, so its first and
+    last letters count as much as the middle ones.
+    """
+    padded = PAD + word + PAD
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Compute the edit distance between two strings, giving up early.
+
+    Insertions, deletions, substitutions and swaps of two adjacent
+    characters ("Jonh" for "John") each count as one edit. Only the cells
+    within limit of the diagonal are computed: the others exceed it.
+
+    Args:
+        a: First string
+        b: Second string
+        limit: Largest distance of interest
+
+    Returns:
+        The distance, or limit + 1 if it exceeds limit
+    """
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    width = len(b)
+    before = None
+    previous = [min(j, over) for j in range(width + 1)]
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        current = [over] * (width + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(width, i + limit) + 1):
+            char_b = b[j - 1]
+            distance = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < distance:
+                distance = previous[j] + 1
+            if current[j - 1] + 1 < distance:
+                distance = current[j - 1] + 1
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b \
+                    and before[j - 2] + 1 < distance:
+                distance = before[j - 2] + 1
+            current[j] = distance
+            if distance < row_min:
+                row_min = distance
+        if row_min > limit:
+            return over
+        before, previous = previous, current
+    return previous[width] if previous[width] <= limit else over
+
+class FuzzyIndex:
+    """
+    Typo-tolerant search over the words of contact names.
+
+    Every distinct name word is indexed by its padded trigrams. A query word
+    only gets compared (by edit distance) with the words sharing enough of
+    its trigrams: each edit changes at most four trigrams (a swap of two
+    adjacent letters), so a word within distance d of a query word with g
+    distinct trigrams shares at least g - 4d of them. When that bound is not positive (short words,
+    large distances), sharing one trigram is required instead.
+    """
+
+    def __init__(self):
+        self.word_names = FieldIndex()
+        self.postings: Dict[str, Set[str]] = {}
+
+    def add(self, name: str) -> None:
+        """
+        Index a contact name.
+
+        Args:
+            name: Normalized contact name
+        """
+        for word in set(name_words(name)):
+            if word not in self.word_names.entries:
+                for gram in padded_ngrams(word):
+                    self.postings.setdefault(gram, set()).add(word)
+            self.word_names.add(word, name)
+
+    def build(self, names: Iterable[str]) -> None:
+        """
+        Index many contact names at once.
+
+        Args:
+            names: Normalized contact names not yet in the index
+        """
+        # FieldIndex.add inlined: this runs for every contact at startup
+        entries = self.word_names.entries
+        new_words = []
+        for name in names:
+            for word in set(WORD_PATTERN.findall(name.lower())):
+                current = entries.get(word)
+                if current is None:
+                    entries[word] = name
+                    new_words.append(word)
+                elif isinstance(current, str):
+                    if current != name:
+                        entries[word] = {current, name}
+                else:
+                    current.add(name)
+        postings = defaultdict(set, self.postings)
+        for word in new_words:
+            for gram in padded_ngrams(word):
+                postings[gram].add(word)
+        self.postings = dict(postings)
+
+    def remove(self, name: str) -> None:
+        """
+        Remove a contact name from the index if present.
+
+        Args:
+            name: Normalized contact name
+        """
+        for word in set(name_words(name)):
+            self.word_names.remove(word, name)
+            if word in self.word_names.entries:
+                continue
+            for gram in padded_ngrams(word):
+                words = self.postings.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self.postings[gram]
+
+    def similar_words(self, query_word: str, max_distance: int) -> Dict[str, int]:
+        """
+        Find the indexed words within an edit distance of a query word.
+
+        A word sharing at least `needed` of the query's g trigrams appears
+        in at least one of its g - needed + 1 rarest trigram postings, so
+        only those are scanned for candidates; the other postings are just
+        probed to count the shared trigrams.
+
+        Returns:
+            Distance by word
+        """
+        grams = padded_ngrams(query_word)
+        needed = max(1, len(grams) - (NGRAM_SIZE + 1) * max_distance)
+        postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        scanned = len(grams) - needed + 1
+        candidates = set().union(*postings[:scanned])
+        matches = {}
+        for word in candidates:
+            if abs(len(word) - len(query_word)) > max_distance:
+                continue
+            if needed > 1 and sum(word in words for words in postings) < needed:
+                continue
+            distance = edit_distance(query_word, word, max_distance)
+            if distance <= max_distance:
+                matches[word] = distance
+        return matches
+
+    def search(self, query: str, max_distance: int, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Find the names matching every word of a query within a total edit
+        distance.
+
+        Each query word is matched against the words of the names; a name's
+        distance is the sum of its best distances for each query word. The
+        candidate names come from the longest (most selective) query word;
+        once they are few, the other query words are compared with the
+        words of those names only instead of searching the whole index.
+
+        Args:
+            query: Search text
+            max_distance: Largest total edit distance
+            limit: Maximum number of results (None for all)
+
+        Returns:
+            (name, distance) pairs, closest first, then alphabetical
+        """
+        words = sorted(name_words(query), key=len, reverse=True)
+        if not words:
+            return []
+
+        entries = self.word_names.entries
+        over = max_distance + 1
+        totals: Dict[str, int] = {}
+        for word, distance in self.similar_words(words[0], max_distance).items():
+            names = entries[word]
+            for name in (names,) if isinstance(names, str) else names:
+                if distance < totals.get(name, over):
+                    totals[name] = distance
+
+        for query_word in words[1:]:
+            if not totals:
+                break
+            if len(totals) > DIRECT_CHECK_LIMIT:
+                matches = self.similar_words(query_word, max_distance)
+            else:
+                matches = {}
+                grams = padded_ngrams(query_word)
+                for name in totals:
+                    for word in name_words(name):
+                        if word not in matches:
+                            distance = edit_distance(query_word, word, max_distance)
+                            # Same rule as similar_words: a trigram must be shared
+                            if distance <= max_distance and (distance == 0 or grams & padded_ngrams(word)):
+                                matches[word] = distance
+                            else:
+                                matches[word] = over
+            refined = {}
+            for name, total in totals.items():
+                total += min(matches.get(word, over) for word in name_words(name))
+                if total <= max_distance:
+                    refined[name] = total
+            totals = refined
+
+        def rank(item):
+            return item[1], item[0]
+
+        if limit is not None:
+            return heapq.nsmallest(limit, totals.items(), key=rank)
+        return sorted(totals.items(), key=rank)
@@ -1,8 +1,26 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Query, Path
-from models import ContactCreate, Contact, ContactUpdate
+from fastapi import FastAPI, HTTPException, Query, Path, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from models import ContactCreate, Contact, ContactMatch, ContactRecord, ContactUpdate, phone_digits
+from name_index import NameIndex
+from field_index import FieldIndex
+from fuzzy_index import FuzzyIndex, name_words
+from change_feed import DEFAULT_FEED_SIZE, ChangeFeed, event_data, format_sse
+from bulk_import import BATCH_SIZE, LineTooLongError, iter_lines, parse_csv, parse_csv_header, parse_ndjson, row_error, validate_rows
+from persistence import ContactPersistence
+from shared_store import SharedContactStore
+from pathlib import Path as FilePath
 from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+import asyncio
+import gc
+import json
 import logging
+import os
+import time
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,8 +32,578 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# In-memory dictionary to store contacts
-contacts_db: Dict[str, Dict[str, Any]] = {}
+# In-memory dictionary to store contacts, by normalized name
+contacts_db: Dict[str, ContactRecord] = {}
+
+# Name search index over the contacts_db keys, kept in sync by the handlers
+name_index = NameIndex()
+
+# Lookup indexes on the lowercased email and the digits of the phone number
+email_index = FieldIndex()
+phone_index = FieldIndex()
+
+# Typo-tolerant index over the words of the contact names
+fuzzy_index = FuzzyIndex()
+
+# Default number of typeahead suggestions for ?prefix=
+DEFAULT_PREFIX_LIMIT = 10
+
+# Bulk import: accepted content types and the most row errors reported
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/jsonlines")
+MAX_REPORTED_ERRORS = 1000
+
+# Optionally reject a contact whose email or phone number (compared as
+# digits) is already used by another contact
+CONTACTS_UNIQUE_EMAIL = os.environ.get("CONTACTS_UNIQUE_EMAIL", "0") == "1"
+CONTACTS_UNIQUE_PHONE = os.environ.get("CONTACTS_UNIQUE_PHONE", "0") == "1"
+
+# Optional persistence: set CONTACTS_DATA_DIR to keep contacts across
+# restarts. Mutations are logged there before they are applied, and a
+# snapshot is taken every CONTACTS_SNAPSHOT_EVERY logged mutations.
+# CONTACTS_FSYNC=0 skips the per-mutation fsync (survives process crashes,
+# not power loss); the fsync otherwise blocks the event loop for the
+# device's fsync latency on every mutation. The log belongs to a single
+# process.
+CONTACTS_DATA_DIR = os.environ.get("CONTACTS_DATA_DIR", "")
+CONTACTS_SNAPSHOT_EVERY = int(os.environ.get("CONTACTS_SNAPSHOT_EVERY", "100000"))
+CONTACTS_FSYNC = os.environ.get("CONTACTS_FSYNC", "1") == "1"
+
+# Shared store for running several workers: set CONTACTS_DB to a SQLite
+# database path. Every worker then writes through the database and brings
+# its in-memory view up to date before each request. Takes precedence over
+# CONTACTS_DATA_DIR.
+CONTACTS_DB = os.environ.get("CONTACTS_DB", "")
+
+shared_store: Optional[SharedContactStore] = (
+    SharedContactStore(FilePath(CONTACTS_DB), CONTACTS_FSYNC) if CONTACTS_DB else None
+)
+persistence: Optional[ContactPersistence] = (
+    ContactPersistence(FilePath(CONTACTS_DATA_DIR), CONTACTS_SNAPSHOT_EVERY, CONTACTS_FSYNC)
+    if CONTACTS_DATA_DIR and shared_store is None else None
+)
+
+# Shared database calls run on one thread, in submission order, so the event
+# loop never waits for another worker's write lock and changes read from
+# the database are applied to the in-memory view in the order they were read
+shared_executor: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="contacts-db") if shared_store is not None else None
+)
+
+# Version of the contacts, bumped by every change: the sequence number of
+# the shared database or write-ahead log when one is used (the same in every
+# worker and across restarts), otherwise this in-memory counter
+memory_version = 0
+
+# ETag prefix telling this process's in-memory versions apart from those of
+# earlier runs, which also started at 0
+VERSION_EPOCH = uuid.uuid4().hex[:8] + "-" if shared_store is None and persistence is None else ""
+
+# Change feed: the last CONTACTS_FEED_SIZE changes are kept for clients
+# resuming GET /contacts/changes from an earlier event. With a shared store,
+# a worker that is not serving requests checks the database for other
+# workers' changes every FEED_POLL_INTERVAL seconds while clients wait.
+CONTACTS_FEED_SIZE = int(os.environ.get("CONTACTS_FEED_SIZE", str(DEFAULT_FEED_SIZE)))
+change_feed = ChangeFeed(CONTACTS_FEED_SIZE)
+FEED_POLL_INTERVAL = 0.5
+FEED_KEEPALIVE = 15.0
+FEED_BATCH = 1000
+
+if shared_store is not None:
+    STORAGE_TYPE = "in-memory dictionary over shared SQLite database"
+elif persistence is not None:
+    STORAGE_TYPE = "in-memory dictionary with snapshot + write-ahead log"
+else:
+    STORAGE_TYPE = "in-memory dictionary"
+
+@app.on_event("startup")
+async def load_contacts():
+    """
+    Load saved contacts from the shared database or from the snapshot and
+    log tail, when either is enabled.
+    """
+    start = time.perf_counter()
+    if shared_store is not None:
+        shared_store.open()
+        with gc_paused():
+            reload_shared_contacts()
+        logger.info(f"Loaded {len(contacts_db)} contacts from {CONTACTS_DB} in {time.perf_counter() - start:.2f}s")
+    elif persistence is not None:
+        with gc_paused():
+            result = persistence.load(contacts_db)
+            rebuild_indexes()
+        change_feed.reset(persistence.seq)
+        logger.info(
+            f"Loaded {len(contacts_db)} contacts ({result['snapshot_contacts']} from snapshot, "
+            f"{result['replayed_records']} log records replayed) in {time.perf_counter() - start:.2f}s"
+        )
+
+@app.on_event("shutdown")
+async def save_contacts():
+    """
+    Write a final snapshot and close the log, or close the shared database.
+    """
+    if shared_store is not None:
+        await run_shared(shared_store.close)
+        shared_executor.shutdown()
+    if persistence is not None:
+        persistence.close()
+
+class SharedContactsSync:
+    """
+    ASGI middleware applying the changes made by other workers before each
+    request is served, so every worker answers from the same data.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await refresh_shared_contacts()
+        await self.app(scope, receive, send)
+
+if shared_store is not None:
+    app.add_middleware(SharedContactsSync)
+
+def email_key(email: str) -> str:
+    """
+    Get the email index key of an email address.
+    
+    Stored emails are already normalized, so their key is the stored string
+    itself rather than a copy.
+    """
+    key = email.strip().lower()
+    return email if key == email else key
+
+def rebuild_indexes() -> None:
+    """
+    Rebuild the in-memory indexes from contacts_db.
+    """
+    global name_index, email_index, phone_index, fuzzy_index
+    name_index = NameIndex()
+    name_index.build(contacts_db.keys())
+    fuzzy_index = FuzzyIndex()
+    fuzzy_index.build(contacts_db.keys())
+    email_index = FieldIndex()
+    phone_index = FieldIndex()
+    for name, contact in contacts_db.items():
+        email_index.add(email_key(contact.email), name)
+        phone_index.add(phone_digits(contact.phone), name)
+
+def contacts_version() -> int:
+    """
+    Get the version of the contacts, which every change increases.
+    """
+    if shared_store is not None:
+        return shared_store.seq
+    if persistence is not None:
+        return persistence.seq
+    return memory_version
+
+def publish_changes(changes: List[tuple], version: Optional[int] = None) -> None:
+    """
+    Publish the changes just written to the change feed, numbered so the
+    last one gets the current contacts version.
+    
+    Args:
+        changes: Changes in write order as (op, name, contact), with op
+            "create", "update" or "delete"
+        version: Contacts version after the last change, if not the
+            current one
+    """
+    first = (contacts_version() if version is None else version) - len(changes) + 1
+    change_feed.publish([(first + i, op, name, contact) for i, (op, name, contact) in enumerate(changes)])
+
+def update_indexes(name: str, previous: Optional[ContactRecord], contact: Optional[ContactRecord]) -> None:
+    """
+    Keep the in-memory indexes in line with one change of contacts_db.
+    
+    Args:
+        name: Normalized contact name
+        previous: Contact before the change (None if it didn't exist)
+        contact: Contact after the change (None if deleted)
+    """
+    if previous is None and contact is not None:
+        name_index.add(name)
+        fuzzy_index.add(name)
+    elif previous is not None and contact is None:
+        name_index.remove(name)
+        fuzzy_index.remove(name)
+    if previous is not None:
+        email_index.remove(email_key(previous.email), name)
+        phone_index.remove(phone_digits(previous.phone), name)
+    if contact is not None:
+        email_index.add(email_key(contact.email), name)
+        phone_index.add(phone_digits(contact.phone), name)
+
+def update_indexes_many(previous: Dict[str, Optional[ContactRecord]], contacts: Dict[str, ContactRecord]) -> None:
+    """
+    Keep the in-memory indexes in line with a batch of stored contacts,
+    indexing the new names in bulk.
+    
+    Args:
+        previous: Contacts before the batch by name (None if new)
+        contacts: Contacts stored by name
+    """
+    new_names = [name for name in contacts if previous[name] is None]
+    name_index.build(new_names)
+    fuzzy_index.build(new_names)
+    for name, contact in contacts.items():
+        old = previous[name]
+        if old is not None:
+            email_index.remove(email_key(old.email), name)
+            phone_index.remove(phone_digits(old.phone), name)
+        email_index.add(email_key(contact.email), name)
+        phone_index.add(phone_digits(contact.phone), name)
+
+def check_unique_fields(name: str, contact: ContactRecord) -> None:
+    """
+    Enforce the optional email and phone uniqueness for a contact about to
+    be stored.
+    
+    Args:
+        name: Normalized contact name
+        contact: Contact to store
+        
+    Raises:
+        HTTPException: If another contact already uses the email or phone
+    """
+    if CONTACTS_UNIQUE_EMAIL:
+        owners = [owner for owner in email_index.get(email_key(contact.email)) if owner != name]
+        if owners:
+            raise HTTPException(
+                status_code=409, 
+                detail=f"Email '{contact.email}' is already used by contact '{owners[0]}'"
+            )
+    if CONTACTS_UNIQUE_PHONE:
+        owners = [owner for owner in phone_index.get(phone_digits(contact.phone)) if owner != name]
+        if owners:
+            raise HTTPException(
+                status_code=409, 
+                detail=f"Phone '{contact.phone}' is already used by contact '{owners[0]}'"
+            )
+
+async def run_shared(func, *args):
+    """
+    Run a shared database call on the database thread.
+    """
+    return await asyncio.get_running_loop().run_in_executor(shared_executor, func, *args)
+
+def on_loop(func):
+    """
+    Wrap a callback so that, called from the database thread, it runs on
+    the event loop (which owns the in-memory view and indexes) and returns
+    its result or raises its exception there.
+    
+    Args:
+        func: Callback touching the in-memory view
+        
+    Returns:
+        Function to pass to the shared store
+    """
+    loop = asyncio.get_running_loop()
+    
+    def call(*args):
+        async def run():
+            return func(*args)
+        return asyncio.run_coroutine_threadsafe(run(), loop).result()
+    return call
+
+def reload_shared_contacts() -> None:
+    """
+    Replace the in-memory view with every contact in the shared database
+    (at startup, before requests are served).
+    """
+    contacts = {}
+    shared_store.load(contacts)
+    apply_shared_changes((None, contacts, shared_store.seq))
+
+def fetch_shared_changes() -> tuple:
+    """
+    Read the changes made in the shared database since the last refresh.
+    Runs on the database thread, possibly inside a write transaction.
+    
+    Returns:
+        (changes, None, version), or (None, every contact, version) if the
+        view is too far behind and must be reloaded
+    """
+    changes = shared_store.changes()
+    if changes is not None:
+        return changes, None, shared_store.seq
+    # Too far behind: the change rows needed were already trimmed
+    contacts = {}
+    shared_store.load(contacts)
+    return None, contacts, shared_store.seq
+
+def apply_shared_changes(fetched: tuple) -> None:
+    """
+    Apply changes read by fetch_shared_changes to the in-memory view and
+    publish them. Runs on the event loop.
+    """
+    changes, contacts, version = fetched
+    if changes is None:
+        contacts_db.clear()
+        contacts_db.update(contacts)
+        rebuild_indexes()
+        change_feed.reset(version)
+        return
+    published = []
+    for op, name, contact in changes:
+        previous = contacts_db.get(name)
+        if op == "put":
+            contacts_db[name] = contact
+            published.append(("create" if previous is None else "update", name, contact))
+        else:
+            contacts_db.pop(name, None)
+            published.append(("delete", name, None))
+        update_indexes(name, previous, contact)
+    publish_changes(published, version)
+
+async def refresh_shared_contacts() -> None:
+    """
+    Apply the changes made in the shared database since the last refresh.
+    """
+    apply_shared_changes(await run_shared(fetch_shared_changes))
+
+async def store_contact(name: str, contact: ContactRecord, create: bool = False) -> bool:
+    """
+    Create or replace a stored contact (logged first when persistence is enabled).
+    
+    Args:
+        name: Normalized contact name
+        contact: Contact to store
+        create: Whether this creates the contact (otherwise it must exist)
+        
+    Returns:
+        False if another worker created or deleted the contact first
+        
+    Raises:
+        HTTPException: If the email or phone must be unique and is taken
+    """
+    if shared_store is not None:
+        @on_loop
+        def apply_and_check(fetched):
+            apply_shared_changes(fetched)
+            check_unique_fields(name, contact)
+        
+        def check():
+            # Holding the database write lock: catch up, then check
+            apply_and_check(fetch_shared_changes())
+        write = shared_store.create if create else shared_store.replace
+        stored = await run_shared(write, name, contact, check)
+        await refresh_shared_contacts()
+        return stored
+    global memory_version
+    check_unique_fields(name, contact)
+    previous = contacts_db.get(name)
+    if persistence is not None:
+        persistence.put(name, contact)
+    else:
+        contacts_db[name] = contact
+        memory_version += 1
+    update_indexes(name, previous, contact)
+    publish_changes([("create" if previous is None else "update", name, contact)])
+    return True
+
+def prepare_batch(batch: List[tuple]) -> tuple:
+    """
+    Select the contacts of a validated bulk batch that can be stored.
+    
+    Rows whose email or phone must be unique and is taken (by a stored
+    contact or an earlier row of the batch) are rejected. A name repeated in
+    the batch keeps its last row.
+    
+    Args:
+        batch: Validated rows as (row number, normalized name, contact)
+        
+    Returns:
+        (contacts to store by name, report entries of the rejected rows)
+    """
+    if not CONTACTS_UNIQUE_EMAIL and not CONTACTS_UNIQUE_PHONE:
+        return {name: contact for _, name, contact in batch}, []
+    
+    accepted: Dict[str, ContactRecord] = {}
+    rejected = []
+    claimed_emails: Dict[str, str] = {}
+    claimed_phones: Dict[str, str] = {}
+    for row, name, contact in batch:
+        try:
+            check_unique_fields(name, contact)
+        except HTTPException as e:
+            rejected.append(row_error(row, e.detail, "email" if e.detail.startswith("Email") else "phone"))
+            continue
+        email = email_key(contact.email)
+        phone = phone_digits(contact.phone)
+        if CONTACTS_UNIQUE_EMAIL and claimed_emails.setdefault(email, name) != name:
+            rejected.append(row_error(row, f"Email '{email}' is already used by contact '{claimed_emails[email]}'", "email"))
+            continue
+        if CONTACTS_UNIQUE_PHONE and claimed_phones.setdefault(phone, name) != name:
+            rejected.append(row_error(row, f"Phone '{contact.phone}' is already used by contact '{claimed_phones[phone]}'", "phone"))
+            continue
+        accepted[name] = contact
+    return accepted, rejected
+
+async def store_contacts_batch(batch: List[tuple]) -> Dict[str, Any]:
+    """
+    Create or replace the contacts of a validated bulk batch with a single
+    log write or database transaction.
+    
+    Args:
+        batch: Validated rows as (row number, normalized name, contact)
+        
+    Returns:
+        Dictionary with the created and updated counts and the rejected rows
+    """
+    result: Dict[str, Any] = {}
+    
+    def prepare():
+        accepted, rejected = prepare_batch(batch)
+        created = sum(1 for name in accepted if name not in contacts_db)
+        result.update(created=created, updated=len(batch) - len(rejected) - created, rejected=rejected)
+        return accepted
+    
+    if shared_store is not None:
+        @on_loop
+        def apply_and_prepare(fetched):
+            apply_shared_changes(fetched)
+            return prepare()
+        
+        def prepare_shared():
+            # Holding the database write lock: catch up, then check
+            return apply_and_prepare(fetch_shared_changes())
+        await run_shared(shared_store.put_many, prepare_shared)
+        await refresh_shared_contacts()
+        return result
+    
+    global memory_version
+    with gc_paused():
+        accepted = prepare()
+        previous = {name: contacts_db.get(name) for name in accepted}
+        if persistence is not None:
+            persistence.put_many(accepted)
+        else:
+            contacts_db.update(accepted)
+            memory_version += len(accepted)
+        update_indexes_many(previous, accepted)
+    publish_changes([
+        ("create" if previous[name] is None else "update", name, contact) for name, contact in accepted.items()
+    ])
+    return result
+
+async def remove_contact(name: str) -> bool:
+    """
+    Delete a stored contact (logged first when persistence is enabled).
+    
+    Args:
+        name: Normalized name of an existing contact
+        
+    Returns:
+        False if another worker deleted the contact first
+    """
+    if shared_store is not None:
+        removed = await run_shared(shared_store.delete, name)
+        await refresh_shared_contacts()
+        return removed
+    global memory_version
+    previous = contacts_db.get(name)
+    if persistence is not None:
+        persistence.delete(name)
+    else:
+        del contacts_db[name]
+        memory_version += 1
+    update_indexes(name, previous, None)
+    publish_changes([("delete", name, None)])
+    return True
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector while building many long-lived
+    objects (loads and bulk batches), which would otherwise trigger repeated
+    collections over every stored contact. The code run in it creates no
+    reference cycles; collection resumes afterwards.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check whether an If-None-Match header matches an ETag (weak comparison).
+    
+    Args:
+        if_none_match: Header value ("*" or comma-separated ETags), if any
+        etag: Current ETag
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def event_id(seq: int) -> str:
+    """
+    Get the change feed ID of a sequence number (prefixed like the stats
+    ETags, so IDs from an earlier run of an in-memory store are rejected).
+    """
+    return f"{VERSION_EPOCH}{seq}"
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """
+    Get the sequence number a client resumes the change feed from.
+    
+    Args:
+        value: Last event ID the client saw, if any
+        
+    Returns:
+        The sequence number, or the current version if value is empty
+        
+    Raises:
+        HTTPException: If the ID is malformed, or from another run and so no
+            longer available
+    """
+    if not value:
+        return change_feed.seq
+    epoch, _, seq = value.strip().rpartition("-")
+    if not seq.isdigit():
+        raise HTTPException(status_code=422, detail=f"Invalid event ID '{value}'")
+    if epoch + "-" * bool(epoch) != VERSION_EPOCH:
+        raise changes_gone(value)
+    return int(seq)
+
+def changes_gone(value: Any) -> HTTPException:
+    """
+    Build the error for a client resuming from changes no longer buffered.
+    """
+    return HTTPException(
+        status_code=410, 
+        detail=f"Changes after '{value}' are no longer available; reload the contacts "
+               f"and resume from event '{event_id(change_feed.seq)}'"
+    )
+
+async def wait_for_changes(seq: int, timeout: float) -> bool:
+    """
+    Wait until the change feed has events after a sequence number.
+    
+    With a shared store, the changes of other workers are applied every
+    FEED_POLL_INTERVAL seconds meanwhile.
+    
+    Returns:
+        False if the timeout expired first
+    """
+    if shared_store is None:
+        return await change_feed.wait(seq, timeout)
+    deadline = time.monotonic() + timeout
+    while True:
+        await refresh_shared_contacts()
+        remaining = deadline - time.monotonic()
+        if change_feed.seq != seq or remaining <= 0:
+            return change_feed.seq != seq
+        await change_feed.wait(seq, min(FEED_POLL_INTERVAL, remaining))
 
 def normalize_name(name: str) -> str:
     """
@@ -29,7 +617,7 @@ def normalize_name(name: str) -> str:
     """
     return name.strip().title()
 
-def find_contact_by_name(name: str) -> Optional[Dict[str, Any]]:
+def find_contact_by_name(name: str) -> Optional[ContactRecord]:
     """
     Find a contact by name (case-insensitive).
     
@@ -67,11 +655,15 @@ async def create_contact(contact: ContactCreate):
             )
         
         # Store contact in dictionary
-        contact_data = contact.model_dump()
-        contacts_db[normalized_name] = contact_data
+        record = ContactRecord(normalized_name, contact.phone, contact.email)
+        if not await store_contact(normalized_name, record, create=True):
+            raise HTTPException(
+                status_code=409, 
+                detail=f"Contact with name '{normalized_name}' already exists"
+            )
         
         logger.info(f"Created contact: {normalized_name}")
-        return Contact(**contact_data)
+        return record
         
     except HTTPException:
         raise
@@ -85,36 +677,146 @@ async def create_contact(contact: ContactCreate):
             detail=f"Failed to create contact: {str(e)}"
         )
 
+@app.post("/contacts/bulk")
+async def bulk_upsert_contacts(request: Request):
+    """
+    Create or update many contacts from a streamed NDJSON or CSV body.
+    
+    The body is read as it arrives and processed in batches: rows are
+    validated with the ContactCreate rules, and the valid ones are created
+    or replaced (upsert) with one write per batch. Invalid rows are reported
+    without aborting the import. Batches are committed as they complete.
+    
+    Args:
+        request: Request with an NDJSON body (one contact object per line)
+            or a CSV body with a name,phone,email header (Content-Type:
+            text/csv)
+        
+    Returns:
+        Dictionary with processed, created, updated and failed counts and
+        the errors of the first rejected rows
+        
+    Raises:
+        HTTPException: If the content type or CSV header is not supported
+            or the import fails
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        body_format = "csv"
+    elif content_type in NDJSON_CONTENT_TYPES or content_type in ("", "application/json", "text/plain"):
+        body_format = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=415, 
+            detail=f"Unsupported content type '{content_type}' (use application/x-ndjson or text/csv)"
+        )
+    
+    summary = {"processed": 0, "created": 0, "updated": 0, "failed": 0}
+    errors: List[Dict[str, Any]] = []
+    
+    async def import_batch(lines: List[tuple], header: Optional[List[str]]) -> None:
+        with gc_paused():
+            rows = parse_csv(lines, header) if body_format == "csv" else parse_ndjson(lines)
+            valid, invalid = validate_rows(rows)
+        result = await store_contacts_batch(valid)
+        rejected = invalid + result["rejected"]
+        summary["processed"] += len(rows)
+        summary["created"] += result["created"]
+        summary["updated"] += result["updated"]
+        summary["failed"] += len(rejected)
+        errors.extend(rejected[:MAX_REPORTED_ERRORS - len(errors)])
+    
+    try:
+        header = None
+        lines = []
+        async for chunk_lines in iter_lines(request.stream()):
+            if body_format == "csv" and header is None:
+                try:
+                    header = parse_csv_header(chunk_lines[0][1])
+                except ValueError as e:
+                    raise HTTPException(status_code=422, detail=str(e))
+                chunk_lines = chunk_lines[1:]
+            lines.extend(chunk_lines)
+            while len(lines) >= BATCH_SIZE:
+                await import_batch(lines[:BATCH_SIZE], header)
+                lines = lines[BATCH_SIZE:]
+                # Let other requests run between batches
+                await asyncio.sleep(0)
+        if lines:
+            await import_batch(lines, header)
+        
+        errors.sort(key=lambda error: error["row"])
+        logger.info(
+            f"Bulk import: {summary['processed']} rows, {summary['created']} created, "
+            f"{summary['updated']} updated, {summary['failed']} failed"
+        )
+        return {
+            **summary,
+            "errors": errors,
+            "errors_truncated": summary["failed"] > len(errors)
+        }
+        
+    except HTTPException:
+        raise
+    except LineTooLongError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing contacts after {summary['processed']} rows: {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to import contacts after {summary['processed']} rows: {str(e)}"
+        )
+
 @app.get("/contacts/", response_model=List[Contact])
-async def get_contacts(name: Optional[str] = Query(None, description="Filter contacts by name")):
+async def get_contacts(
+    name: Optional[str] = Query(None, description="Filter contacts by name"),
+    prefix: Optional[str] = Query(None, min_length=1, description="Autocomplete: names starting with this prefix"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of contacts to return")
+):
     """
     Get contacts with optional name filter using query parameter.
     
+    Name filters and prefix lookups are served from the name index, so
+    they do not scan every contact.
+    
     Args:
         name: Optional name filter (query parameter)
+        prefix: Optional name prefix for typeahead (query parameter)
+        limit: Optional maximum number of results (defaults to 10 for prefix)
         
     Returns:
-        List of contacts (filtered by name if provided)
+        List of contacts (filtered by name or prefix if provided, in
+        alphabetical order when filtered)
         
     Raises:
         HTTPException: If retrieval fails
     """
     try:
-        if name is None:
+        if name is None and prefix is None:
             # Return all contacts
-            result = [Contact(**data) for data in contacts_db.values()]
+            result = list(islice(contacts_db.values(), limit))
             logger.info(f"Retrieved all {len(result)} contacts")
             return result
         
-        # Filter by name (case-insensitive partial match)
-        normalized_search = normalize_name(name)
-        filtered_contacts = []
+        if prefix is not None:
+            # Typeahead (case-insensitive prefix match)
+            normalized_prefix = normalize_name(prefix).lower()
+            if name is None:
+                names = name_index.prefix(normalized_prefix, limit or DEFAULT_PREFIX_LIMIT)
+            else:
+                normalized_search = normalize_name(name).lower()
+                names = [
+                    contact_name for contact_name in name_index.prefix(normalized_prefix)
+                    if normalized_search in contact_name.lower()
+                ][:limit or DEFAULT_PREFIX_LIMIT]
+        else:
+            # Filter by name (case-insensitive partial match)
+            names = name_index.substring(normalize_name(name).lower())
+            if limit is not None:
+                names = names[:limit]
         
-        for contact_name, contact_data in contacts_db.items():
-            if normalized_search.lower() in contact_name.lower():
-                filtered_contacts.append(Contact(**contact_data))
-        
-        logger.info(f"Found {len(filtered_contacts)} contacts matching '{name}'")
+        filtered_contacts = [contacts_db[contact_name] for contact_name in names]
+        logger.info(f"Found {len(filtered_contacts)} contacts matching '{prefix if name is None else name}'")
         return filtered_contacts
         
     except Exception as e:
@@ -152,12 +854,19 @@ async def update_contact_full(
                 detail=f"Contact '{normalized_name}' not found"
             )
         
-        # Update contact data
-        contact_data = contact.model_dump()
-        contacts_db[normalized_name] = contact_data
+        # Update contact data, keeping the stored name string (shared with
+        # the store key) when the name is unchanged
+        existing_name = contacts_db[normalized_name].name
+        record_name = existing_name if contact.name == existing_name else contact.name
+        record = ContactRecord(record_name, contact.phone, contact.email)
+        if not await store_contact(normalized_name, record):
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Contact '{normalized_name}' not found"
+            )
         
         logger.info(f"Updated contact: {normalized_name}")
-        return Contact(**contact_data)
+        return record
         
     except HTTPException:
         raise
@@ -199,18 +908,20 @@ async def update_contact_partial(
                 detail=f"Contact '{normalized_name}' not found"
             )
         
-        # Get existing contact data
-        existing_contact = contacts_db[normalized_name].copy()
-        
-        # Update only provided fields
-        update_data = contact_update.model_dump(exclude_unset=True)
-        existing_contact.update(update_data)
+        # Copy the existing contact, updating only provided fields (null
+        # counts as not provided)
+        update_data = contact_update.model_dump(exclude_unset=True, exclude_none=True)
+        updated_contact = contacts_db[normalized_name].replace(**update_data)
         
         # Store updated contact
-        contacts_db[normalized_name] = existing_contact
+        if not await store_contact(normalized_name, updated_contact):
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Contact '{normalized_name}' not found"
+            )
         
         logger.info(f"Partially updated contact: {normalized_name}")
-        return Contact(**existing_contact)
+        return updated_contact
         
     except HTTPException:
         raise
@@ -249,7 +960,11 @@ async def delete_contact(name: str = Path(..., description="Contact name to dele
             )
         
         # Delete contact
-        del contacts_db[normalized_name]
+        if not await remove_contact(normalized_name):
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Contact '{normalized_name}' not found"
+            )
         
         logger.info(f"Deleted contact: {normalized_name}")
         return {
@@ -266,11 +981,242 @@ async def delete_contact(name: str = Path(..., description="Contact name to dele
             detail=f"Failed to delete contact: {str(e)}"
         )
 
+@app.get("/contacts/by-email/{email}", response_model=List[Contact])
+async def get_contacts_by_email(email: str = Path(..., description="Email address (case-insensitive)")):
+    """
+    Look up the contacts with an email address using the email index.
+    
+    Args:
+        email: Email address (path parameter)
+        
+    Returns:
+        Contacts with that email, in alphabetical order
+        
+    Raises:
+        HTTPException: If no contact has the email or the lookup fails
+    """
+    try:
+        names = email_index.get(email_key(email))
+        if not names:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"No contact with email '{email_key(email)}'"
+            )
+        
+        logger.info(f"Found {len(names)} contacts with email '{email_key(email)}'")
+        return [contacts_db[contact_name] for contact_name in names]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up email '{email}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to look up contacts: {str(e)}"
+        )
+
+@app.get("/contacts/by-phone/{phone}", response_model=List[Contact])
+async def get_contacts_by_phone(phone: str = Path(..., description="Phone number in any format")):
+    """
+    Look up the contacts with a phone number using the phone index.
+    
+    Phone numbers are compared by their digits, so "555-123-4567" and
+    "(555) 123 4567" match the same contacts.
+    
+    Args:
+        phone: Phone number (path parameter)
+        
+    Returns:
+        Contacts with that phone number, in alphabetical order
+        
+    Raises:
+        HTTPException: If the phone has no digits, no contact has it or the
+            lookup fails
+    """
+    try:
+        digits = phone_digits(phone)
+        if not digits:
+            raise HTTPException(
+                status_code=422, 
+                detail="Phone must contain digits"
+            )
+        
+        names = phone_index.get(digits)
+        if not names:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"No contact with phone '{phone}'"
+            )
+        
+        logger.info(f"Found {len(names)} contacts with phone '{digits}'")
+        return [contacts_db[contact_name] for contact_name in names]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up phone '{phone}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to look up contacts: {str(e)}"
+        )
+
+@app.get("/contacts/search", response_model=List[ContactMatch])
+async def search_contacts(
+    q: str = Query(..., min_length=1, description="Name to search for, typos allowed"),
+    max_distance: int = Query(2, ge=0, le=3, description="Maximum number of typos (edit distance)"),
+    limit: int = Query(20, ge=1, le=1000, description="Maximum number of contacts to return")
+):
+    """
+    Search contacts by name, tolerating typos, using the fuzzy index.
+    
+    Every word of the query must match a word of the name within the
+    allowed edit distance (insertions, deletions and substitutions, summed
+    over the query words).
+    
+    Args:
+        q: Search text (query parameter)
+        max_distance: Maximum total edit distance (query parameter)
+        limit: Maximum number of contacts to return (query parameter)
+        
+    Returns:
+        Matching contacts with their distance, closest first, then alphabetical
+        
+    Raises:
+        HTTPException: If the query has no words or the search fails
+    """
+    try:
+        if not name_words(q):
+            raise HTTPException(
+                status_code=422, 
+                detail="Search text must contain letters or digits"
+            )
+        
+        matches = fuzzy_index.search(q, max_distance, limit)
+        
+        logger.info(f"Found {len(matches)} contacts similar to '{q}'")
+        return [
+            ContactMatch(**contacts_db[contact_name].to_dict(), distance=distance)
+            for contact_name, distance in matches
+        ]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching contacts for '{q}': {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to search contacts: {str(e)}"
+        )
+
+@app.get("/contacts/changes")
+async def get_contact_changes(
+    since: Optional[str] = Query(None, description="Last event ID seen (default: the current one)"),
+    timeout: float = Query(25.0, ge=0, le=60, description="Seconds to wait for a change"),
+    limit: int = Query(FEED_BATCH, ge=1, le=10000, description="Maximum number of events to return")
+):
+    """
+    Long-poll the contact changes after an event.
+    
+    Returns at once if there are changes after `since`, otherwise when the
+    next change happens or the timeout expires (with no events). Each event
+    carries the whole contact, so applying an event twice is harmless.
+    
+    Args:
+        since: Last event ID the client saw (query parameter)
+        timeout: Seconds to wait for a change (query parameter)
+        limit: Maximum number of events (query parameter)
+    
+    Returns:
+        Dictionary with the events and the ID to resume from
+        
+    Raises:
+        HTTPException: If the changes after `since` are no longer buffered
+            (410: reload the contacts) or cannot be read
+    """
+    try:
+        seq = parse_event_id(since)
+        events = change_feed.since(seq, limit)
+        if events == [] and timeout > 0 and await wait_for_changes(seq, timeout):
+            events = change_feed.since(seq, limit)
+        if events is None:
+            raise changes_gone(since)
+        last = events[-1][0] if events else seq
+        return JSONResponse({"events": [event_data(event) for event in events], "last_event_id": event_id(last)})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading contact changes: {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to read contact changes: {str(e)}"
+        )
+
+@app.get("/contacts/changes/stream")
+async def stream_contact_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="Last event ID seen (default: the current one)")
+):
+    """
+    Stream the contact changes as server-sent events.
+    
+    Each change is an event named after its op (create, update or delete)
+    whose ID is the change's event ID; an EventSource reconnecting sends the
+    last one in Last-Event-ID and resumes after it. A client too slow to
+    keep up with the buffer gets a "reset" event and the stream ends.
+    
+    Args:
+        request: Request, for its Last-Event-ID header
+        since: Last event ID the client saw (query parameter; the header
+            takes precedence)
+    
+    Returns:
+        text/event-stream response
+        
+    Raises:
+        HTTPException: If the changes after the given event are no longer
+            buffered (410: reload the contacts)
+    """
+    resume_from = request.headers.get("last-event-id") or since
+    seq = parse_event_id(resume_from)
+    if change_feed.since(seq, 0) is None:
+        raise changes_gone(resume_from)
+    
+    async def events():
+        position = seq
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            batch = change_feed.since(position, FEED_BATCH)
+            if batch is None:
+                yield f"event: reset\ndata: {json.dumps({'resume_from': event_id(change_feed.seq)})}\n\n"
+                return
+            if batch:
+                yield "".join(format_sse(event, event_id(event[0])) for event in batch)
+                position = batch[-1][0]
+            elif not await wait_for_changes(position, FEED_KEEPALIVE):
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/contacts/stats")
-async def get_contact_stats():
+async def get_contact_stats(
+    request: Request,
+    offset: int = Query(0, ge=0, description="Number of contact names to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of contact names to return")
+):
     """
     Get statistics about contacts in the system.
     
+    The names come from the name index, which keeps them sorted as contacts
+    change, so no request sorts the contacts. The response carries the
+    contacts version as its ETag: a request with that ETag in If-None-Match
+    gets 304 Not Modified until the contacts change.
+    
+    Args:
+        request: Request, for its If-None-Match header
+        offset: Number of names to skip (query parameter)
+        limit: Maximum number of names to return (query parameter)
+    
     Returns:
         Dictionary with contact statistics
         
@@ -278,25 +1224,24 @@ async def get_contact_stats():
         HTTPException: If stats cannot be calculated
     """
     try:
-        total_contacts = len(contacts_db)
-        
-        if total_contacts == 0:
-            return {
-                "total_contacts": 0,
-                "contact_names": [],
-                "storage_type": "in-memory dictionary"
-            }
-        
-        contact_names = list(contacts_db.keys())
+        version = contacts_version()
+        etag = f'"{VERSION_EPOCH}{version}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
         
+        total_contacts = len(contacts_db)
         stats = {
             "total_contacts": total_contacts,
-            "contact_names": sorted(contact_names),
-            "storage_type": "in-memory dictionary"
+            "contact_names": name_index.names(offset, limit),
+            "offset": offset,
+            "limit": limit,
+            "version": version,
+            "storage_type": STORAGE_TYPE
         }
         
         logger.info(f"Generated stats for {total_contacts} contacts")
-        return stats
+        # Plain JSON types: skip FastAPI's per-item encoding of the name list
+        return JSONResponse(stats, headers={"ETag": etag})
         
     except Exception as e:
         logger.error(f"Error generating stats: {str(e)}")
@@ -317,11 +1262,18 @@ async def root():
         "message": "Contact Management System API",
         "endpoints": {
             "POST /contacts/": "Create a new contact",
+            "POST /contacts/bulk": "Create or update contacts from NDJSON or CSV",
             "GET /contacts/?name=John": "Get contacts with optional name filter",
+            "GET /contacts/?prefix=Jo": "Autocomplete contact names by prefix",
+            "GET /contacts/search?q=Jonh": "Search contact names, tolerating typos",
+            "GET /contacts/by-email/{email}": "Look up contacts by email",
+            "GET /contacts/by-phone/{phone}": "Look up contacts by phone number",
             "POST /contacts/{name}": "Update a contact completely",
             "PATCH /contacts/{name}": "Update a contact partially",
             "DELETE /contacts/{name}": "Delete a contact",
-            "GET /contacts/stats": "Get contact statistics"
+            "GET /contacts/changes?since=42": "Long-poll the contact changes after an event",
+            "GET /contacts/changes/stream": "Stream the contact changes (server-sent events)",
+            "GET /contacts/stats?offset=0&limit=100": "Get contact statistics (supports If-None-Match)"
         },
         "features": [
             "Path and query parameters",
@@ -1,87 +1,152 @@
 # models.py
-from pydantic import BaseModel, field_validator
-from typing import Optional
+from pydantic import AfterValidator, BaseModel, ValidationError
+from typing import Annotated, Any, Dict, List, Optional, Union
 import re
 
-class ContactCreate(BaseModel):
-    name: str
-    phone: str
-    email: str
+NON_DIGITS = re.compile(r'\D')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
-    @field_validator('name')
-    @classmethod
-    def name_must_not_be_empty(cls, value):
-        if not value or not value.strip():
-            raise ValueError("Name cannot be empty")
-        # Normalize name to title case
-        return value.strip().title()
+def phone_digits(phone: str) -> str:
+    """
+    Get the digits of a phone number, the form phone numbers are compared in.
+    """
+    return NON_DIGITS.sub('', phone)
 
-    @field_validator('phone')
-    @classmethod
-    def validate_phone(cls, value):
-        if not value or not value.strip():
-            raise ValueError("Phone cannot be empty")
-        
-        # Remove all non-digit characters for validation
-        digits_only = re.sub(r'\D', '', value)
-        
-        # Check if we have a reasonable number of digits (7-15)
-        if len(digits_only) < 7 or len(digits_only) > 15:
-            raise ValueError("Phone must contain 7-15 digits")
-        
-        # Return the original format (allow various formats)
-        return value.strip()
-
-    @field_validator('email')
-    @classmethod
-    def validate_email(cls, value):
-        if not value or not value.strip():
-            raise ValueError("Email cannot be empty")
-        
-        # Basic email validation
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, value.strip()):
-            raise ValueError("Invalid email format")
-        
-        return value.strip().lower()
+# Field validators shared by the models and the batch path below
+
+def clean_name(value: str) -> str:
+    if not value or not value.strip():
+        raise ValueError("Name cannot be empty")
+    # Normalize name to title case
+    return value.strip().title()
+
+def clean_phone(value: str) -> str:
+    if not value or not value.strip():
+        raise ValueError("Phone cannot be empty")
+
+    # Check if we have a reasonable number of digits (7-15)
+    digits_only = phone_digits(value)
+    if len(digits_only) < 7 or len(digits_only) > 15:
+        raise ValueError("Phone must contain 7-15 digits")
+
+    # Return the original format (allow various formats)
+    return value.strip()
+
+def clean_email(value: str) -> str:
+    if not value or not value.strip():
+        raise ValueError("Email cannot be empty")
+
+    # Basic email validation
+    value = value.strip()
+    if not EMAIL_PATTERN.match(value):
+        raise ValueError("Invalid email format")
+
+    return value.lower()
+
+ContactName = Annotated[str, AfterValidator(clean_name)]
+PhoneNumber = Annotated[str, AfterValidator(clean_phone)]
+EmailAddress = Annotated[str, AfterValidator(clean_email)]
+
+class ContactCreate(BaseModel):
+    name: ContactName
+    phone: PhoneNumber
+    email: EmailAddress
 
 class Contact(ContactCreate):
     pass
 
+class ContactMatch(Contact):
+    distance: int
+
 class ContactUpdate(BaseModel):
-    phone: Optional[str] = None
-    email: Optional[str] = None
+    phone: Optional[PhoneNumber] = None
+    email: Optional[EmailAddress] = None
+
+class ContactRecord:
+    """
+    A stored contact: validated name, phone and email.
+
+    The store holds millions of these, so they are slotted objects (about a
+    third of the size of a dict with the same fields) and their name is
+    normally the very string used as the store key. Records are replaced, never mutated.
+    Responses declared as Contact are built from their attributes.
+    """
+    __slots__ = ("name", "phone", "email")
+
+    def __init__(self, name: str, phone: str, email: str):
+        self.name = name
+        self.phone = phone
+        self.email = email
 
-    @field_validator('phone')
-    @classmethod
-    def validate_phone(cls, value):
-        if value is None:
-            return value
-        
-        if not value.strip():
-            raise ValueError("Phone cannot be empty")
-        
-        # Remove all non-digit characters for validation
-        digits_only = re.sub(r'\D', '', value)
-        
-        # Check if we have a reasonable number of digits (7-15)
-        if len(digits_only) < 7 or len(digits_only) > 15:
-            raise ValueError("Phone must contain 7-15 digits")
-        
-        return value.strip()
-
-    @field_validator('email')
     @classmethod
-    def validate_email(cls, value):
-        if value is None:
-            return value
-            
-        if not value.strip():
-            raise ValueError("Email cannot be empty")
-        
-        # Basic email validation
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, value.strip()):
-            raise ValueError("Invalid email format")
-        
-        return value.strip().lower()
\ No newline at end of file
+    def from_dict(cls, data: Dict[str, str], key: Optional[str] = None) -> "ContactRecord":
+        """
+        Build a record from contact data (as stored in files and databases).
+
+        Args:
+            data: Dictionary with name, phone and email
+            key: Store key of the contact; used as the name string when
+                equal to it, so the two are not stored twice
+        """
+        name = data["name"]
+        if key == name:
+            name = key
+        return cls(name, data["phone"], data["email"])
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Get the contact data as a dictionary.
+        """
+        return {"name": self.name, "phone": self.phone, "email": self.email}
+
+    def replace(self, **changes: str) -> "ContactRecord":
+        """
+        Get a copy of the record with some fields changed.
+        """
+        return ContactRecord(
+            changes.get("name", self.name), changes.get("phone", self.phone), changes.get("email", self.email)
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, ContactRecord):
+            return NotImplemented
+        return (self.name, self.phone, self.email) == (other.name, other.phone, other.email)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ContactRecord(name={self.name!r}, phone={self.phone!r}, email={self.email!r})"
+
+def validate_contacts(items: List[Any]) -> List[Union[Dict[str, str], ValidationError]]:
+    """
+    Validate many contacts with the ContactCreate rules.
+
+    Items whose fields are all strings (the usual case for parsed JSON or
+    CSV) are checked with the field validators directly, without building
+    a model; the others, and every item that fails a check, go through
+    ContactCreate so the errors are exactly the ones it reports.
+
+    Args:
+        items: Contact field dictionaries (or anything else, which fails)
+
+    Returns:
+        For each item, its normalized contact data (as ContactCreate.model_dump()
+        returns it) or the ValidationError it failed with
+    """
+    results = []
+    for item in items:
+        if isinstance(item, dict):
+            name = item.get("name")
+            phone = item.get("phone")
+            email = item.get("email")
+            if type(name) is str and type(phone) is str and type(email) is str:
+                try:
+                    results.append({"name": clean_name(name), "phone": clean_phone(phone), "email": clean_email(email)})
+                    continue
+                except ValueError:
+                    pass
+        try:
+            results.append(ContactCreate.model_validate(item).model_dump())
+        except ValidationError as e:
+            results.append(e)
+    return results
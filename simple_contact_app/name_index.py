@@ -0,0 +1,176 @@
+# name_index.py
+import bisect
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+NGRAM_SIZE = 3
+
+def name_ngrams(text: str) -> Set[str]:
+    """
+    Get the distinct n-grams of a lowercased name.
+
+    Args:
+        text: Lowercased name or query
+
+    Returns:
+        Set of NGRAM_SIZE-character substrings
+    """
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+class NameIndex:
+    """
+    Search index over contact names, kept in sync by the mutation handlers.
+
+    Substring queries intersect the posting sets of the query's trigrams
+    and only verify the surviving candidates, instead of scanning every
+    contact. Prefix (typeahead) queries binary-search a sorted list of
+    lowercased names, so they cost O(log n + limit).
+
+    Added names are buffered and merged into the sorted list by the next
+    query that needs it, so adding many names in a row (bulk imports) costs
+    one merge instead of one list insertion each.
+    """
+
+    # Buffered names up to this count are inserted one by one; more are
+    # merged with a single sort
+    MERGE_INSERT_LIMIT = 32
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self._sorted_keys: List[tuple] = []
+        self._pending: List[tuple] = []
+
+    @property
+    def sorted_keys(self) -> List[tuple]:
+        """
+        (lowercased name, name) pairs of every indexed name, in order.
+        """
+        if self._pending:
+            if len(self._pending) <= self.MERGE_INSERT_LIMIT:
+                for entry in self._pending:
+                    bisect.insort(self._sorted_keys, entry)
+            else:
+                # Timsort merges the sorted list and the sorted run in O(n)
+                self._pending.sort()
+                self._sorted_keys.extend(self._pending)
+                self._sorted_keys.sort()
+            self._pending = []
+        return self._sorted_keys
+
+    def build(self, names: Iterable[str]) -> None:
+        """
+        Index many contact names at once, e.g. after loading saved contacts
+        or importing a batch.
+
+        Args:
+            names: Normalized contact names not yet in the index
+        """
+        postings = defaultdict(set, self.postings)
+        pending = self._pending
+        for name in names:
+            key = name.lower()
+            for i in range(len(key) - NGRAM_SIZE + 1):
+                postings[key[i:i + NGRAM_SIZE]].add(name)
+            pending.append((key, name))
+        self.postings = dict(postings)
+
+    def add(self, name: str) -> None:
+        """
+        Index a contact name.
+
+        Args:
+            name: Normalized contact name (the contacts_db key)
+        """
+        key = name.lower()
+        for gram in name_ngrams(key):
+            self.postings.setdefault(gram, set()).add(name)
+        self._pending.append((key, name))
+
+    def remove(self, name: str) -> None:
+        """
+        Remove a contact name from the index if present.
+
+        Args:
+            name: Normalized contact name
+        """
+        key = name.lower()
+        for gram in name_ngrams(key):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(name)
+                if not posting:
+                    del self.postings[gram]
+        sorted_keys = self.sorted_keys
+        position = bisect.bisect_left(sorted_keys, (key, name))
+        if position < len(sorted_keys) and sorted_keys[position] == (key, name):
+            del sorted_keys[position]
+
+    def names(self, offset: int = 0, limit: Optional[int] = None) -> List[str]:
+        """
+        Get a page of the indexed names in alphabetical order.
+
+        Args:
+            offset: Number of names to skip
+            limit: Maximum number of names to return (None for all)
+
+        Returns:
+            Names in alphabetical (case-insensitive) order
+        """
+        sorted_keys = self.sorted_keys
+        end = None if limit is None else offset + limit
+        return [name for _, name in sorted_keys[offset:end]]
+
+    def substring(self, query: str) -> List[str]:
+        """
+        Find names containing a substring (case-insensitive).
+
+        Queries shorter than an n-gram fall back to checking every name.
+
+        Args:
+            query: Lowercased search text
+
+        Returns:
+            Matching names in alphabetical order
+        """
+        grams = name_ngrams(query)
+        if not grams:
+            return [name for key, name in self.sorted_keys if query in key]
+
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+        return sorted(
+            (name for name in candidates if query in name.lower()),
+            key=lambda name: (name.lower(), name)
+        )
+
+    def prefix(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Find names starting with a prefix (case-insensitive).
+
+        Args:
+            query: Lowercased prefix
+            limit: Maximum number of names to return
+
+        Returns:
+            Matching names in alphabetical order
+        """
+        results = []
+        sorted_keys = self.sorted_keys
+        position = bisect.bisect_left(sorted_keys, (query,))
+        while position < len(sorted_keys) and (limit is None or len(results) < limit):
+            key, name = sorted_keys[position]
+            if not key.startswith(query):
+                break
+            results.append(name)
+            position += 1
+        return results
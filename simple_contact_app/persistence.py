@@ -0,0 +1,298 @@
+# persistence.py
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from models import ContactRecord
+
+SNAPSHOT_FILE = "contacts.snapshot"
+SEGMENT_PREFIX = "contacts-"
+SEGMENT_SUFFIX = ".wal"
+
+# Contacts serialized per write when taking a snapshot
+SNAPSHOT_CHUNK = 10000
+
+# A logged change: (op, name, record), with op "put" or "delete" and record
+# None for deletes
+Change = Tuple[str, str, Optional[ContactRecord]]
+
+class ContactPersistence:
+    """
+    Snapshot + write-ahead log persistence for the contacts dictionary.
+
+    Every mutation is appended to the log as one JSON line, tagged with a
+    sequence number, before it is applied in memory. After snapshot_every
+    logged mutations a background thread writes a full snapshot (with the
+    sequence number it covers) and deletes the log segments it replaces, so
+    startup only loads one snapshot and replays the records written since.
+
+    The log is split into segments named after their first sequence number;
+    a snapshot starts a new segment, so writers never wait for it. A torn
+    record at the end of the log (crash mid-write) is truncated on load.
+    """
+
+    def __init__(self, directory: Path, snapshot_every: int = 100000, fsync: bool = True):
+        self.directory = directory
+        self.snapshot_every = max(1, snapshot_every)
+        self.fsync = fsync
+        self.seq = 0
+        self.snapshots = 0
+        self.contacts: Optional[Dict[str, ContactRecord]] = None
+        self._lock = threading.Lock()
+        self._segment = None
+        self._unsnapshotted = 0
+        self._snapshotter: Optional[threading.Thread] = None
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.directory / SNAPSHOT_FILE
+
+    def _segments(self) -> List[Tuple[int, Path]]:
+        """
+        List the log segments as (first sequence number, path), oldest first.
+        """
+        segments = []
+        for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+            try:
+                start = int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            segments.append((start, path))
+        return sorted(segments)
+
+    def load(self, contacts: Dict[str, ContactRecord]) -> Dict[str, int]:
+        """
+        Fill a contacts dictionary from the latest snapshot and the log tail.
+
+        The dictionary is kept: put() and delete() apply mutations to it and
+        snapshots are taken from it.
+
+        Args:
+            contacts: Dictionary to fill (normally empty)
+
+        Returns:
+            Dictionary with the number of snapshot contacts and replayed records
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot_seq = 0
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot["seq"]
+            for name, data in snapshot["contacts"].items():
+                contacts[name] = ContactRecord.from_dict(data, name)
+            del snapshot
+        except FileNotFoundError:
+            pass
+        loaded = len(contacts)
+        self.seq = snapshot_seq
+
+        replayed = 0
+        segments = self._segments()
+        for position, (_, path) in enumerate(segments):
+            with open(path, 'rb') as f:
+                data = f.read()
+            offset = 0
+            while offset < len(data):
+                end = data.find(b"\n", offset)
+                if end < 0:
+                    break
+                try:
+                    record = json.loads(data[offset:end])
+                except ValueError:
+                    break
+                offset = end + 1
+                if record["seq"] <= snapshot_seq:
+                    continue
+                if record["op"] == "put":
+                    contacts[record["name"]] = ContactRecord.from_dict(record["data"], record["name"])
+                else:
+                    contacts.pop(record["name"], None)
+                self.seq = record["seq"]
+                replayed += 1
+            if offset < len(data) and position == len(segments) - 1:
+                # Drop a record torn by a crash so new records start cleanly
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+
+        self.contacts = contacts
+        self._unsnapshotted = replayed
+        if segments:
+            self._segment = open(segments[-1][1], 'ab', buffering=0)
+        else:
+            self._open_segment()
+        return {"snapshot_contacts": loaded, "replayed_records": replayed}
+
+    def _open_segment(self) -> None:
+        """
+        Start a new log segment after the current sequence number.
+        """
+        if self._segment is not None:
+            self._segment.close()
+        path = self.directory / f"{SEGMENT_PREFIX}{self.seq + 1:020d}{SEGMENT_SUFFIX}"
+        self._segment = open(path, 'ab', buffering=0)
+
+    def _append(self, changes: List[Change]) -> None:
+        """
+        Write log records, make them durable (one fsync for all) and apply
+        the changes to the contacts.
+
+        Logging and applying happen under the lock, so a snapshot never
+        covers a record that is missing from its copy of the contacts.
+
+        If the write or fsync fails, the segment is cut back to its size
+        before the write and the sequence number restored, so no torn or
+        unacknowledged record is left for later records to follow (load()
+        stops at the first bad line). If it cannot be cut, the log continues
+        in a new segment after the failed records.
+
+        With fsync enabled this blocks the calling thread (the event loop,
+        in the API) for the device's fsync latency.
+
+        Raises:
+            OSError: If the records could not be written (nothing is applied)
+        """
+        with self._lock:
+            first_seq = self.seq
+            lines = []
+            for op, name, contact in changes:
+                self.seq += 1
+                record = {"op": op, "name": name, "seq": self.seq}
+                if contact is not None:
+                    record["data"] = contact.to_dict()
+                lines.append(json.dumps(record, ensure_ascii=False))
+            data = memoryview(("\n".join(lines) + "\n").encode('utf-8'))
+            fd = self._segment.fileno()
+            size = os.fstat(fd).st_size
+            try:
+                while data:
+                    data = data[self._segment.write(data):]
+                if self.fsync:
+                    os.fsync(fd)
+            except BaseException:
+                try:
+                    os.ftruncate(fd, size)
+                    self.seq = first_seq
+                except OSError:
+                    self._open_segment()
+                raise
+            for op, name, contact in changes:
+                if op == "put":
+                    self.contacts[name] = contact
+                else:
+                    self.contacts.pop(name, None)
+            self._unsnapshotted += len(changes)
+            due = self._unsnapshotted >= self.snapshot_every
+        if due:
+            self.start_snapshot()
+
+    def put(self, name: str, contact: ContactRecord) -> None:
+        """
+        Create or replace a contact, logging it first.
+
+        Raises:
+            OSError: If the record could not be written (the contact is unchanged)
+        """
+        self._append([("put", name, contact)])
+
+    def put_many(self, contacts: Dict[str, ContactRecord]) -> None:
+        """
+        Create or replace several contacts with a single log write and fsync.
+
+        Raises:
+            OSError: If the records could not be written
+        """
+        if contacts:
+            self._append([("put", name, contact) for name, contact in contacts.items()])
+
+    def delete(self, name: str) -> None:
+        """
+        Delete a contact, logging it first.
+
+        Raises:
+            OSError: If the record could not be written (the contact is unchanged)
+        """
+        self._append([("delete", name, None)])
+
+    def start_snapshot(self) -> Optional[threading.Thread]:
+        """
+        Snapshot the contacts in a background thread, unless one is running.
+
+        The dictionary is copied and a new log segment started under the
+        lock; the snapshot is written without it.
+        """
+        with self._lock:
+            if self._snapshotter is not None and self._snapshotter.is_alive():
+                return None
+            # Stored contact records are replaced, never mutated, so a
+            # shallow copy is a consistent view
+            contacts = dict(self.contacts)
+            seq = self.seq
+            self._unsnapshotted = 0
+            self._open_segment()
+            self._snapshotter = threading.Thread(
+                target=self._write_snapshot, args=(contacts, seq),
+                name="contacts-snapshot", daemon=True
+            )
+            self._snapshotter.start()
+            return self._snapshotter
+
+    def _write_snapshot(self, contacts: Dict[str, ContactRecord], seq: int) -> None:
+        """
+        Atomically replace the snapshot and delete the log segments it covers.
+
+        The snapshot is one JSON object, {"seq": ..., "contacts": {name: data}},
+        serialized a chunk of contacts at a time.
+        """
+        temp_path = self.snapshot_path.with_name(SNAPSHOT_FILE + ".tmp")
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        names = list(contacts)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{{"seq":{seq},"contacts":{{')
+            for start in range(0, len(names), SNAPSHOT_CHUNK):
+                chunk = {name: contacts[name].to_dict() for name in names[start:start + SNAPSHOT_CHUNK]}
+                if start:
+                    f.write(",")
+                f.write(encoder.encode(chunk)[1:-1])
+            f.write("}}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        _fsync_directory(self.directory)
+        for start, path in self._segments():
+            if start <= seq:
+                path.unlink()
+        self.snapshots += 1
+
+    def close(self) -> None:
+        """
+        Write a final snapshot, so the next start replays nothing, and close the log.
+        """
+        if self._segment is None:
+            return
+        snapshotter = self._snapshotter
+        if snapshotter is not None:
+            snapshotter.join()
+        if self._unsnapshotted:
+            self.start_snapshot().join()
+        with self._lock:
+            self._segment.close()
+            self._segment = None
+
+def _fsync_directory(directory: Path) -> None:
+    """
+    Persist the directory entry created by a rename, where supported.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on Windows; renames are durable there
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,227 @@
+# shared_store.py
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Callable, List, Optional, Tuple
+
+from models import ContactRecord
+
+# Change rows kept for workers catching up; a worker further behind than
+# this reloads every contact instead
+RETAIN_CHANGES = 100000
+TRIM_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT
+);
+"""
+
+# A change as applied to a worker's in-memory view: (op, name, record), with
+# op "put" or "delete" and record None for deletes
+Change = Tuple[str, str, Optional[ContactRecord]]
+
+class SharedContactStore:
+    """
+    SQLite-backed contact store shared by several worker processes.
+
+    The database (in WAL mode, so readers never block the writer) is the
+    source of truth. Every write updates the contacts table and appends a
+    row to the changes table in one transaction, and the uniqueness and
+    existence checks run inside that transaction, so concurrent workers
+    cannot create the same contact twice.
+
+    Each worker keeps its in-memory view and indexes, and brings them up
+    to date by reading the change rows after the last sequence number it
+    applied before serving a request. That read is a primary-key range
+    scan, so it is cheap when nothing changed.
+    """
+
+    def __init__(self, path: Path, fsync: bool = True, retain_changes: int = RETAIN_CHANGES):
+        self.path = path
+        self.fsync = fsync
+        self.retain_changes = retain_changes
+        self.seq = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        """
+        Open (and if needed create) the database.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        self._conn.executescript(SCHEMA)
+
+    def load(self, contacts: Dict[str, ContactRecord]) -> None:
+        """
+        Fill a dictionary with every stored contact and remember the
+        sequence number the view corresponds to.
+
+        Reads in its own transaction, or in the caller's write transaction
+        (a worker catching up while holding the write lock).
+        """
+        with self._lock:
+            own_transaction = not self._conn.in_transaction
+            if own_transaction:
+                self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT MAX(seq) FROM changes").fetchone()
+                for name, data in self._conn.execute("SELECT name, data FROM contacts"):
+                    contacts[name] = ContactRecord.from_dict(json.loads(data), name)
+            finally:
+                if own_transaction:
+                    self._conn.execute("COMMIT")
+            self.seq = row[0] or 0
+
+    def changes(self) -> Optional[List[Change]]:
+        """
+        Get the changes made since the view was last brought up to date.
+
+        Returns:
+            Changes in order (empty if none), or None if some were already
+            trimmed and the view must be reloaded with load()
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, name, data FROM changes WHERE seq > ? ORDER BY seq", (self.seq,)
+            ).fetchall()
+            if not rows:
+                return []
+            if rows[0][0] != self.seq + 1:
+                return None
+            self.seq = rows[-1][0]
+        return [
+            (op, name, ContactRecord.from_dict(json.loads(data), name) if data is not None else None)
+            for _, op, name, data in rows
+        ]
+
+    def _write(self, op: str, name: str, contact: Optional[ContactRecord], must_exist: Optional[bool],
+               check: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Apply one change in a write transaction if the contact's existence
+        matches must_exist (None: don't care).
+
+        check runs once the transaction holds the database write lock, so
+        no other worker can write until this change commits; an exception
+        it raises aborts the change.
+        """
+        encoded = json.dumps(contact.to_dict(), ensure_ascii=False) if contact is not None else None
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if check is not None:
+                    check()
+                if must_exist is not None:
+                    exists = self._conn.execute(
+                        "SELECT 1 FROM contacts WHERE name = ?", (name,)
+                    ).fetchone() is not None
+                    if exists != must_exist:
+                        self._conn.execute("ROLLBACK")
+                        return False
+                if op == "put":
+                    self._conn.execute(
+                        "INSERT INTO contacts (name, data) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET data = excluded.data", (name, encoded)
+                    )
+                else:
+                    self._conn.execute("DELETE FROM contacts WHERE name = ?", (name,))
+                seq = self._conn.execute(
+                    "INSERT INTO changes (op, name, data) VALUES (?, ?, ?)", (op, name, encoded)
+                ).lastrowid
+                self._trim(seq, 1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _trim(self, seq: int, count: int) -> None:
+        """
+        Delete old change rows whenever the sequence crosses a TRIM_EVERY
+        boundary. Called in the write transaction that wrote count rows up
+        to seq.
+        """
+        if seq // TRIM_EVERY != (seq - count) // TRIM_EVERY:
+            self._conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - self.retain_changes,))
+
+    def put_many(self, prepare: Callable[[], Dict[str, ContactRecord]]) -> None:
+        """
+        Create or replace several contacts in one write transaction.
+
+        Args:
+            prepare: Called under the write lock (see _write); returns the
+                contacts to store by name
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                contacts = prepare()
+                if contacts:
+                    rows = [(name, json.dumps(contact.to_dict(), ensure_ascii=False))
+                            for name, contact in contacts.items()]
+                    self._conn.executemany(
+                        "INSERT INTO contacts (name, data) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET data = excluded.data", rows
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO changes (op, name, data) VALUES ('put', ?, ?)", rows
+                    )
+                    seq = self._conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0]
+                    self._trim(seq, len(rows))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def create(self, name: str, contact: ContactRecord, check: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Store a new contact.
+
+        Args:
+            check: Called under the write lock before storing (see _write)
+
+        Returns:
+            False if a contact with that name already exists
+        """
+        return self._write("put", name, contact, must_exist=False, check=check)
+
+    def replace(self, name: str, contact: ContactRecord, check: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Replace an existing contact.
+
+        Args:
+            check: Called under the write lock before storing (see _write)
+
+        Returns:
+            False if the contact doesn't exist
+        """
+        return self._write("put", name, contact, must_exist=True, check=check)
+
+    def delete(self, name: str) -> bool:
+        """
+        Delete a contact.
+
+        Returns:
+            False if the contact doesn't exist
+        """
+        return self._write("delete", name, None, must_exist=True)
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
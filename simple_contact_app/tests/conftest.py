@@ -0,0 +1,6 @@
+# conftest.py
+import sys
+from pathlib import Path
+
+# The app modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
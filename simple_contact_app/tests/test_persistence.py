@@ -0,0 +1,135 @@
+# test_persistence.py
+import os
+
+import pytest
+
+import persistence
+from models import ContactRecord
+from persistence import ContactPersistence
+
+def contact(name: str, phone: str = "5550100") -> ContactRecord:
+    return ContactRecord(name, phone, f"{name.lower()}@example.com")
+
+def open_store(directory, **kwargs):
+    store = ContactPersistence(directory, fsync=False, **kwargs)
+    contacts = {}
+    stats = store.load(contacts)
+    return store, contacts, stats
+
+def crash(store: ContactPersistence) -> None:
+    """
+    Drop a store without its final snapshot, like a killed process.
+    """
+    store._segment.close()
+
+def phones(contacts):
+    return {name: record.phone for name, record in contacts.items()}
+
+class FailingSegment:
+    """
+    Log segment wrapper whose writes stop part way through.
+    """
+
+    def __init__(self, segment, allowed: int):
+        self.segment = segment
+        self.allowed = allowed
+
+    def write(self, data) -> int:
+        if self.allowed <= 0:
+            raise OSError("disk full")
+        written = self.segment.write(data[:self.allowed])
+        self.allowed -= written
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.segment, name)
+
+def test_replay_after_crash(tmp_path):
+    store, contacts, _ = open_store(tmp_path)
+    store.put("Ann", contact("Ann"))
+    store.put_many({"Bob": contact("Bob"), "Cy": contact("Cy")})
+    store.put("Ann", contact("Ann", "5550199"))
+    store.delete("Bob")
+    crash(store)
+
+    store, contacts, stats = open_store(tmp_path)
+    assert phones(contacts) == {"Ann": "5550199", "Cy": "5550100"}
+    assert stats == {"snapshot_contacts": 0, "replayed_records": 5}
+    assert store.seq == 5
+    crash(store)
+
+def test_replay_after_failed_write(tmp_path):
+    store, contacts, _ = open_store(tmp_path)
+    store.put("Ann", contact("Ann"))
+
+    segment = store._segment
+    store._segment = FailingSegment(segment, 15)
+    with pytest.raises(OSError):
+        store.put_many({"Bob": contact("Bob"), "Cy": contact("Cy")})
+    store._segment = segment
+
+    # Nothing of the failed write is applied or left in the log
+    assert phones(contacts) == {"Ann": "5550100"}
+    assert store.seq == 1
+    store.put("Dee", contact("Dee"))
+    crash(store)
+
+    store, contacts, stats = open_store(tmp_path)
+    assert phones(contacts) == {"Ann": "5550100", "Dee": "5550100"}
+    assert stats["replayed_records"] == 2
+    assert store.seq == 2
+    crash(store)
+
+def test_failed_fsync_is_rolled_back(tmp_path, monkeypatch):
+    store = ContactPersistence(tmp_path, fsync=True)
+    contacts = {}
+    store.load(contacts)
+    store.put("Ann", contact("Ann"))
+    path = tmp_path / os.path.basename(store._segment.name)
+    size = os.path.getsize(path)
+
+    def failing_fsync(fd):
+        raise OSError("I/O error")
+
+    monkeypatch.setattr(persistence.os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        store.put("Bob", contact("Bob"))
+    monkeypatch.undo()
+
+    assert os.path.getsize(path) == size
+    assert "Bob" not in contacts
+    crash(store)
+
+def test_torn_record_is_truncated_on_load(tmp_path):
+    store, _, _ = open_store(tmp_path)
+    store.put("Ann", contact("Ann"))
+    store.put("Bob", contact("Bob"))
+    path = tmp_path / os.path.basename(store._segment.name)
+    crash(store)
+    os.truncate(path, os.path.getsize(path) - 4)
+
+    store, contacts, _ = open_store(tmp_path)
+    assert phones(contacts) == {"Ann": "5550100"}
+    store.put("Cy", contact("Cy"))
+    crash(store)
+
+    store, contacts, _ = open_store(tmp_path)
+    assert phones(contacts) == {"Ann": "5550100", "Cy": "5550100"}
+    crash(store)
+
+def test_snapshot_then_replay(tmp_path):
+    store, contacts, _ = open_store(tmp_path, snapshot_every=3)
+    for name in ("Ann", "Bob", "Cy"):
+        store.put(name, contact(name))
+    store._snapshotter.join()
+    store.delete("Bob")
+    crash(store)
+
+    store, contacts, stats = open_store(tmp_path)
+    assert phones(contacts) == {"Ann": "5550100", "Cy": "5550100"}
+    assert stats == {"snapshot_contacts": 3, "replayed_records": 1}
+    store.close()
+
+    store, contacts, stats = open_store(tmp_path)
+    assert stats == {"snapshot_contacts": 2, "replayed_records": 0}
+    crash(store)
@@ -0,0 +1,117 @@
+# test_shared_store.py
+import pytest
+
+import shared_store
+from models import ContactRecord
+from shared_store import SharedContactStore
+
+def contact(name: str, phone: str = "5550100") -> ContactRecord:
+    return ContactRecord(name, phone, f"{name.lower()}@example.com")
+
+def open_worker(path, **kwargs):
+    store = SharedContactStore(path, fsync=False, **kwargs)
+    store.open()
+    contacts = {}
+    store.load(contacts)
+    return store, contacts
+
+def apply(contacts, changes):
+    for op, name, record in changes:
+        if op == "put":
+            contacts[name] = record
+        else:
+            contacts.pop(name, None)
+
+def phones(contacts):
+    return {name: record.phone for name, record in contacts.items()}
+
+def test_catch_up_from_change_log(tmp_path):
+    path = tmp_path / "contacts.db"
+    writer, _ = open_worker(path)
+    reader, view = open_worker(path)
+
+    assert writer.create("Ann", contact("Ann"))
+    assert not writer.create("Ann", contact("Ann"))
+    writer.put_many(lambda: {"Bob": contact("Bob"), "Cy": contact("Cy")})
+    assert writer.replace("Ann", contact("Ann", "5550199"))
+    assert writer.delete("Bob")
+    assert not writer.delete("Bob")
+
+    changes = reader.changes()
+    assert [(op, name) for op, name, _ in changes] == [
+        ("put", "Ann"), ("put", "Bob"), ("put", "Cy"), ("put", "Ann"), ("delete", "Bob")
+    ]
+    apply(view, changes)
+    assert phones(view) == {"Ann": "5550199", "Cy": "5550100"}
+    assert reader.seq == 5
+    assert reader.changes() == []
+    writer.close()
+    reader.close()
+
+def test_catch_up_after_change_log_was_trimmed(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_store, "TRIM_EVERY", 10)
+    path = tmp_path / "contacts.db"
+    writer, _ = open_worker(path, retain_changes=5)
+    reader, view = open_worker(path, retain_changes=5)
+
+    for i in range(12):
+        writer.create(f"Person {i}", contact(f"Person {i}"))
+    writer.put_many(lambda: {f"Person {i}": contact(f"Person {i}", "5550199") for i in range(0, 12, 2)})
+    writer.delete("Person 3")
+
+    # The changes the reader needs next are gone, so it has to reload
+    assert reader.changes() is None
+    view = {}
+    reader.load(view)
+    expected = {}
+    writer.load(expected)
+    assert phones(view) == phones(expected)
+    assert reader.seq == 19
+
+    # Afterwards it catches up from the change log again
+    writer.delete("Person 4")
+    changes = reader.changes()
+    assert [(op, name) for op, name, _ in changes] == [("delete", "Person 4")]
+    apply(view, changes)
+    assert "Person 4" not in view
+    writer.close()
+    reader.close()
+
+def test_failed_check_aborts_the_write(tmp_path):
+    path = tmp_path / "contacts.db"
+    writer, _ = open_worker(path)
+    reader, _ = open_worker(path)
+
+    def reject():
+        raise ValueError("duplicate email")
+
+    with pytest.raises(ValueError):
+        writer.create("Ann", contact("Ann"), check=reject)
+    with pytest.raises(ValueError):
+        writer.put_many(lambda: reject())
+
+    assert reader.changes() == []
+    assert writer.create("Ann", contact("Ann"))
+    assert [name for _, name, _ in reader.changes()] == ["Ann"]
+    writer.close()
+    reader.close()
+
+def test_load_inside_write_transaction(tmp_path):
+    path = tmp_path / "contacts.db"
+    writer, _ = open_worker(path)
+    other, _ = open_worker(path)
+    other.create("Ann", contact("Ann"))
+
+    seen = {}
+
+    def prepare():
+        # A worker that fell behind reloads while holding the write lock
+        writer.load(seen)
+        return {"Bob": contact("Bob")}
+
+    writer.put_many(prepare)
+    assert set(seen) == {"Ann"}
+    assert writer.seq == 1
+    assert [name for _, name, _ in writer.changes()] == ["Bob"]
+    writer.close()
+    other.close()